@@ -0,0 +1,169 @@
+"""
+Controle de admissão adaptativo das rotas que criam pagamentos.
+
+Quando a Cora ou o Mercado Pago ficam lentos, as requisições de criação se
+acumulam até ocupar todas as threads e conexões do worker, e até as rotas de
+leitura (obter-dados, dashboard) passam a dar timeout. Cada grupo de rotas
+tem um LimitadorAIMD com o número de requisições simultâneas admitidas:
+
+- resposta (medida até o início do envio: cabeçalhos e status) abaixo de
+  ADMISSAO_LATENCIA_MS e sem erro 5xx: o limite cresce
+  1/limite (cerca de +1 a cada `limite` respostas boas);
+- resposta lenta ou 5xx: o limite é multiplicado por ADMISSAO_REDUCAO, no
+  máximo uma vez por intervalo de latência (uma rajada de respostas lentas
+  conta como um único sinal);
+- acima do limite: 503 imediato com Retry-After, sem ocupar o worker.
+
+A vaga só é devolvida quando o corpo termina de ser enviado: as cobranças em
+lote (NDJSON em streaming) ocupam a vaga durante todo o lote, mas a latência
+que ajusta o limite é a do início da resposta, e uma desconexão do cliente
+não conta como sobrecarga. O lote tem grupo próprio para não consumir as vagas
+de /cora/cobranca e /cora/api/cora/pix.
+
+Rotas fora de GRUPOS não passam pelo limitador. Os limites são por worker.
+"""
+
+import time
+import logging
+from typing import Dict, Tuple
+
+from fastapi import Request
+
+from config import (
+    ADMISSAO_HABILITADO,
+    ADMISSAO_LATENCIA_MS,
+    ADMISSAO_LIMITE_INICIAL,
+    ADMISSAO_LIMITE_MAXIMO,
+    ADMISSAO_LIMITE_MINIMO,
+    ADMISSAO_REDUCAO,
+    ADMISSAO_RETRY_AFTER,
+)
+from metrics import ADMISSION_REJECTIONS, registrar_saturacao
+from responses import RespostaJSON
+
+logger = logging.getLogger(__name__)
+
+# (método, caminho) -> grupo. O cora_router (prefixo /cora) é montado na raiz e em /cora.
+GRUPOS: Dict[Tuple[str, str], str] = {
+    ("POST", "/cora/cobranca"): "cora",
+    ("POST", "/cora/cora/cobranca"): "cora",
+    ("POST", "/cora/cobrancas/lote"): "cora_lote",
+    ("POST", "/cora/cora/cobrancas/lote"): "cora_lote",
+    ("POST", "/cora/api/cora/pix"): "cora",
+    ("POST", "/mercadopago/pagar"): "mercadopago",
+    ("POST", "/mercadopago/processar-pagamento-token"): "mercadopago",
+}
+
+
+class LimitadorAIMD:
+    """Limite de concorrência com aumento aditivo e redução multiplicativa (usado só no event loop)."""
+
+    def __init__(self, nome: str, inicial: float = ADMISSAO_LIMITE_INICIAL, minimo: float = ADMISSAO_LIMITE_MINIMO,
+                 maximo: float = ADMISSAO_LIMITE_MAXIMO, latencia_limite: float = ADMISSAO_LATENCIA_MS / 1000,
+                 reducao: float = ADMISSAO_REDUCAO):
+        self.nome = nome
+        self.limite = float(inicial)
+        self.minimo = minimo
+        self.maximo = maximo
+        self.latencia_limite = latencia_limite
+        self.reducao = reducao
+        self.em_andamento = 0
+        self._ultima_reducao = 0.0
+
+    def admitir(self) -> bool:
+        if self.em_andamento >= int(self.limite):
+            return False
+        self.em_andamento += 1
+        return True
+
+    def registrar(self, inicio: float, sobrecarga: bool):
+        """Ajusta o limite com o resultado de uma requisição admitida (status e tempo até a resposta)."""
+        agora = time.monotonic()
+        if sobrecarga or agora - inicio > self.latencia_limite:
+            # Respostas iniciadas antes da última redução já refletem o limite antigo
+            if inicio >= self._ultima_reducao:
+                anterior = self.limite
+                self.limite = max(self.minimo, self.limite * self.reducao)
+                self._ultima_reducao = agora
+                logger.info("Limite de admissão %s: %.1f -> %.1f", self.nome, anterior, self.limite)
+        else:
+            self.limite = min(self.maximo, self.limite + 1 / self.limite)
+
+    def liberar(self):
+        """Devolve a vaga de uma requisição admitida (após o envio do corpo)."""
+        self.em_andamento -= 1
+
+    def concluir(self, inicio: float, sobrecarga: bool):
+        """Registra o fim de uma requisição admitida e ajusta o limite."""
+        self.liberar()
+        self.registrar(inicio, sobrecarga)
+
+
+limitadores: Dict[str, LimitadorAIMD] = {}
+for _grupo in sorted(set(GRUPOS.values())):
+    limitadores[_grupo] = LimitadorAIMD(_grupo)
+    registrar_saturacao(
+        f"admissao_{_grupo}", "limiter",
+        lambda limitador=limitadores[_grupo]: limitador.em_andamento,
+        lambda limitador=limitadores[_grupo]: int(limitador.limite),
+    )
+
+
+class _RotaRecusada:
+    """Substitui a rota em request.scope nas recusas: as rotas de GRUPOS não têm parâmetros no caminho,
+    então o próprio caminho é o template usado pelas métricas e pelo tracing."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+
+class _RespostaAdmitida:
+    """
+    Envia a resposta de uma requisição admitida e só então devolve a vaga ao limitador.
+
+    Em respostas em streaming (ex.: /cora/cobrancas/lote) as cobranças continuam
+    sendo geradas depois que call_next retorna; a vaga fica ocupada até o corpo
+    terminar, falhar ou o cliente desconectar. O limite já foi ajustado quando
+    call_next retornou. Os demais atributos (status_code, headers) são os da
+    resposta original, para os middlewares externos.
+    """
+
+    def __init__(self, response, limitador: LimitadorAIMD):
+        self._response = response
+        self._limitador = limitador
+
+    def __getattr__(self, nome):
+        return getattr(self._response, nome)
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self._response(scope, receive, send)
+        finally:
+            self._limitador.liberar()
+
+
+async def middleware_admissao(request: Request, call_next):
+    """Middleware HTTP que aplica o limitador do grupo da rota, se houver."""
+    grupo = GRUPOS.get((request.method, request.url.path)) if ADMISSAO_HABILITADO else None
+    if grupo is None:
+        return await call_next(request)
+
+    limitador = limitadores[grupo]
+    if not limitador.admitir():
+        ADMISSION_REJECTIONS.labels(grupo).inc()
+        request.scope["route"] = _RotaRecusada(request.url.path)
+        return RespostaJSON(
+            status_code=503,
+            content={"detail": "Serviço sobrecarregado, tente novamente"},
+            headers={"Retry-After": str(ADMISSAO_RETRY_AFTER)},
+        )
+
+    inicio = time.monotonic()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        limitador.concluir(inicio, True)
+        raise
+    # Latência até o início da resposta; a duração de um corpo em streaming não é sobrecarga
+    limitador.registrar(inicio, response.status_code >= 500)
+    return _RespostaAdmitida(response, limitador)
@@ -0,0 +1,192 @@
+"""
+Aquecimento dos workers da API e dos verificadores, e prontidão em /health/ready.
+
+Logo após um deploy, as primeiras requisições pagavam o login ODBC, o
+primeiro token da Cora (handshake mTLS) e o handshake TLS com cada provedor.
+Antes de aceitar tráfego (lifespan da API) ou do primeiro ciclo
+(Verificador.aquecer), cada processo executa em paralelo:
+
+- banco: pré-abre DB_POOL_MINIMO conexões do pool (SQL Server) ou abre o
+  banco SQLite;
+- cora_token: obtém o token da Cora (memória e tabela token_cora);
+- cora, mercadopago, supabase: abrem conexões keep-alive nos pools HTTP
+  usados pelas rotas e verificadores (qualquer resposta HTTP serve).
+
+O aquecimento inteiro é limitado a AQUECIMENTO_TIMEOUT segundos. Falhas em
+etapas opcionais só são registradas; sem as etapas de AQUECIMENTO_OBRIGATORIAS
+o worker responde 503 em /health/ready até uma nova tentativa dar certo.
+"""
+
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter
+
+from config import AQUECIMENTO_OBRIGATORIAS, AQUECIMENTO_TIMEOUT, DB_BACKEND
+from responses import RespostaJSON
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_HTTP = 5  # segundos por conexão de aquecimento
+INTERVALO_NOVA_TENTATIVA = 5  # segundos entre novas tentativas das etapas obrigatórias em /health/ready
+
+Etapa = Callable[[], Any]
+
+# Estado da prontidão deste processo
+_estado: Dict[str, Any] = {"fase": "iniciando", "etapas": {}, "tentativa_em": 0.0}
+
+
+# === etapas ===
+
+def etapa_banco() -> Any:
+    """Pré-abre as conexões mínimas do pool e executa uma consulta trivial."""
+    from database import aquecer_pool
+    from repositorio import obter_repositorio
+
+    abertas = aquecer_pool() if DB_BACKEND != "sqlite" else 0
+    with obter_repositorio().conexao() as conn:
+        conn.cursor().execute("SELECT 1")
+    return {"conexoes": abertas}
+
+
+def etapa_token_cora() -> Any:
+    from requisicaotokencora import obter_token_cora
+
+    obter_token_cora()
+    return {}
+
+
+def etapa_http(sessao, url: str, headers: Optional[Dict[str, str]] = None) -> Etapa:
+    """Abre uma conexão keep-alive da sessão requests com o host da URL."""
+    def executar():
+        response = sessao.get(url, headers=headers or {}, timeout=TIMEOUT_HTTP)
+        return {"status": response.status_code}
+    return executar
+
+
+def etapas_api() -> Dict[str, Etapa]:
+    """Etapas de um worker da API (conforme as integrações configuradas)."""
+    import http_clientes
+    import mercadopago_client
+    from config import CORA_API_URL, CORA_CLIENT_ID, MP_API_URL, SUPABASE_KEY, SUPABASE_URL
+
+    etapas = {"banco": etapa_banco}
+    if CORA_CLIENT_ID:
+        etapas["cora_token"] = etapa_token_cora
+        etapas["cora"] = etapa_http(http_clientes.sessao(), CORA_API_URL)
+    etapas["mercadopago"] = etapa_http(http_clientes.sessao(), MP_API_URL)
+    if mercadopago_client.http_client is not None:
+        # Pool próprio do SDK (criação de pagamentos em /mercadopago/pagar)
+        etapas["mercadopago_sdk"] = etapa_http(mercadopago_client.http_client.session, MP_API_URL)
+    if SUPABASE_URL:
+        etapas["supabase"] = etapa_http(http_clientes.sessao(), f"{SUPABASE_URL}/rest/v1/", {"apikey": SUPABASE_KEY or ""})
+    return etapas
+
+
+def urls_async() -> Dict[str, str]:
+    """Hosts chamados pelo cliente httpx das rotas async (lote da Cora e confirmação no Supabase)."""
+    from config import CORA_API_URL, CORA_CLIENT_ID, SUPABASE_URL
+
+    urls = {}
+    if CORA_CLIENT_ID:
+        urls["cora_async"] = CORA_API_URL
+    if SUPABASE_URL:
+        urls["supabase_async"] = f"{SUPABASE_URL}/rest/v1/"
+    return urls
+
+
+# === execução ===
+
+def aquecer(etapas: Dict[str, Etapa], timeout: float = AQUECIMENTO_TIMEOUT) -> Dict[str, Dict[str, Any]]:
+    """
+    Executa as etapas em paralelo, cada uma em sua thread, por até `timeout` segundos.
+
+    Returns:
+        dict: por etapa, {"ok", "ms", "erro" ou o retorno da etapa}
+    """
+    resultados: Dict[str, Dict[str, Any]] = {}
+
+    def medir(nome: str, etapa: Etapa):
+        inicio = time.perf_counter()
+        try:
+            retorno = etapa() or {}
+            resultados[nome] = {"ok": True, "ms": round((time.perf_counter() - inicio) * 1000, 1), **retorno}
+        except Exception as e:
+            resultados[nome] = {"ok": False, "ms": round((time.perf_counter() - inicio) * 1000, 1), "erro": str(e)}
+
+    if not etapas:
+        return resultados
+    executor = ThreadPoolExecutor(max_workers=len(etapas), thread_name_prefix="aquecimento")
+    futuros = [executor.submit(medir, nome, etapa) for nome, etapa in etapas.items()]
+    wait(futuros, timeout=timeout)
+    # Etapas ainda em andamento continuam em segundo plano; o startup não espera por elas
+    executor.shutdown(wait=False)
+    for nome in etapas:
+        resultados.setdefault(nome, {"ok": False, "erro": f"não terminou em {timeout}s"})
+    return dict(resultados)
+
+
+async def aquecer_async(cliente, urls: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """Abre conexões keep-alive do cliente httpx (precisa rodar no event loop que o usa)."""
+    async def medir(url: str):
+        inicio = time.perf_counter()
+        try:
+            response = await cliente.get(url, timeout=TIMEOUT_HTTP)
+            return {"ok": True, "ms": round((time.perf_counter() - inicio) * 1000, 1), "status": response.status_code}
+        except Exception as e:
+            return {"ok": False, "ms": round((time.perf_counter() - inicio) * 1000, 1), "erro": str(e)}
+
+    resultados = await asyncio.gather(*(medir(url) for url in urls.values()))
+    return dict(zip(urls, resultados))
+
+
+def registrar(resultados: Dict[str, Dict[str, Any]]):
+    """Registra o resultado do aquecimento e atualiza a prontidão do processo."""
+    _estado["etapas"].update(resultados)
+    for nome, resultado in resultados.items():
+        if resultado["ok"]:
+            logger.info("Aquecimento %s: ok em %s ms", nome, resultado.get("ms"))
+        else:
+            logger.warning("Aquecimento %s falhou: %s", nome, resultado.get("erro"))
+    _estado["fase"] = "pronto" if not _pendentes() else "falha"
+
+
+def _pendentes() -> Dict[str, Etapa]:
+    etapas = {"banco": etapa_banco, "cora_token": etapa_token_cora}
+    return {
+        nome: etapas[nome] for nome in AQUECIMENTO_OBRIGATORIAS
+        if nome in _estado["etapas"] and not _estado["etapas"][nome]["ok"] and nome in etapas
+    }
+
+
+def marcar_pronto():
+    """Sem aquecimento (desabilitado): o processo fica pronto imediatamente."""
+    _estado["fase"] = "pronto"
+
+
+def marcar_encerrando():
+    """Shutdown em andamento: /health/ready passa a responder 503 para o balanceador drenar o worker."""
+    _estado["fase"] = "encerrando"
+
+
+# === rotas ===
+
+saude_router = APIRouter(prefix="/health", tags=["health"])
+
+
+@saude_router.get("/live")
+async def vivo():
+    return {"status": "ok"}
+
+
+@saude_router.get("/ready")
+async def pronto():
+    """200 quando o worker está aquecido; 503 enquanto aquece, após falha obrigatória ou no shutdown."""
+    if _estado["fase"] == "falha" and time.monotonic() - _estado["tentativa_em"] >= INTERVALO_NOVA_TENTATIVA:
+        _estado["tentativa_em"] = time.monotonic()
+        registrar(await asyncio.to_thread(aquecer, _pendentes()))
+    corpo = {"status": _estado["fase"], "etapas": _estado["etapas"]}
+    return RespostaJSON(status_code=200 if _estado["fase"] == "pronto" else 503, content=corpo)
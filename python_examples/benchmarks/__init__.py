@@ -0,0 +1,6 @@
+"""
+Benchmarks reproduzíveis da API de pagamentos.
+
+- carga.py: teste de carga HTTP contra main.app usando os emuladores locais;
+- comparar.py: compara dois resultados e falha se houver regressão.
+"""
@@ -0,0 +1,328 @@
+"""
+Teste de carga HTTP da API de pagamentos.
+
+Sobe os emuladores (Cora, Mercado Pago, PostgREST) e a própria main.app em
+portas locais, dispara os cenários com a concorrência pedida e grava o
+resultado em JSON (vazão, p50/p95/p99, taxa de erro por cenário).
+
+Por padrão o banco é o SQLite embutido (DB_BACKEND=sqlite, arquivo em
+SQLITE_PATH); para medir contra SQL Server exporte DB_BACKEND=sqlserver e um
+DB_CONNECTION_STRING local, nunca o de produção.
+
+Exemplos:
+    python -m benchmarks.carga --duracao 30 --concorrencia 32 --saida resultados/atual.json
+    python -m benchmarks.carga --cenarios obter_dados --url http://127.0.0.1:8000
+    python -m benchmarks.carga --saida novo.json --comparar resultados/base.json --tolerancia 0.15
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+CENARIOS = ("cora_cobranca", "mp_pagamento_token", "mp_webhook", "obter_dados")
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por posição mais próxima (valores já ordenados)."""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+class Ambiente:
+    """Emuladores e servidor da API executando em threads de fundo."""
+
+    def __init__(self, latencia: str, taxa_erro: float, limite_rps: float, workers_log: str = "warning"):
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.limite_rps = limite_rps
+        self.log_level = workers_log
+        self.url_api: Optional[str] = None
+        self._servidores = []
+        self._threads: List[threading.Thread] = []
+
+    def iniciar(self) -> str:
+        import uvicorn
+        from emuladores import cora, mercadopago, postgrest
+        from emuladores.comportamento import Comportamento
+
+        comportamento = Comportamento(latencia=self.latencia, taxa_erro=self.taxa_erro, limite_rps=self.limite_rps)
+        portas = {nome: _porta_livre() for nome in ("cora", "mercadopago", "supabase", "api")}
+
+        # As URLs precisam estar no ambiente antes de importar a aplicação
+        os.environ["CORA_API_URL"] = f"http://127.0.0.1:{portas['cora']}"
+        os.environ["CORA_TOKEN_URL"] = f"http://127.0.0.1:{portas['cora']}/token"
+        os.environ["MP_API_URL"] = f"http://127.0.0.1:{portas['mercadopago']}"
+        os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{portas['supabase']}"
+        os.environ.setdefault("SUPABASE_KEY", "benchmark")
+        os.environ.setdefault("MP_ACCESS_TOKEN", "TEST-benchmark")
+        os.environ.setdefault("CORA_CLIENT_ID", "benchmark")
+        os.environ.setdefault("DB_BACKEND", "sqlite")
+        os.environ.setdefault("SQLITE_PATH", "benchmark.db")
+
+        from main import app
+
+        apps = [
+            (cora.criar_app(comportamento), portas["cora"]),
+            (mercadopago.criar_app(comportamento), portas["mercadopago"]),
+            (postgrest.criar_app(comportamento), portas["supabase"]),
+            (app, portas["api"]),
+        ]
+        self._servidores = [
+            uvicorn.Server(uvicorn.Config(a, host="127.0.0.1", port=p, log_level=self.log_level, access_log=False))
+            for a, p in apps
+        ]
+
+        # Um loop por servidor: as rotas síncronas da API (token da Cora, SDK) bloqueiam o
+        # próprio loop e, se os emuladores dividissem o mesmo loop, nunca seriam atendidas
+        self._threads = [
+            threading.Thread(target=asyncio.run, args=(s.serve(),), name=f"benchmark-servidor-{p}", daemon=True)
+            for s, (_, p) in zip(self._servidores, apps)
+        ]
+        for thread in self._threads:
+            thread.start()
+        limite = time.monotonic() + 30
+        while not all(s.started for s in self._servidores):
+            if time.monotonic() > limite:
+                raise RuntimeError("Servidores do benchmark não iniciaram em 30s")
+            time.sleep(0.05)
+        self.url_api = f"http://127.0.0.1:{portas['api']}"
+        return self.url_api
+
+    def parar(self):
+        for servidor in self._servidores:
+            servidor.should_exit = True
+        for thread in self._threads:
+            thread.join(timeout=10)
+
+
+class Cenarios:
+    """Gera requisições para cada cenário, reaproveitando referências criadas durante o teste."""
+
+    def __init__(self):
+        self.referencias: List[str] = []
+        self.mp_ids: List[str] = []
+
+    def _nova_referencia(self) -> str:
+        return f"bench-{uuid.uuid4().hex[:16]}"
+
+    def cora_cobranca(self) -> Dict[str, Any]:
+        referencia = self._nova_referencia()
+        self.referencias.append(referencia)
+        return {
+            "method": "POST",
+            "url": "/cora/cobranca",
+            "json": {
+                "nome": "Cliente Benchmark",
+                "email": "benchmark@example.com",
+                "documento": "12345678909",
+                "telefone": "+5511999999999",
+                "endereco": {
+                    "street": "Rua Teste", "number": "1", "district": "Centro", "city": "São Paulo",
+                    "state": "SP", "complement": "", "zip_code": "01001000"
+                },
+                "amount": random.randint(1000, 50000),
+                "descricao": "Inscrição benchmark",
+                "referencia": referencia,
+                "vencimento": (datetime.now() + timedelta(days=3)).strftime("%Y-%m-%d"),
+                "tipo": random.choice(["pix", "boleto"]),
+            },
+        }
+
+    def mp_pagamento_token(self) -> Dict[str, Any]:
+        referencia = self._nova_referencia()
+        self.referencias.append(referencia)
+        return {
+            "method": "POST",
+            "url": "/mercadopago/processar-pagamento-token",
+            "json": {
+                "token": random.choice(["APRO", "APRO", "APRO", "OTHE", "CONT"]) + uuid.uuid4().hex[:8],
+                "payment_method_id": "master",
+                "issuer_id": None,
+                "installments": 1,
+                "transaction_amount": random.randint(1000, 50000),
+                "description": "Inscrição benchmark",
+                "payer": {"email": "benchmark@example.com", "identification": {"type": "CPF", "number": "12345678909"}},
+                "external_reference": referencia,
+            },
+            "depois": self._registrar_mp_id,
+        }
+
+    def _registrar_mp_id(self, response: httpx.Response):
+        if response.status_code == 200:
+            mp_id = response.json().get("mp_payment_id")
+            if mp_id:
+                self.mp_ids.append(mp_id)
+
+    def mp_webhook(self) -> Dict[str, Any]:
+        payment_id = random.choice(self.mp_ids) if self.mp_ids else str(random.randint(1, 10**9))
+        return {
+            "method": "POST",
+            "url": "/webhook/mercadopago",
+            "json": {"action": "payment.updated", "data": {"id": payment_id}},
+        }
+
+    def obter_dados(self) -> Dict[str, Any]:
+        referencia = random.choice(self.referencias) if self.referencias else self._nova_referencia()
+        return {"method": "GET", "url": f"/pagamento/obter-dados/{referencia}"}
+
+
+async def _executar_cenario(cliente: httpx.AsyncClient, gerar: Callable[[], Dict[str, Any]], concorrencia: int,
+                            duracao: float, requisicoes: Optional[int]) -> Dict[str, Any]:
+    latencias: List[float] = []
+    status: Dict[str, int] = {}
+    erros = 0
+    restantes = [requisicoes] if requisicoes else None
+    fim = time.perf_counter() + duracao
+
+    async def trabalhador():
+        nonlocal erros
+        while time.perf_counter() < fim:
+            if restantes is not None:
+                if restantes[0] <= 0:
+                    return
+                restantes[0] -= 1
+            pedido = gerar()
+            depois = pedido.pop("depois", None)
+            inicio = time.perf_counter()
+            try:
+                response = await cliente.request(**pedido)
+                latencias.append(time.perf_counter() - inicio)
+                status[str(response.status_code)] = status.get(str(response.status_code), 0) + 1
+                if response.status_code >= 400:
+                    erros += 1
+                elif depois:
+                    depois(response)
+            except httpx.HTTPError as e:
+                latencias.append(time.perf_counter() - inicio)
+                status[type(e).__name__] = status.get(type(e).__name__, 0) + 1
+                erros += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    decorrido = time.perf_counter() - inicio
+
+    latencias.sort()
+    total = len(latencias)
+    return {
+        "requisicoes": total,
+        "duracao_s": round(decorrido, 3),
+        "vazao_rps": round(total / decorrido, 2) if decorrido else 0.0,
+        "taxa_erro": round(erros / total, 5) if total else 0.0,
+        "latencia_ms": {
+            "media": round(sum(latencias) / total * 1000, 2) if total else 0.0,
+            "p50": round(percentil(latencias, 50) * 1000, 2),
+            "p95": round(percentil(latencias, 95) * 1000, 2),
+            "p99": round(percentil(latencias, 99) * 1000, 2),
+            "max": round(latencias[-1] * 1000, 2) if total else 0.0,
+        },
+        "status": status,
+    }
+
+
+async def executar(url: str, cenarios: List[str], concorrencia: int, duracao: float,
+                   requisicoes: Optional[int], aquecimento: float) -> Dict[str, Dict[str, Any]]:
+    gerador = Cenarios()
+    limites = httpx.Limits(max_connections=concorrencia * 2, max_keepalive_connections=concorrencia * 2)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limites) as cliente:
+        if aquecimento > 0:
+            await _executar_cenario(cliente, getattr(gerador, cenarios[0]), concorrencia, aquecimento, None)
+        resultados = {}
+        for nome in cenarios:
+            resultados[nome] = await _executar_cenario(cliente, getattr(gerador, nome), concorrencia, duracao, requisicoes)
+            print(f"{nome}: {json.dumps(resultados[nome], ensure_ascii=False)}")
+        return resultados
+
+
+def _versao() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga da API de pagamentos")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), help=f"Lista separada por vírgulas: {', '.join(CENARIOS)}")
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--duracao", type=float, default=20.0, help="Segundos por cenário")
+    parser.add_argument("--requisicoes", type=int, default=None, help="Limita o número de requisições por cenário")
+    parser.add_argument("--aquecimento", type=float, default=3.0, help="Segundos de aquecimento antes da medição")
+    parser.add_argument("--url", default=None, help="Usa uma API já em execução em vez de subir emuladores e main.app")
+    parser.add_argument("--latencia", default="lognormal:60,0.5", help="Latência dos emuladores (ver emuladores.comportamento)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--limite-rps", type=float, default=0.0)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado")
+    parser.add_argument("--comparar", default=None, help="Resultado base para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Piora relativa aceita nas latências/vazão")
+    args = parser.parse_args(argv)
+
+    random.seed(args.semente)
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    desconhecidos = set(cenarios) - set(CENARIOS)
+    if desconhecidos:
+        parser.error(f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    ambiente = None
+    url = args.url
+    if not url:
+        ambiente = Ambiente(args.latencia, args.taxa_erro, args.limite_rps)
+        url = ambiente.iniciar()
+    try:
+        resultados = asyncio.run(executar(url, cenarios, args.concorrencia, args.duracao, args.requisicoes, args.aquecimento))
+    finally:
+        if ambiente:
+            ambiente.parar()
+
+    relatorio = {
+        "versao": _versao(),
+        "data": datetime.now(timezone.utc).isoformat(),
+        "maquina": {"python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count()},
+        "parametros": {
+            "concorrencia": args.concorrencia, "duracao": args.duracao, "requisicoes": args.requisicoes,
+            "latencia_emuladores": None if args.url else args.latencia,
+            "taxa_erro_emuladores": None if args.url else args.taxa_erro,
+            "semente": args.semente,
+        },
+        "cenarios": resultados,
+    }
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        print(f"Resultado gravado em {args.saida}")
+
+    if args.comparar:
+        from benchmarks.comparar import comparar, imprimir
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            base = json.load(arquivo)
+        regressoes = comparar(base, relatorio, args.tolerancia)
+        imprimir(regressoes)
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Compara dois resultados de benchmarks.carga e aponta regressões.
+
+Uso:
+    python -m benchmarks.comparar base.json novo.json --tolerancia 0.10
+
+Sai com código 1 se algum cenário piorar além da tolerância em p50/p95/p99
+ou vazão, ou se a taxa de erro aumentar mais que 0.5 ponto percentual.
+"""
+
+import sys
+import json
+import argparse
+from typing import Any, Dict, List
+
+METRICAS_LATENCIA = ("p50", "p95", "p99")
+AUMENTO_MAXIMO_ERRO = 0.005
+
+
+def comparar(base: Dict[str, Any], novo: Dict[str, Any], tolerancia: float = 0.10) -> List[str]:
+    """
+    Returns:
+        list: descrições das regressões encontradas (vazia se não houver)
+    """
+    regressoes = []
+    for cenario, atual in novo.get("cenarios", {}).items():
+        anterior = base.get("cenarios", {}).get(cenario)
+        if not anterior:
+            continue
+        for metrica in METRICAS_LATENCIA:
+            antes, depois = anterior["latencia_ms"][metrica], atual["latencia_ms"][metrica]
+            if antes > 0 and depois > antes * (1 + tolerancia):
+                regressoes.append(f"{cenario}: {metrica} {antes:.1f}ms -> {depois:.1f}ms (+{(depois / antes - 1) * 100:.0f}%)")
+        antes, depois = anterior["vazao_rps"], atual["vazao_rps"]
+        if antes > 0 and depois < antes * (1 - tolerancia):
+            regressoes.append(f"{cenario}: vazão {antes:.1f} -> {depois:.1f} req/s ({(depois / antes - 1) * 100:.0f}%)")
+        antes, depois = anterior["taxa_erro"], atual["taxa_erro"]
+        if depois > antes + AUMENTO_MAXIMO_ERRO:
+            regressoes.append(f"{cenario}: taxa de erro {antes:.2%} -> {depois:.2%}")
+    return regressoes
+
+
+def imprimir(regressoes: List[str]):
+    if not regressoes:
+        print("Nenhuma regressão encontrada")
+        return
+    print("Regressões encontradas:")
+    for regressao in regressoes:
+        print(f"  - {regressao}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compara resultados de benchmark")
+    parser.add_argument("base")
+    parser.add_argument("novo")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    args = parser.parse_args(argv)
+    with open(args.base, encoding="utf-8") as a, open(args.novo, encoding="utf-8") as b:
+        regressoes = comparar(json.load(a), json.load(b), args.tolerancia)
+    imprimir(regressoes)
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Tempo de inicialização a frio da API e dos verificadores.
+
+Cada medição roda em um processo Python novo:
+- "import main" para a API;
+- "<script> --help" para os verificadores, que mede o tempo até o argparse responder;
+- opcionalmente, os módulos mais lentos segundo `python -X importtime`.
+
+Exemplos:
+    python -m benchmarks.tempo_importacao
+    python -m benchmarks.tempo_importacao --repeticoes 10 --detalhar 15 --saida resultados/importacao.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+DIRETORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ALVOS = {
+    "api": ("import", "main"),
+    "verificador": ("script", "verificador_pagamentos.py"),
+    "cora_checker": ("script", "cora_payment_status_checker.py"),
+    "mercadopago_checker": ("script", "mercado_pago_payment_status_checker.py"),
+}
+
+
+def _comando(tipo: str, alvo: str, importtime: bool = False) -> List[str]:
+    base = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    if tipo == "import":
+        return base + ["-c", f"import {alvo}"]
+    return base + [alvo, "--help"]
+
+
+def _ambiente() -> Dict[str, str]:
+    ambiente = dict(os.environ)
+    ambiente["PYTHONDONTWRITEBYTECODE"] = "0"
+    ambiente.setdefault("DB_BACKEND", "sqlite")
+    ambiente.setdefault("SQLITE_PATH", os.path.join(DIRETORIO, "benchmark.db"))
+    return ambiente
+
+
+def medir(tipo: str, alvo: str, repeticoes: int) -> Dict[str, float]:
+    """Executa o alvo `repeticoes` vezes (após uma execução para aquecer o cache de bytecode)."""
+    ambiente = _ambiente()
+    subprocess.run(_comando(tipo, alvo), cwd=DIRETORIO, env=ambiente, capture_output=True)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = subprocess.run(_comando(tipo, alvo), cwd=DIRETORIO, env=ambiente, capture_output=True)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if resultado.returncode != 0:
+            raise RuntimeError(f"{alvo} falhou: {resultado.stderr.decode(errors='replace')[-500:]}")
+    return {
+        "mediana_ms": round(statistics.median(tempos), 1),
+        "min_ms": round(min(tempos), 1),
+        "max_ms": round(max(tempos), 1),
+    }
+
+
+def modulos_mais_lentos(tipo: str, alvo: str, quantidade: int) -> List[Tuple[str, float]]:
+    """Módulos com maior tempo acumulado de importação (-X importtime)."""
+    resultado = subprocess.run(_comando(tipo, alvo, importtime=True), cwd=DIRETORIO, env=_ambiente(), capture_output=True)
+    acumulados = []
+    for linha in resultado.stderr.decode(errors="replace").splitlines():
+        m = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+(.+)$", linha)
+        if m:
+            acumulados.append((m.group(2).strip(), int(m.group(1)) / 1000))
+    return sorted(acumulados, key=lambda x: x[1], reverse=True)[:quantidade]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de inicialização a frio da API e dos verificadores")
+    parser.add_argument("--alvos", default=",".join(ALVOS), help="Lista separada por vírgulas: " + ", ".join(ALVOS))
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--detalhar", type=int, default=0, help="Mostra os N módulos mais lentos de cada alvo")
+    parser.add_argument("--saida", help="Arquivo JSON de resultado")
+    args = parser.parse_args()
+
+    resultados = {}
+    for nome in [a.strip() for a in args.alvos.split(",") if a.strip()]:
+        tipo, alvo = ALVOS[nome]
+        resultados[nome] = medir(tipo, alvo, args.repeticoes)
+        print(f"{nome:22s} mediana={resultados[nome]['mediana_ms']:8.1f} ms  "
+              f"min={resultados[nome]['min_ms']:8.1f} ms  max={resultados[nome]['max_ms']:8.1f} ms")
+        if args.detalhar:
+            resultados[nome]["modulos"] = modulos_mais_lentos(tipo, alvo, args.detalhar)
+            for modulo, ms in resultados[nome]["modulos"]:
+                print(f"    {ms:8.1f} ms  {modulo}")
+
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
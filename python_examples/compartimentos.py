@@ -0,0 +1,266 @@
+"""
+Compartimentos (bulkheads) por dependência externa: Cora, Mercado Pago, Supabase e banco.
+
+As rotas async dividiam o mesmo event loop e o threadpool padrão
+(asyncio.to_thread): um Supabase lento em confirmar_pagamento ocupava as
+threads de que os pagamentos com cartão precisavam. Cada dependência tem agora
+o seu Compartimento, com:
+
+- até `limite` chamadas em execução (threads próprias para código síncrono e
+  um semáforo para corrotinas httpx) e até `fila` aguardando; acima disso,
+  CompartimentoSaturado imediato (as rotas respondem 503);
+- timeout por chamada, contando a espera na fila (TempoEsgotado, 504);
+- ocupação e capacidade em resource_in_use/resource_capacity
+  (kind="bulkhead") e recusas em bulkhead_rejected_total.
+
+Os limites são por worker. Os executores são criados no primeiro uso de cada
+processo e liberados em encerrar() (lifespan do worker).
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+from config import (
+    COMPARTIMENTO_BANCO_FILA,
+    COMPARTIMENTO_BANCO_LIMITE,
+    COMPARTIMENTO_BANCO_TIMEOUT,
+    COMPARTIMENTO_CORA_FILA,
+    COMPARTIMENTO_CORA_LIMITE,
+    COMPARTIMENTO_CORA_TIMEOUT,
+    COMPARTIMENTO_SUPABASE_FILA,
+    COMPARTIMENTO_SUPABASE_LIMITE,
+    COMPARTIMENTO_SUPABASE_TIMEOUT,
+    MP_EXECUTOR_FILA,
+    MP_EXECUTOR_WORKERS,
+    MP_TIMEOUT,
+)
+from metrics import BULKHEAD_REJECTIONS, registrar_saturacao
+
+logger = logging.getLogger(__name__)
+
+
+class CompartimentoSaturado(Exception):
+    """Todas as posições de execução e de fila do compartimento estão ocupadas."""
+
+
+class TempoEsgotado(Exception):
+    """A chamada não terminou dentro do timeout do compartimento."""
+
+
+@dataclass
+class TempoChamada:
+    """Tempo gasto aguardando vaga (fila) e dentro da chamada (provedor), em segundos."""
+    prefixo: str = ""
+    fila: float = 0.0
+    provedor: float = 0.0
+
+    def server_timing(self) -> str:
+        return f"{self.prefixo}-fila;dur={self.fila * 1000:.1f}, {self.prefixo}-provedor;dur={self.provedor * 1000:.1f}"
+
+
+class Compartimento:
+    """
+    Capacidade isolada de uma dependência.
+
+    executar/chamar rodam funções síncronas nas threads do compartimento;
+    aguardar roda corrotinas sob o semáforo do compartimento. As vagas
+    (`limite` + `fila`) são comuns aos dois tipos de chamada.
+    """
+
+    def __init__(self, nome: str, descricao: str, limite: int, fila: int, timeout: float,
+                 prefixo_timing: Optional[str] = None):
+        self.nome = nome
+        self.descricao = descricao
+        self.limite = limite
+        self.fila = fila
+        self.timeout = timeout
+        self.prefixo_timing = prefixo_timing or nome
+        self._vagas = threading.BoundedSemaphore(limite + fila)
+        self._ocupadas = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def ocupadas(self) -> int:
+        """Chamadas em execução ou aguardando na fila."""
+        return self._ocupadas
+
+    @property
+    def capacidade(self) -> int:
+        return self.limite + self.fila
+
+    def _reservar(self):
+        if not self._vagas.acquire(blocking=False):
+            BULKHEAD_REJECTIONS.labels(self.nome, "saturated").inc()
+            raise CompartimentoSaturado(f"{self.descricao} indisponível no momento (compartimento saturado)")
+        with self._lock:
+            self._ocupadas += 1
+
+    def _liberar(self, _future=None):
+        with self._lock:
+            self._ocupadas -= 1
+        self._vagas.release()
+
+    def _tempo_esgotado(self, timeout: float) -> TempoEsgotado:
+        BULKHEAD_REJECTIONS.labels(self.nome, "timeout").inc()
+        return TempoEsgotado(f"{self.descricao} não respondeu em {timeout:.0f}s")
+
+    def _obter_executor(self) -> ThreadPoolExecutor:
+        # Um executor criado antes de um fork não tem threads no processo filho
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.limite, thread_name_prefix=self.nome)
+                self._pid = os.getpid()
+            return self._executor
+
+    async def executar(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> tuple:
+        """
+        Executa fn(*args, **kwargs) nas threads do compartimento.
+
+        Returns:
+            tuple: (resultado, TempoChamada)
+
+        Raises:
+            CompartimentoSaturado: se não houver vaga
+            TempoEsgotado: se a chamada exceder o timeout
+        """
+        timeout = timeout or self.timeout
+        self._reservar()
+
+        tempo = TempoChamada(prefixo=self.prefixo_timing)
+        enviado_em = time.perf_counter()
+
+        def tarefa():
+            inicio = time.perf_counter()
+            tempo.fila = inicio - enviado_em
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                tempo.provedor = time.perf_counter() - inicio
+
+        try:
+            # Copia o contexto para que o span da requisição continue na thread do compartimento
+            future = self._obter_executor().submit(contextvars.copy_context().run, tarefa)
+        except Exception:
+            self._liberar()
+            raise
+        # A vaga só é devolvida quando a thread termina, mesmo após o timeout
+        future.add_done_callback(self._liberar)
+
+        try:
+            resultado = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            # Cancela se ainda estiver na fila; se já estiver em execução, o timeout
+            # do cliente HTTP ou do driver (CORA_TIMEOUT, MP_TIMEOUT, DB_TIMEOUT_CONSULTA)
+            # encerra a chamada e a thread é liberada em seguida. Toda função executada
+            # aqui precisa de um desses timeouts.
+            future.cancel()
+            raise self._tempo_esgotado(timeout)
+        return resultado, tempo
+
+    async def chamar(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Como executar(), devolvendo apenas o resultado."""
+        resultado, _ = await self.executar(fn, *args, timeout=timeout, **kwargs)
+        return resultado
+
+    async def garantir(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Executa fn nas threads do compartimento sem recusa nem timeout.
+
+        Para gravações que registram algo que já aconteceu no provedor
+        (cobrança criada, pagamento com cartão aprovado): recusá-las ou
+        cancelá-las na fila perderia o registro. Entram na ocupação, mas não
+        consomem as vagas das chamadas comuns.
+        """
+        with self._lock:
+            self._ocupadas += 1
+
+        def liberar(_future=None):
+            with self._lock:
+                self._ocupadas -= 1
+
+        try:
+            future = self._obter_executor().submit(contextvars.copy_context().run, lambda: fn(*args, **kwargs))
+        except Exception:
+            liberar()
+            raise
+        future.add_done_callback(liberar)
+        # shield: se a requisição for cancelada (cliente desconectou), a gravação continua
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    async def aguardar(self, corrotina: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        Aguarda uma corrotina (ex.: chamada httpx) sob o limite do compartimento.
+
+        Raises:
+            CompartimentoSaturado: se não houver vaga (a corrotina é descartada)
+            TempoEsgotado: se a espera mais a chamada excederem o timeout
+        """
+        timeout = timeout or self.timeout
+        try:
+            self._reservar()
+        except CompartimentoSaturado:
+            corrotina.close()
+            raise
+
+        semaforo = self._semaforo_do_loop()
+
+        async def limitada():
+            async with semaforo:
+                return await corrotina
+
+        try:
+            return await asyncio.wait_for(limitada(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise self._tempo_esgotado(timeout)
+        finally:
+            # Expirada ainda na fila, a corrotina nunca chegou a ser iniciada
+            corrotina.close()
+            self._liberar()
+
+    def _semaforo_do_loop(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaforo = asyncio.Semaphore(self.limite)
+            self._loop = loop
+        return self._semaforo
+
+    def encerrar(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+cora = Compartimento("cora", "Cora", COMPARTIMENTO_CORA_LIMITE, COMPARTIMENTO_CORA_FILA, COMPARTIMENTO_CORA_TIMEOUT)
+mercadopago = Compartimento("mercadopago", "Mercado Pago", MP_EXECUTOR_WORKERS, MP_EXECUTOR_FILA, MP_TIMEOUT,
+                            prefixo_timing="mp")
+supabase = Compartimento("supabase", "Supabase", COMPARTIMENTO_SUPABASE_LIMITE, COMPARTIMENTO_SUPABASE_FILA,
+                         COMPARTIMENTO_SUPABASE_TIMEOUT)
+banco = Compartimento("banco", "Banco de dados", COMPARTIMENTO_BANCO_LIMITE, COMPARTIMENTO_BANCO_FILA,
+                      COMPARTIMENTO_BANCO_TIMEOUT)
+
+COMPARTIMENTOS: Dict[str, Compartimento] = {c.nome: c for c in (cora, mercadopago, supabase, banco)}
+
+for _compartimento in COMPARTIMENTOS.values():
+    registrar_saturacao(
+        _compartimento.nome, "bulkhead",
+        lambda compartimento=_compartimento: compartimento.ocupadas,
+        lambda compartimento=_compartimento: compartimento.capacidade,
+    )
+
+
+def encerrar():
+    """Libera as threads dos compartimentos deste processo (shutdown do worker)."""
+    for compartimento in COMPARTIMENTOS.values():
+        compartimento.encerrar()
@@ -7,10 +7,30 @@ load_dotenv()
 # === CORA ===
 CORA_CLIENT_ID = os.getenv("CORA_CLIENT_ID")
 CORA_SANDBOX = os.getenv("CORA_SANDBOX", "TRUE").upper() == "TRUE"
+# URLs sobrescrevíveis para apontar para os emuladores locais (python -m emuladores)
+CORA_API_URL = os.getenv("CORA_API_URL", "https://matls-clients.api.cora.com.br").rstrip("/")
+CORA_TOKEN_URL = os.getenv("CORA_TOKEN_URL", f"{CORA_API_URL}/token")
+CORA_INVOICES_URL = f"{CORA_API_URL}/v2/invoices/"
+CORA_CERT_PATH = os.getenv("CORA_CERT_PATH", "C:/cert_key_cora_production/certificate.pem")
+CORA_KEY_PATH = os.getenv("CORA_KEY_PATH", "C:/cert_key_cora_production/private-key.key")
+CORA_TOKEN_ANTECEDENCIA = int(os.getenv("CORA_TOKEN_ANTECEDENCIA", "300"))  # segundos antes de expirar em que o token é renovado
+CORA_TOKEN_JITTER = int(os.getenv("CORA_TOKEN_JITTER", "120"))  # antecipação extra aleatória, espalha as renovações entre processos
+CORA_TOKEN_BACKOFF_MAX = int(os.getenv("CORA_TOKEN_BACKOFF_MAX", "300"))  # espera máxima entre tentativas após falha em /token
+CORA_TOKEN_LEASE = int(os.getenv("CORA_TOKEN_LEASE", "45"))  # segundos em que um processo detém a renovação do token
+CORA_TOKEN_ESPERA = float(os.getenv("CORA_TOKEN_ESPERA", "5"))  # espera máxima pelo token renovado por outro processo
+CORA_TIMEOUT = float(os.getenv("CORA_TIMEOUT", "30"))  # segundos por requisição HTTP de criação de cobrança (libera a thread do compartimento)
+CORA_LOTE_CONCORRENCIA = int(os.getenv("CORA_LOTE_CONCORRENCIA", "10"))  # cobranças criadas ao mesmo tempo por lote (no máximo metade de COMPARTIMENTO_CORA_LIMITE)
+CORA_LOTE_INSERCAO = int(os.getenv("CORA_LOTE_INSERCAO", "200"))  # linhas por executemany em pagamentos
+CORA_LOTE_MAXIMO = int(os.getenv("CORA_LOTE_MAXIMO", "5000"))  # cobranças aceitas por requisição
 
 # === MERCADOPAGO ===
 MP_ACCESS_TOKEN = os.getenv("MP_ACCESS_TOKEN")
 MP_PUBLIC_KEY = os.getenv("MP_PUBLIC_KEY")
+MP_API_URL = os.getenv("MP_API_URL", "https://api.mercadopago.com").rstrip("/")
+MP_EXECUTOR_WORKERS = int(os.getenv("MP_EXECUTOR_WORKERS", "8"))
+MP_EXECUTOR_FILA = int(os.getenv("MP_EXECUTOR_FILA", "32"))  # chamadas aguardando thread livre
+MP_TIMEOUT = float(os.getenv("MP_TIMEOUT", "20"))  # segundos por chamada ao SDK
+MP_POOL_SIZE = int(os.getenv("MP_POOL_SIZE", "10"))  # conexões HTTP mantidas abertas
 
 # === SUPABASE ===
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -20,10 +40,95 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 DB_DRIVER = os.getenv("DB_DRIVER", "SQL+Server")
 DB_SERVER = os.getenv("DB_SERVER", "ITSERP\\ITSERPSRV")
 DB_NAME = os.getenv("DB_NAME", "ConectudoPDV")
+DB_CONNECTION_STRING = os.getenv(
+    "DB_CONNECTION_STRING",
+    "Driver={SQL Server};Server=ITSERP\\ITSERPSRV;Database=ConectudoPDV;Trusted_Connection=yes;"
+)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))  # conexões mantidas abertas por worker
+DB_POOL_MINIMO = int(os.getenv("DB_POOL_MINIMO", "2"))  # conexões abertas já no aquecimento do worker
+DB_TIMEOUT_CONEXAO = int(os.getenv("DB_TIMEOUT_CONEXAO", "10"))  # segundos para o login ODBC
+DB_TIMEOUT_CONSULTA = int(os.getenv("DB_TIMEOUT_CONSULTA", "30"))  # segundos por comando SQL (0 = sem limite); libera a thread do compartimento do banco
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlserver").lower()  # "sqlserver" ou "sqlite"
+SQLITE_PATH = os.getenv("SQLITE_PATH", "pagamentos.db")
+DB_EXPORTACAO_LOTE = int(os.getenv("DB_EXPORTACAO_LOTE", "1000"))  # linhas lidas por fetchmany em /pagamento/export
+
+# === VERIFICADORES ===
+COORDENACAO_TTL = int(os.getenv("COORDENACAO_TTL", "60"))  # segundos até o lease de uma réplica expirar
+
+# === REQUISIÇÕES DE SAÍDA ===
+HEDGE_HABILITADO = os.getenv("HEDGE_HABILITADO", "TRUE").upper() == "TRUE"
+HEDGE_PERCENTIL = float(os.getenv("HEDGE_PERCENTIL", "0.95"))  # percentil da latência observada após o qual o hedge é enviado
+HEDGE_AMOSTRAS = int(os.getenv("HEDGE_AMOSTRAS", "500"))  # latências recentes mantidas por endpoint
+HEDGE_AMOSTRAS_MINIMAS = int(os.getenv("HEDGE_AMOSTRAS_MINIMAS", "20"))  # sem hedge até o endpoint ter essas amostras
+HEDGE_ATRASO_MINIMO_MS = float(os.getenv("HEDGE_ATRASO_MINIMO_MS", "50"))
+HEDGE_ATRASO_MAXIMO_MS = float(os.getenv("HEDGE_ATRASO_MAXIMO_MS", "5000"))
+HEDGE_THREADS = int(os.getenv("HEDGE_THREADS", "32"))  # requisições com hedge em andamento por processo
+RETRY_ORCAMENTO_RAZAO = float(os.getenv("RETRY_ORCAMENTO_RAZAO", "0.1"))  # requisições extras (hedges e novas tentativas) por requisição original
+RETRY_ORCAMENTO_MINIMO = float(os.getenv("RETRY_ORCAMENTO_MINIMO", "1"))  # requisições extras por segundo sempre permitidas
+
+# === COMPARTIMENTOS (BULKHEADS) ===
+# Mercado Pago: MP_EXECUTOR_WORKERS, MP_EXECUTOR_FILA e MP_TIMEOUT
+# Cora: cada lote usa até CORA_LOTE_CONCORRENCIA vagas, limitado à metade de COMPARTIMENTO_CORA_LIMITE,
+# para que /cora/cobranca e /cora/api/cora/pix continuem atendidas durante um lote. Itens do lote
+# sem vaga (outros lotes ou cobranças avulsas) aguardam até COMPARTIMENTO_CORA_TIMEOUT em vez de falhar.
+COMPARTIMENTO_CORA_LIMITE = int(os.getenv("COMPARTIMENTO_CORA_LIMITE", "20"))  # chamadas simultâneas à Cora por worker
+COMPARTIMENTO_CORA_FILA = int(os.getenv("COMPARTIMENTO_CORA_FILA", "40"))  # chamadas aguardando vaga
+COMPARTIMENTO_CORA_TIMEOUT = float(os.getenv("COMPARTIMENTO_CORA_TIMEOUT", "30"))  # segundos por chamada, incluindo a fila
+COMPARTIMENTO_SUPABASE_LIMITE = int(os.getenv("COMPARTIMENTO_SUPABASE_LIMITE", "4"))
+COMPARTIMENTO_SUPABASE_FILA = int(os.getenv("COMPARTIMENTO_SUPABASE_FILA", "16"))
+COMPARTIMENTO_SUPABASE_TIMEOUT = float(os.getenv("COMPARTIMENTO_SUPABASE_TIMEOUT", "10"))
+COMPARTIMENTO_BANCO_LIMITE = int(os.getenv("COMPARTIMENTO_BANCO_LIMITE", str(DB_POOL_SIZE)))  # consultas simultâneas das rotas async
+COMPARTIMENTO_BANCO_FILA = int(os.getenv("COMPARTIMENTO_BANCO_FILA", "64"))
+COMPARTIMENTO_BANCO_TIMEOUT = float(os.getenv("COMPARTIMENTO_BANCO_TIMEOUT", "15"))
+
+# === ADMISSÃO ===
+ADMISSAO_HABILITADO = os.getenv("ADMISSAO_HABILITADO", "TRUE").upper() == "TRUE"
+ADMISSAO_LIMITE_INICIAL = float(os.getenv("ADMISSAO_LIMITE_INICIAL", "20"))  # requisições simultâneas por grupo de rotas e worker
+ADMISSAO_LIMITE_MINIMO = float(os.getenv("ADMISSAO_LIMITE_MINIMO", "2"))
+ADMISSAO_LIMITE_MAXIMO = float(os.getenv("ADMISSAO_LIMITE_MAXIMO", "100"))
+ADMISSAO_LATENCIA_MS = float(os.getenv("ADMISSAO_LATENCIA_MS", "3000"))  # respostas mais lentas que isso reduzem o limite
+ADMISSAO_REDUCAO = float(os.getenv("ADMISSAO_REDUCAO", "0.7"))  # fator aplicado ao limite a cada sinal de sobrecarga
+ADMISSAO_RETRY_AFTER = int(os.getenv("ADMISSAO_RETRY_AFTER", "2"))  # segundos sugeridos no 503
+
+# === DASHBOARD ===
+DASHBOARD_RESUMO_INTERVALO = int(os.getenv("DASHBOARD_RESUMO_INTERVALO", "60"))  # segundos entre atualizações de pagamentos_resumo (0 desliga)
+DASHBOARD_RESUMO_LEASE = int(os.getenv("DASHBOARD_RESUMO_LEASE", "300"))  # segundos até o lease de atualização expirar
+DASHBOARD_DIAS_RECENTES = int(os.getenv("DASHBOARD_DIAS_RECENTES", "2"))  # dias recalculados em toda atualização
+DASHBOARD_PERIODO_MAXIMO = int(os.getenv("DASHBOARD_PERIODO_MAXIMO", "366"))  # dias por consulta do dashboard
+
+# === EVENTOS (SSE) ===
+EVENTOS_FANOUT = os.getenv("EVENTOS_FANOUT", "banco").lower()  # "banco" (eventos_status entre processos) ou "local"
+EVENTOS_INTERVALO = float(os.getenv("EVENTOS_INTERVALO", "0.5"))  # segundos entre leituras de eventos_status por worker
+EVENTOS_RETENCAO = int(os.getenv("EVENTOS_RETENCAO", "3600"))  # segundos mantidos em eventos_status
+EVENTOS_FILA = int(os.getenv("EVENTOS_FILA", "16"))  # eventos pendentes por conexão SSE
+EVENTOS_KEEPALIVE = float(os.getenv("EVENTOS_KEEPALIVE", "15"))  # segundos entre comentários de keep-alive
+EVENTOS_DURACAO_MAXIMA = int(os.getenv("EVENTOS_DURACAO_MAXIMA", "1800"))  # segundos até o servidor encerrar o stream (o cliente reconecta)
+EVENTOS_CONEXOES_MAXIMAS = int(os.getenv("EVENTOS_CONEXOES_MAXIMAS", "2000"))  # conexões SSE por worker
+
+# === AQUECIMENTO ===
+AQUECIMENTO_HABILITADO = os.getenv("AQUECIMENTO_HABILITADO", "TRUE").upper() == "TRUE"
+AQUECIMENTO_TIMEOUT = float(os.getenv("AQUECIMENTO_TIMEOUT", "15"))  # segundos para todas as etapas do aquecimento
+AQUECIMENTO_OBRIGATORIAS = [e.strip() for e in os.getenv("AQUECIMENTO_OBRIGATORIAS", "banco").split(",") if e.strip()]  # etapas sem as quais o worker não fica pronto
+
+# === SERVIDOR ===
+SERVIDOR_HOST = os.getenv("SERVIDOR_HOST", "0.0.0.0")
+SERVIDOR_PORTA = int(os.getenv("SERVIDOR_PORTA", "8000"))
+SERVIDOR_WORKERS = int(os.getenv("SERVIDOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))  # conexões HTTP mantidas abertas por worker e cliente
 
 # === OUTROS ===
 DEBUG = os.getenv("DEBUG", "FALSE").upper() == "TRUE"
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_JSON = os.getenv("LOG_JSON", "TRUE").upper() == "TRUE"
+LOG_AMOSTRAGEM = float(os.getenv("LOG_AMOSTRAGEM", "0.1"))  # fração mantida dos logs de sucesso de alto volume
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "14"))
+
+# === TRACING ===
+TRACE_HABILITADO = os.getenv("TRACE_HABILITADO", "TRUE").upper() == "TRUE"
+TRACE_ARQUIVO = os.getenv("TRACE_ARQUIVO", "traces.jsonl")
+TRACE_AMOSTRAGEM = float(os.getenv("TRACE_AMOSTRAGEM", "0.01"))  # fração de traces comuns exportados
+TRACE_LENTO_MS = float(os.getenv("TRACE_LENTO_MS", "1000"))  # traces mais lentos que isso são sempre exportados
 
 # === COMPOSIÇÃO DE STRINGS ===
 SQLALCHEMY_DATABASE_URL = f"mssql+pyodbc://@{DB_SERVER}/{DB_NAME}?driver={DB_DRIVER}"
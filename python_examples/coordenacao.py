@@ -0,0 +1,117 @@
+"""
+Coordenação entre réplicas dos verificadores de pagamento.
+
+Cada réplica mantém um lease na tabela `checker_replicas`, renovado por uma
+thread de fundo a cada COORDENACAO_TTL / 3 segundos. A cada ciclo, o conjunto
+de pagamentos pendentes é dividido entre as réplicas vivas por hash da
+`referencia` (crc32 % total): cada pagamento é consultado e atualizado por
+uma única réplica.
+
+Quando uma réplica para de renovar, seu lease expira em até COORDENACAO_TTL
+segundos e as demais passam a assumir a parte dela no ciclo seguinte
+(rebalanceamento automático). Durante a transição um pagamento pode ser
+consultado por duas réplicas; as atualizações são idempotentes.
+
+Uso:
+    coordenador = CoordenadorReplicas("cora_checker")
+    coordenador.iniciar()
+    pendentes = coordenador.filtrar(pendentes)
+"""
+
+import os
+import uuid
+import zlib
+import socket
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from config import COORDENACAO_TTL
+from repositorio import PagamentosRepository, obter_repositorio
+
+logger = logging.getLogger(__name__)
+
+
+class CoordenadorReplicas:
+    """Lease de réplica e divisão dos pagamentos pendentes entre as réplicas vivas."""
+
+    def __init__(self, servico: str, ttl: int = COORDENACAO_TTL, replica_id: Optional[str] = None,
+                 repositorio: Optional[PagamentosRepository] = None):
+        self.servico = servico
+        self.ttl = ttl
+        self.replica_id = replica_id or os.getenv("REPLICA_ID") or \
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._repositorio = repositorio
+        self._replicas: List[str] = []
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def repositorio(self) -> PagamentosRepository:
+        return self._repositorio or obter_repositorio()
+
+    def renovar(self) -> List[str]:
+        """Renova o lease e atualiza a lista de réplicas vivas."""
+        replicas = self.repositorio.renovar_replica(self.servico, self.replica_id, self.ttl)
+        with self._lock:
+            if replicas != self._replicas:
+                logger.info("Réplicas de %s: %s (esta: %s)", self.servico, replicas, self.replica_id)
+            self._replicas = replicas
+        return replicas
+
+    def iniciar(self):
+        """Registra a réplica e inicia a renovação periódica do lease."""
+        self.renovar()
+        self._thread = threading.Thread(target=self._executar, name=f"lease-{self.servico}", daemon=True)
+        self._thread.start()
+
+    def encerrar(self):
+        """Para a renovação e libera o lease para as demais réplicas assumirem imediatamente."""
+        self._parar.set()
+        try:
+            self.repositorio.remover_replica(self.servico, self.replica_id)
+        except Exception as e:
+            logger.warning(f"Falha ao liberar lease de {self.replica_id}: {str(e)}")
+
+    def _executar(self):
+        while not self._parar.wait(self.ttl / 3):
+            try:
+                self.renovar()
+            except Exception as e:
+                logger.error(f"Falha ao renovar lease de {self.replica_id}: {str(e)}")
+
+    def particao(self):
+        """
+        Returns:
+            tuple: (índice desta réplica, total de réplicas vivas) ou None se o lease não está ativo
+        """
+        with self._lock:
+            if self.replica_id not in self._replicas:
+                return None
+            return self._replicas.index(self.replica_id), len(self._replicas)
+
+    def pertence(self, referencia: str) -> bool:
+        particao = self.particao()
+        if particao is None:
+            return False
+        indice, total = particao
+        return zlib.crc32(str(referencia).encode("utf-8")) % total == indice
+
+    def filtrar(self, pendentes: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Mantém apenas os pagamentos desta réplica.
+
+        O lease é renovado antes da divisão; se não for possível renová-lo,
+        nenhum pagamento é processado neste ciclo (evita duplicar o trabalho de outra réplica).
+        """
+        try:
+            self.renovar()
+        except Exception as e:
+            logger.error(f"Lease indisponível, ciclo ignorado: {str(e)}")
+            return []
+        meus = [p for p in pendentes if self.pertence(p["id"])]
+        particao = self.particao()
+        if particao:
+            logger.info("Réplica %d/%d: %d de %d pagamentos pendentes", particao[0] + 1, particao[1], len(meus), len(pendentes))
+        return meus
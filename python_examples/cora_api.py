@@ -2,37 +2,29 @@ import httpx
 from datetime import date
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from database import get_db_connection
-from config import CORA_SANDBOX
+from repositorio import Pagamento, obter_repositorio
+from config import CORA_SANDBOX, CORA_INVOICES_URL, CORA_TIMEOUT
 from requisicaotokencora import obter_token_cora
 from responses import PixResponse , ErroPadrao
-import requests
+import http_clientes
 from models import CriarCobrancaRequest , Dict
+from instrumentacao import chamada_externa
+from compartimentos import CompartimentoSaturado, TempoEsgotado, banco, cora
 import logging
-import pyodbc
 
 logger = logging.getLogger(__name__)
-url = f"https://matls-clients.api.cora.com.br/v2/invoices/"
+url = CORA_INVOICES_URL
 
-DATABASE_URL = (
-    "Driver={SQL Server};"
-    "Server=ITSERP\\ITSERPSRV;"
-    "Database=ConectudoPDV;"
-    "Trusted_Connection=yes;"
-)
-
-def gerar_boleto(payload: CriarCobrancaRequest):
-    url = f"https://matls-clients.api.cora.com.br/v2/invoices/"
-    token = obter_token_cora()
-
-    headers = {
+def _cabecalhos(payload: CriarCobrancaRequest, token: str) -> Dict[str, str]:
+    return {
     "accept": "application/json",
     "Idempotency-Key": payload.referencia,
     "content-type": "application/json",
     "authorization": f"Bearer {token}"}
-    
 
-    data = {
+
+def _dados_cobranca(payload: CriarCobrancaRequest) -> Dict:
+    return {
         "code": payload.referencia,
         "total_amount": payload.amount,
         "customer": {
@@ -55,79 +47,78 @@ def gerar_boleto(payload: CriarCobrancaRequest):
         "payment_terms": {
             "due_date": payload.vencimento
         },
-        "payment_forms": ["BANK_SLIP"]
     }
 
-    logger.info(f"Enviando solicitação para Cora (boleto): {url}")
-    logger.info(f"header da solicitação: {headers}")
-    logger.info(f"Corpo da solicitação: {data}")
-    response = requests.post(url, headers=headers, json=data)
-    logger.info(f"Resposta do Cora - Status: {response.status_code}")
-    logger.info(f"Corpo da resposta: {response.json()}")
-    return response.json()
 
-
-def gerar_pix(payload: CriarCobrancaRequest):
-    url = f"https://matls-clients.api.cora.com.br/v2/invoices/"
-    token = obter_token_cora()
-    logger.info(f"token pix: {token}")
-
-    headers = {
-    "accept": "application/json",
-    "Idempotency-Key": payload.referencia,
-    "content-type": "application/json",
-    "authorization": f"Bearer {token}"}
-    
-    logger.info(f"heADER DE AY pix: {headers}")
+def _dados_boleto(payload: CriarCobrancaRequest) -> Dict:
+    data = _dados_cobranca(payload)
+    data["payment_forms"] = ["BANK_SLIP"]
+    return data
 
 
-    data = {
-        "code": payload.referencia,
-        "total_amount": payload.amount,
-        "customer": {
-            "name": payload.nome,
-            "email": payload.email,
-            "document": {
-                "identity": payload.documento,
-                "type": "CPF"
+def _dados_pix(payload: CriarCobrancaRequest) -> Dict:
+    data = _dados_cobranca(payload)
+    data["payment_forms"] = ["PIX"]
+    data["notification"] = {
+        "name": payload.notification_name or payload.nome,
+        "channels": [
+            {
+                "channel": "EMAIL",
+                "contact": payload.notification_email or payload.email,
+                "rules": ["NOTIFY_TWO_DAYS_BEFORE_DUE_DATE", "NOTIFY_WHEN_PAID"]
             },
-            "phone": payload.telefone,
-            "address": payload.endereco.dict()
-        },
-        "services": [
             {
-                "name": payload.descricao,
-                "description": payload.descricao,
-                "amount": payload.amount
+                "channel": "SMS",
+                "contact": payload.notification_sms or payload.telefone,
+                "rules": ["NOTIFY_TWO_DAYS_BEFORE_DUE_DATE", "NOTIFY_WHEN_PAID"]
             }
-        ],
-        "payment_terms": {
-            "due_date": payload.vencimento
-        },
-        "payment_forms": ["PIX"],
-        "notification": {
-            "name": payload.notification_name or payload.nome,
-            "channels": [
-                {
-                    "channel": "EMAIL",
-                    "contact": payload.notification_email or payload.email,
-                    "rules": ["NOTIFY_TWO_DAYS_BEFORE_DUE_DATE", "NOTIFY_WHEN_PAID"]
-                },
-                {
-                    "channel": "SMS",
-                    "contact": payload.notification_sms or payload.telefone,
-                    "rules": ["NOTIFY_TWO_DAYS_BEFORE_DUE_DATE", "NOTIFY_WHEN_PAID"]
-                }
-            ]
-        }
+        ]
     }
+    return data
+
+
+def gerar_boleto(payload: CriarCobrancaRequest):
+    url = CORA_INVOICES_URL
+    token = obter_token_cora()
+
+    headers = _cabecalhos(payload, token)
+    data = _dados_boleto(payload)
+
+    logger.info("Enviando solicitação para Cora (boleto): %s", payload.referencia)
+    logger.debug("Corpo da solicitação: %s", data)
+    with chamada_externa("cora", "create_invoice"):
+        # Timeout explícito: uma conexão presa manteria a thread e a vaga do compartimento da Cora
+        response = http_clientes.sessao().post(url, headers=headers, json=data, timeout=CORA_TIMEOUT)
+    resultado = response.json()
+    logger.info("Resposta do Cora - Status: %s", response.status_code, extra={"referencia": payload.referencia})
+    logger.debug("Corpo da resposta: %s", resultado)
+    return resultado
+
+
+def gerar_pix(payload: CriarCobrancaRequest):
+    url = CORA_INVOICES_URL
+    token = obter_token_cora()
 
-    logger.info(f"Enviando solicitação para Cora (PIX): {url}")
-    logger.info(f"header da solicitação: {headers}")
-    logger.info(f"Corpo da solicitação: {data}")
-    response = requests.post(url, headers=headers, json=data)
-    logger.info(f"Resposta do Cora - Status: {response.status_code}")
-    logger.info(f"Corpo da resposta: {response.json()}")
+    headers = _cabecalhos(payload, token)
+    data = _dados_pix(payload)
+
+    logger.info("Enviando solicitação para Cora (PIX): %s", payload.referencia)
+    logger.debug("Corpo da solicitação: %s", data)
+    with chamada_externa("cora", "create_invoice"):
+        response = http_clientes.sessao().post(url, headers=headers, json=data, timeout=CORA_TIMEOUT)
+    resultado = response.json()
+    logger.info("Resposta do Cora - Status: %s", response.status_code, extra={"referencia": payload.referencia})
+    logger.debug("Corpo da resposta: %s", resultado)
+    return resultado
+
+
+async def gerar_cobranca_async(payload: CriarCobrancaRequest, token: str) -> Dict:
+    """Cria boleto ou PIX pelo cliente HTTP assíncrono (usado na criação em lote)."""
+    data = _dados_pix(payload) if payload.tipo == "pix" else _dados_boleto(payload)
+    with chamada_externa("cora", "create_invoice"):
+        response = await http_clientes.cliente_async().post(CORA_INVOICES_URL, headers=_cabecalhos(payload, token), json=data)
+    logger.info("Resposta do Cora - Status: %s", response.status_code,
+                extra={"referencia": payload.referencia, "amostra": "cora.lote"})
     return response.json()
 
 
@@ -138,38 +129,29 @@ router = APIRouter()
 # ============================
 @router.post("/cora/pix", response_model=PixResponse, responses={500: {"model": ErroPadrao}})
 async def criar_pix_endpoint(payload: CriarCobrancaRequest):
-    logger.info(">>> Iniciando endpoint criar_pix_endpoint com payload:")
-    logger.info(payload)    
+    logger.info("Iniciando endpoint criar_pix_endpoint: %s", payload.referencia)
     try:
-        conn = pyodbc.connect(DATABASE_URL)
         # Obtem token via função externa já com controle de expiração (se implementado)
-        token = obter_token_cora()
+        token = await cora.chamar(obter_token_cora)
         logger.info("Tentando inserir pagamento no banco de dados...")
 
-        resultado = gerar_pix(payload)
-
-        # Insert into pagamentos
-        cursor = conn.cursor()
-        query = """
-            INSERT INTO pagamentos (referencia, valor, nome, documento, status, tipo, origem)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        values = (
-            payload.referencia,
-            payload.amount,
-            payload.nome,
-            payload.documento,
-            "pendente",
-            "pix",
-            "cora"
-        )
-        cursor.execute(query, values)
-        logger.info("Query executada com sucesso")
-        conn.commit()
-        logger.info("Commit realizado com sucesso")
+        resultado = await cora.chamar(gerar_pix, payload)
 
+        # Insert into pagamentos (PIX já criado na Cora: a gravação não é recusada pelo compartimento do banco)
+        await banco.garantir(obter_repositorio().inserir_pagamento, Pagamento(
+            referencia=payload.referencia,
+            valor=payload.amount,
+            nome=payload.nome,
+            documento=payload.documento,
+            status="pendente",
+            tipo="pix",
+            origem="cora"
+        ), registrar_datas=False)
+        logger.info("Pagamento registrado com sucesso")
 
         return {"mensagem": "PIX gerado com sucesso", "qr_code": resultado.get("pix")}
 
+    except (CompartimentoSaturado, TempoEsgotado):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
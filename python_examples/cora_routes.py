@@ -1,75 +1,60 @@
 from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import StreamingResponse
+import asyncio
 import logging
-from models import CriarCobrancaRequest, CriarCobrancaResponse
-from cora_api import gerar_boleto, gerar_pix
-from database import get_db_connection
-from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from models import CriarCobrancaRequest, CriarCobrancaResponse, ResultadoCobrancaLote
+from cora_api import gerar_boleto, gerar_cobranca_async, gerar_pix
+from config import (
+    COMPARTIMENTO_CORA_LIMITE,
+    COMPARTIMENTO_CORA_TIMEOUT,
+    CORA_LOTE_CONCORRENCIA,
+    CORA_LOTE_INSERCAO,
+    CORA_LOTE_MAXIMO,
+)
+from repositorio import Pagamento, PagamentosRepository, get_repositorio
+from requisicaotokencora import obter_token_cora
+from serializacao import dumps
+from eventos_pagamentos import publicar_status
+from compartimentos import CompartimentoSaturado, TempoEsgotado, banco, cora
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/cora", tags=["Cora"])
 
+# Um lote nunca ocupa mais da metade do compartimento da Cora
+CONCORRENCIA_LOTE = max(1, min(CORA_LOTE_CONCORRENCIA, COMPARTIMENTO_CORA_LIMITE // 2))
+
 
 @router.post("/cobranca", response_model=CriarCobrancaResponse)
-async def criar_cobranca(payload: CriarCobrancaRequest, request: Request):
-    logger.info(f"Corpo da solicitação recebida: {payload}")
+async def criar_cobranca(payload: CriarCobrancaRequest, request: Request,
+                         repositorio: PagamentosRepository = Depends(get_repositorio)):
+    logger.info("Cobrança recebida: referencia=%s tipo=%s", payload.referencia, payload.tipo)
     payloadtxt= str(payload)
     try:
         if payload.tipo == "boleto":
-            resultado = gerar_boleto(payload)
+            resultado = await cora.chamar(gerar_boleto, payload)
         elif payload.tipo == "pix":
-            resultado = gerar_pix(payload)
+            resultado = await cora.chamar(gerar_pix, payload)
         else:
             raise HTTPException(status_code=400, detail="Tipo inválido")
 
         if "id" not in resultado:
-            logger.error(f"Erro na resposta do Cora: {resultado}")
+            logger.error("Erro na resposta do Cora: %s", resultado)
             raise HTTPException(status_code=500, detail=resultado.get("message", "Erro desconhecido"))
 
-        url_pagamento = (
-            resultado.get("payment_url") or
-            resultado.get("payload") or
-            resultado.get("qr_code", {}).get("image_url")
-        )
+        url_pagamento = _url_resposta(resultado)
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                DELETE FROM pagamentos
-                WHERE referencia_externa = ? AND status = 'rejected'
-            """, (payload.referencia,))
-            conn.commit()
-
-            cursor.execute("""
-                SELECT COUNT(*) FROM pagamentos
-                WHERE referencia_externa = ? AND status = 'approved'
-            """, (payload.referencia,))
-            if cursor.fetchone()[0] > 0:
-                raise HTTPException(status_code=400, detail="Já existe um pagamento aprovado para essa inscrição.")
-
-            cursor.execute("""
-    INSERT INTO pagamentos (
-        referencia, valor, nome, documento, status, tipo, origem,
-        criado_em, referencia_externa, status_detail, atualizado_em, url_pagamento , requisicaooriginal
-    )
-    VALUES (?, ?, ?, ?, ?, ?, ?, getdate(), ?, ?, getdate(), ?, ?)
-""", (
-    resultado["id"],
-    payload.amount / 100,
-    payload.nome,
-    payload.documento,
-    resultado["status"],
-    payload.tipo.upper(),
-    "cora",
-    resultado.get("code"),  # referência externa
-    "",  # status_detail não veio na resposta da Cora
-    resultado.get("pix", {}).get("emv") if payload.tipo == "pix" else resultado.get("payment_options", {}).get("bank_slip", {}).get("url"),
-    payloadtxt
-    
-))
-
-            conn.commit()
+        # Cobrança já criada na Cora: as gravações não são recusadas pelo compartimento do banco
+        await banco.garantir(repositorio.remover_rejeitados, payload.referencia)
+
+        if await banco.garantir(repositorio.existe_aprovado, payload.referencia):
+            raise HTTPException(status_code=400, detail="Já existe um pagamento aprovado para essa inscrição.")
+
+        pagamento = _pagamento(payload, resultado, payloadtxt)
+        await banco.garantir(repositorio.inserir_pagamento, pagamento)
+        await banco.garantir(publicar_status, pagamento.referencia_externa, pagamento.status,
+                             referencia=pagamento.referencia)
 
         return CriarCobrancaResponse(
             id=resultado["id"],
@@ -79,8 +64,153 @@ async def criar_cobranca(payload: CriarCobrancaRequest, request: Request):
             vencimento=payload.vencimento
         )
 
-    except HTTPException:
+    except (HTTPException, CompartimentoSaturado, TempoEsgotado):
+        # CompartimentoSaturado e TempoEsgotado viram 503/504 nos handlers de main.py
         raise
     except Exception as e:
-        logger.error(f"Erro ao processar cobrança: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.error("Erro ao processar cobrança: %s", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _url_resposta(resultado: Dict[str, Any]) -> Optional[str]:
+    return (
+        resultado.get("payment_url") or
+        resultado.get("payload") or
+        resultado.get("qr_code", {}).get("image_url")
+    )
+
+
+def _pagamento(payload: CriarCobrancaRequest, resultado: Dict[str, Any], payloadtxt: str) -> Pagamento:
+    return Pagamento(
+        referencia=resultado["id"],
+        valor=payload.amount / 100,
+        nome=payload.nome,
+        documento=payload.documento,
+        status=resultado["status"],
+        tipo=payload.tipo.upper(),
+        origem="cora",
+        referencia_externa=resultado.get("code"),  # referência externa
+        status_detail="",  # status_detail não veio na resposta da Cora
+        url_pagamento=resultado.get("pix", {}).get("emv") if payload.tipo == "pix" else resultado.get("payment_options", {}).get("bank_slip", {}).get("url"),
+        requisicaooriginal=payloadtxt
+    )
+
+
+@router.post(
+    "/cobrancas/lote",
+    response_class=StreamingResponse,
+    responses={200: {
+        "content": {"application/x-ndjson": {}},
+        "description": "Uma linha ResultadoCobrancaLote por cobrança, na ordem em que terminam",
+    }},
+)
+async def criar_cobrancas_lote(payloads: List[CriarCobrancaRequest],
+                               repositorio: PagamentosRepository = Depends(get_repositorio)):
+    """
+    Cria várias cobranças na Cora, até CONCORRENCIA_LOTE ao mesmo tempo, e
+    grava os pagamentos em lotes de até CORA_LOTE_INSERCAO linhas.
+
+    O resultado de cada cobrança é enviado em NDJSON assim que ela é criada e
+    gravada; falhas de um item não interrompem os demais.
+    """
+    if not payloads:
+        raise HTTPException(status_code=400, detail="Lote vazio")
+    if len(payloads) > CORA_LOTE_MAXIMO:
+        raise HTTPException(status_code=413, detail=f"Máximo de {CORA_LOTE_MAXIMO} cobranças por lote")
+    logger.info("Lote de cobranças recebido: %d itens", len(payloads))
+
+    referencias = [p.referencia for p in payloads]
+    try:
+        token = await cora.chamar(obter_token_cora)
+        await banco.chamar(repositorio.remover_rejeitados_lote, referencias)
+        aprovadas = await banco.chamar(repositorio.referencias_aprovadas, referencias)
+    except (CompartimentoSaturado, TempoEsgotado):
+        raise
+    except Exception as e:
+        logger.error("Erro ao preparar lote de cobranças: %s", str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        _processar_lote(payloads, token, aprovadas, repositorio),
+        media_type="application/x-ndjson",
+    )
+
+
+async def _criar_aguardando_vaga(payload: CriarCobrancaRequest, token: str) -> Dict:
+    """
+    Cria uma cobrança do lote no compartimento da Cora. Com o compartimento cheio
+    (outro lote ou cobranças avulsas), o item espera uma vaga até
+    COMPARTIMENTO_CORA_TIMEOUT em vez de falhar com CompartimentoSaturado.
+    """
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + COMPARTIMENTO_CORA_TIMEOUT
+    espera = 0.05
+    while True:
+        try:
+            return await cora.aguardar(gerar_cobranca_async(payload, token))
+        except CompartimentoSaturado:
+            if loop.time() + espera >= limite:
+                raise
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, 1.0)
+
+
+async def _processar_lote(payloads: List[CriarCobrancaRequest], token: str, aprovadas: Set[str],
+                          repositorio: PagamentosRepository) -> AsyncIterator[bytes]:
+    semaforo = asyncio.Semaphore(CONCORRENCIA_LOTE)
+    fila: "asyncio.Queue[Tuple[ResultadoCobrancaLote, Optional[Pagamento]]]" = asyncio.Queue()
+
+    def falha(indice: int, payload: CriarCobrancaRequest, erro: str) -> Tuple[ResultadoCobrancaLote, None]:
+        return ResultadoCobrancaLote(indice=indice, referencia=payload.referencia, ok=False, erro=erro), None
+
+    async def criar(indice: int, payload: CriarCobrancaRequest):
+        try:
+            async with semaforo:
+                resultado = await _criar_aguardando_vaga(payload, token)
+        except Exception as e:
+            logger.error("Erro ao criar cobrança %s do lote: %s", payload.referencia, str(e))
+            await fila.put(falha(indice, payload, str(e)))
+            return
+        if "id" not in resultado:
+            await fila.put(falha(indice, payload, resultado.get("message", "Erro desconhecido")))
+            return
+        linha = ResultadoCobrancaLote(indice=indice, referencia=payload.referencia, ok=True, id=resultado["id"],
+                                      status=resultado["status"], url_pagamento=_url_resposta(resultado))
+        await fila.put((linha, _pagamento(payload, resultado, str(payload))))
+
+    vistas: Set[str] = set()
+    tarefas = []
+    for indice, payload in enumerate(payloads):
+        if payload.referencia in aprovadas:
+            fila.put_nowait(falha(indice, payload, "Já existe um pagamento aprovado para essa inscrição."))
+        elif payload.referencia in vistas:
+            fila.put_nowait(falha(indice, payload, "Referência repetida no lote"))
+        else:
+            vistas.add(payload.referencia)
+            tarefas.append(asyncio.create_task(criar(indice, payload)))
+
+    restantes = len(payloads)
+    try:
+        while restantes:
+            # Tudo o que terminou enquanto o lote anterior era gravado entra no mesmo executemany
+            lote = [await fila.get()]
+            while len(lote) < CORA_LOTE_INSERCAO and not fila.empty():
+                lote.append(fila.get_nowait())
+            restantes -= len(lote)
+
+            pagamentos = [pagamento for _, pagamento in lote if pagamento is not None]
+            if pagamentos:
+                try:
+                    await banco.garantir(repositorio.inserir_pagamentos, pagamentos)
+                except Exception as e:
+                    logger.error("Erro ao gravar %d cobranças do lote: %s", len(pagamentos), str(e))
+                    for linha, pagamento in lote:
+                        if pagamento is not None:
+                            linha.ok = False
+                            linha.erro = f"Cobrança criada na Cora, mas não gravada: {e}"
+
+            yield b"".join(dumps(linha.dict()) + b"\n" for linha, _ in lote)
+    finally:
+        # Cliente desconectou: as cobranças ainda não enviadas à Cora são canceladas
+        for tarefa in tarefas:
+            tarefa.cancel()
@@ -0,0 +1,89 @@
+"""
+Rotas do dashboard (StaffDailyReport e relatórios por período).
+
+As leituras vêm de pagamentos_resumo, com uma linha por dia, origem, tipo e
+status mantida por dashboard/resumo.py; cada consulta lê poucas linhas em vez
+de agrupar a tabela pagamentos. Os totais refletem o banco até
+`atualizado_em` (no máximo DASHBOARD_RESUMO_INTERVALO segundos de atraso).
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query
+from config import DASHBOARD_PERIODO_MAXIMO
+from repositorio import PagamentosRepository, get_repositorio
+from responses import ResumoDiaResponse, ResumoPagamentosResponse
+
+logger = logging.getLogger(__name__)
+
+dashboard_router = APIRouter(tags=["dashboard"])
+
+DIMENSOES = ("dia", "origem", "tipo", "status")
+
+
+def _agregar(linhas: List[Dict], dimensoes: Tuple[str, ...]) -> Dict[Tuple, Dict[str, float]]:
+    grupos: Dict[Tuple, Dict[str, float]] = {}
+    for linha in linhas:
+        chave = tuple(str(linha[d]) for d in dimensoes)
+        grupo = grupos.setdefault(chave, {"quantidade": 0, "valor_total": 0.0})
+        grupo["quantidade"] += linha["quantidade"]
+        grupo["valor_total"] += linha["valor_total"]
+    for grupo in grupos.values():
+        grupo["valor_total"] = round(grupo["valor_total"], 2)
+    return grupos
+
+
+def _atualizado_em(repositorio: PagamentosRepository) -> Optional[str]:
+    marca = repositorio.marca_resumo_pagamentos()
+    return marca.isoformat() if marca else None
+
+
+@dashboard_router.get("/resumo", response_model=ResumoPagamentosResponse)
+def resumo_pagamentos(
+    desde: Optional[date] = Query(None, description="Primeiro dia (padrão: 30 dias atrás)"),
+    ate: Optional[date] = Query(None, description="Último dia, inclusive (padrão: hoje)"),
+    origem: Optional[str] = None,
+    tipo: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    agrupar: str = Query(",".join(DIMENSOES), description="Dimensões separadas por vírgula: " + ", ".join(DIMENSOES)),
+    repositorio: PagamentosRepository = Depends(get_repositorio),
+):
+    """Totais (quantidade e valor) no período, agrupados pelas dimensões pedidas."""
+    ate = ate or date.today()
+    desde = desde or ate - timedelta(days=30)
+    dimensoes = tuple(d.strip() for d in agrupar.split(",") if d.strip())
+    invalidas = [d for d in dimensoes if d not in DIMENSOES]
+    if invalidas:
+        raise HTTPException(status_code=400, detail=f"Dimensões inválidas: {', '.join(invalidas)}")
+    if desde > ate or (ate - desde).days >= DASHBOARD_PERIODO_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"Período inválido (máximo de {DASHBOARD_PERIODO_MAXIMO} dias)")
+
+    linhas = repositorio.ler_resumo_pagamentos(desde, ate, origem=origem, tipo=tipo, status=status)
+    total = _agregar(linhas, ()).get((), {"quantidade": 0, "valor_total": 0.0})
+    return {
+        "desde": desde.isoformat(),
+        "ate": ate.isoformat(),
+        "atualizado_em": _atualizado_em(repositorio),
+        "total": total,
+        "linhas": [{**dict(zip(dimensoes, chave)), **valores} for chave, valores in _agregar(linhas, dimensoes).items()],
+    }
+
+
+@dashboard_router.get("/dia", response_model=ResumoDiaResponse)
+def resumo_dia(
+    dia: Optional[date] = Query(None, description="Dia do relatório (padrão: hoje)"),
+    origem: Optional[str] = None,
+    repositorio: PagamentosRepository = Depends(get_repositorio),
+):
+    """Relatório diário: total do dia e quebras por status, origem e tipo."""
+    dia = dia or date.today()
+    linhas = repositorio.ler_resumo_pagamentos(dia, dia, origem=origem)
+    return {
+        "dia": dia.isoformat(),
+        "atualizado_em": _atualizado_em(repositorio),
+        "total": _agregar(linhas, ()).get((), {"quantidade": 0, "valor_total": 0.0}),
+        "por_status": {chave[0]: valores for chave, valores in _agregar(linhas, ("status",)).items()},
+        "por_origem": {chave[0]: valores for chave, valores in _agregar(linhas, ("origem",)).items()},
+        "por_tipo": {chave[0]: valores for chave, valores in _agregar(linhas, ("tipo",)).items()},
+    }
@@ -0,0 +1,110 @@
+"""
+Manutenção de pagamentos_resumo, a tabela lida pelo dashboard.
+
+Uma thread de fundo em cada worker da API chama
+atualizar_resumo_pagamentos a cada DASHBOARD_RESUMO_INTERVALO segundos; o
+lease em resumo_marcas garante que só um processo recalcula por vez e os
+demais simplesmente pulam a rodada. Cada rodada recalcula apenas os dias com
+pagamentos novos ou alterados desde a última marca d'água.
+
+Reconstrução completa (após carga manual, remoções antigas etc.):
+    python -m dashboard.resumo --completo
+"""
+
+import os
+import time
+import socket
+import logging
+import argparse
+import threading
+from typing import Optional
+
+from config import DASHBOARD_DIAS_RECENTES, DASHBOARD_RESUMO_INTERVALO, DASHBOARD_RESUMO_LEASE
+from repositorio import obter_repositorio
+
+logger = logging.getLogger(__name__)
+
+
+def _dono() -> str:
+    """Identifica este processo no lease de atualização."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def atualizar_resumo(completo: bool = False) -> Optional[int]:
+    """
+    Executa uma rodada de atualização.
+
+    Returns:
+        int: dias recalculados, ou None se outro processo está atualizando
+    """
+    inicio = time.perf_counter()
+    dias = obter_repositorio().atualizar_resumo_pagamentos(
+        _dono(), DASHBOARD_RESUMO_LEASE, dias_recentes=DASHBOARD_DIAS_RECENTES, completo=completo
+    )
+    if dias is not None:
+        logger.info("Resumo do dashboard atualizado: %s dia(s) em %.3fs", dias, time.perf_counter() - inicio,
+                    extra={"amostra": True})
+    return dias
+
+
+class AtualizadorResumo:
+    """Thread de fundo que mantém pagamentos_resumo atualizado."""
+
+    def __init__(self, intervalo: int = DASHBOARD_RESUMO_INTERVALO):
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name="atualizador-resumo", daemon=True)
+        self._thread.start()
+
+    def encerrar(self):
+        self._parar.set()
+
+    def _executar(self):
+        # Primeira rodada logo na inicialização; as seguintes a cada intervalo
+        espera = 0.0
+        while not self._parar.wait(espera):
+            try:
+                atualizar_resumo()
+            except Exception as e:
+                logger.error(f"Erro ao atualizar o resumo do dashboard: {str(e)}")
+            espera = self.intervalo
+
+
+_atualizador: Optional[AtualizadorResumo] = None
+
+
+def iniciar_atualizacao_resumo():
+    """Inicia o atualizador deste processo (chamado no lifespan da API)."""
+    global _atualizador
+    if _atualizador is None and DASHBOARD_RESUMO_INTERVALO > 0:
+        _atualizador = AtualizadorResumo()
+        _atualizador.iniciar()
+
+
+def encerrar_atualizacao_resumo():
+    global _atualizador
+    if _atualizador is not None:
+        _atualizador.encerrar()
+        _atualizador = None
+
+
+def main():
+    from logging_config import configurar_logging
+
+    configurar_logging()
+    parser = argparse.ArgumentParser(description="Atualiza a tabela pagamentos_resumo do dashboard")
+    parser.add_argument("--completo", action="store_true", help="Descarta o resumo e recalcula todos os dias")
+    args = parser.parse_args()
+
+    dias = atualizar_resumo(completo=args.completo)
+    if dias is None:
+        print("Outro processo está atualizando o resumo; tente novamente em instantes")
+    else:
+        print(f"{dias} dia(s) recalculado(s)")
+
+
+if __name__ == "__main__":
+    main()
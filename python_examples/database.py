@@ -1,66 +1,195 @@
-import pyodbc
+import os
+import queue
+import threading
+from typing import Optional
 from contextlib import contextmanager
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import logging
+from instrumentacao import consulta_db
+from metrics import registrar_saturacao
+from config import DB_CONNECTION_STRING, DB_POOL_MINIMO, DB_POOL_SIZE, DB_TIMEOUT_CONEXAO, DB_TIMEOUT_CONSULTA
 
 
 logger = logging.getLogger(__name__)
 
 
-# ODBC connection string
-DATABASE_URL = (
-    "Driver={SQL Server};"
-    "Server=ITSERP\\ITSERPSRV;"
-    "Database=ConectudoPDV;"
-    "Trusted_Connection=yes;"
-)
+def _pyodbc():
+    # Importado sob demanda: o backend SQLite e os scripts de teste não precisam do driver ODBC
+    import pyodbc
+    return pyodbc
+
+
+# ODBC connection string (DB_CONNECTION_STRING permite apontar para um banco local de testes)
+DATABASE_URL = DB_CONNECTION_STRING
+
+
+def _conectar():
+    # Sem timeouts, um login ou comando preso manteria para sempre a thread (e a vaga) do compartimento do banco
+    conn = _pyodbc().connect(DATABASE_URL, timeout=DB_TIMEOUT_CONEXAO)
+    conn.timeout = DB_TIMEOUT_CONSULTA
+    return conn
+
+class CursorInstrumentado:
+    """Cursor que mede o tempo de cada execute/executemany; o restante é delegado ao cursor original."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, *params):
+        with consulta_db(sql):
+            self._cursor.execute(sql, *params)
+        return self
+
+    def executemany(self, sql, params):
+        with consulta_db(sql):
+            self._cursor.executemany(sql, params)
+        return self
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __setattr__(self, nome, valor):
+        # Atributos do driver (ex.: fast_executemany) vão para o cursor original
+        if nome == "_cursor":
+            object.__setattr__(self, nome, valor)
+        else:
+            setattr(self._cursor, nome, valor)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class ConexaoInstrumentada:
+    """Conexão cujos cursores são instrumentados."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return CursorInstrumentado(self._conn.cursor())
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+
+class PoolConexoes:
+    """
+    Pool de conexões pyodbc de um processo (criado no startup de cada worker).
+
+    Conexões devolvidas passam por rollback antes de voltar ao pool; conexões
+    com erro são descartadas. Quando todas estão em uso, abre uma conexão extra
+    que é fechada ao ser devolvida.
+    """
+
+    def __init__(self, tamanho: int = DB_POOL_SIZE):
+        self.tamanho = tamanho
+        self._livres = queue.LifoQueue(maxsize=tamanho)
+        self._pid = os.getpid()
+
+    def obter(self):
+        try:
+            return self._livres.get_nowait()
+        except queue.Empty:
+            return _conectar()
+
+    def devolver(self, conn, descartar: bool = False):
+        if not descartar and self._pid == os.getpid():
+            try:
+                conn.rollback()
+                self._livres.put_nowait(conn)
+                return
+            except Exception:
+                pass
+        conn.close()
+
+    def aquecer(self, quantidade: int) -> int:
+        """
+        Abre até `quantidade` conexões em paralelo e as deixa livres no pool
+        (o login ODBC deixa de ser pago pelas primeiras requisições).
+
+        Returns:
+            int: conexões abertas
+        """
+        faltam = min(quantidade, self.tamanho) - self._livres.qsize()
+        if faltam <= 0:
+            return 0
+        with ThreadPoolExecutor(max_workers=faltam, thread_name_prefix="aquecer-pool") as executor:
+            conexoes = list(executor.map(lambda _: _conectar(), range(faltam)))
+        for conn in conexoes:
+            self.devolver(conn)
+        return len(conexoes)
+
+    def fechar(self):
+        while True:
+            try:
+                self._livres.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool: Optional[PoolConexoes] = None
+_conexoes_abertas = 0
+_conexoes_lock = threading.Lock()
+registrar_saturacao("sqlserver", "pool", lambda: _conexoes_abertas, lambda: _pool.tamanho if _pool else 0)
+
+
+def iniciar_pool(tamanho: int = DB_POOL_SIZE):
+    """Cria o pool de conexões deste processo (lifespan do worker)."""
+    global _pool
+    fechar_pool()
+    _pool = PoolConexoes(tamanho)
+
+
+def aquecer_pool(quantidade: int = DB_POOL_MINIMO) -> int:
+    """Pré-abre as conexões mínimas do pool deste processo (aquecimento do worker)."""
+    return _pool.aquecer(quantidade) if _pool is not None else 0
+
+
+def fechar_pool():
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.fechar()
+
 
 @contextmanager
 def get_db_connection():
-    conn = pyodbc.connect(DATABASE_URL)
+    global _conexoes_abertas
+    # Fora dos workers da API (scripts, verificadores) ou em processo filho de um fork, conecta diretamente
+    pool = _pool if _pool is not None and _pool._pid == os.getpid() else None
+    conn = pool.obter() if pool else _conectar()
+    with _conexoes_lock:
+        _conexoes_abertas += 1
+    erro = False
     try:
-        yield conn
+        yield ConexaoInstrumentada(conn)
+    except Exception:
+        # A conexão pode ter ficado em estado inválido: não volta ao pool
+        erro = True
+        raise
     finally:
-        conn.close()
+        with _conexoes_lock:
+            _conexoes_abertas -= 1
+        if pool:
+            pool.devolver(conn, descartar=erro)
+        else:
+            conn.close()
 
 def registrar_pagamento(referencia: str, valor: float, nome: str, documento: str, status: str, tipo: str,
                         origem: str, referencia_externa: str = None, status_detail: str = None,
                         url_pagamento: str = None):
+    from repositorio import Pagamento, obter_repositorio  # evita import circular
+
     try:
-        conn = pyodbc.connect(DATABASE_URL)
-        cursor = conn.cursor()
-
-        # Verificar se já existe pagamento aprovado
-        cursor.execute("""
-            SELECT COUNT(*) FROM pagamentos WHERE referencia = ? AND status = 'approved'
-        """, (referencia,))
-        if cursor.fetchone()[0]:
-            logger.info(f"Pagamento já aprovado para a referência {referencia}. Ignorado.")
-            return
-
-        # Excluir rejeitados
-        cursor.execute("""
-            DELETE FROM pagamentos WHERE referencia = ? AND status = 'rejected'
-        """, (referencia,))
-        if cursor.rowcount:
-            logger.info(f"Pagamentos rejeitados removidos para a referência {referencia}.")
-
-        # Inserir novo
-        cursor.execute("""
-            INSERT INTO pagamentos (
-                referencia, valor, nome, documento, status, tipo, origem,
-                criado_em, referencia_externa, status_detail, atualizado_em,
-                url_pagamento
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            referencia, valor, nome, documento, status, tipo, origem,
-            datetime.now(), referencia_externa, status_detail, datetime.now(),
-            url_pagamento
+        registrado = obter_repositorio().registrar_pagamento(Pagamento(
+            referencia=referencia, valor=valor, nome=nome, documento=documento, status=status, tipo=tipo,
+            origem=origem, referencia_externa=referencia_externa, status_detail=status_detail,
+            url_pagamento=url_pagamento
         ))
-
-        conn.commit()
-        logger.info(f"Pagamento registrado para {referencia}.")
+        if registrado:
+            logger.info(f"Pagamento registrado para {referencia}.")
+        else:
+            logger.info(f"Pagamento já aprovado para a referência {referencia}. Ignorado.")
     except Exception as e:
         logger.error(f"Erro ao registrar pagamento: {e}")
         raise
@@ -0,0 +1,6 @@
+"""
+Emuladores locais da Cora, do Mercado Pago e do PostgREST do Supabase.
+
+Permitem executar e fazer testes de carga da API e dos verificadores sem
+acessar os provedores reais. Veja `python -m emuladores --help`.
+"""
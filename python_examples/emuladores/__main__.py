@@ -0,0 +1,68 @@
+"""
+Executa os emuladores locais.
+
+Exemplo:
+    python -m emuladores --latencia lognormal:80,0.6 --taxa-erro 0.01 --limite-rps 200
+
+E, em outro terminal, aponte a API/verificadores para eles:
+    CORA_API_URL=http://127.0.0.1:8101
+    MP_API_URL=http://127.0.0.1:8102
+    SUPABASE_URL=http://127.0.0.1:8103
+"""
+
+import argparse
+import asyncio
+
+import uvicorn
+
+from emuladores import cora, mercadopago, postgrest
+from emuladores.comportamento import Comportamento
+
+SERVICOS = {
+    "cora": (cora, 8101, "CORA_API_URL"),
+    "mercadopago": (mercadopago, 8102, "MP_API_URL"),
+    "supabase": (postgrest, 8103, "SUPABASE_URL"),
+}
+
+
+def _comportamento(args, servico: str) -> Comportamento:
+    def valor(nome):
+        especifico = getattr(args, f"{nome}_{servico}")
+        return especifico if especifico is not None else getattr(args, nome)
+    return Comportamento(latencia=valor("latencia"), taxa_erro=valor("taxa_erro"), limite_rps=valor("limite_rps"))
+
+
+async def _executar(args):
+    servidores = []
+    for servico in args.servicos.split(","):
+        modulo, porta_padrao, variavel = SERVICOS[servico]
+        porta = getattr(args, f"porta_{servico}") or porta_padrao
+        kwargs = {}
+        if servico == "cora":
+            kwargs["estado"] = cora.EstadoCora(pagar_apos=args.pagar_apos)
+        app = modulo.criar_app(_comportamento(args, servico), **kwargs)
+        config = uvicorn.Config(app, host=args.host, port=porta, log_level="warning", access_log=False)
+        servidores.append(uvicorn.Server(config))
+        print(f"{variavel}=http://{args.host}:{porta}")
+    await asyncio.gather(*(servidor.serve() for servidor in servidores))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emuladores locais de Cora, Mercado Pago e Supabase (PostgREST)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--servicos", default="cora,mercadopago,supabase", help="Lista separada por vírgulas")
+    parser.add_argument("--latencia", default="0", help="Ex.: fixa:50, uniforme:20-200, normal:100,30, lognormal:80,0.6 (ms)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de requisições que retornam 503")
+    parser.add_argument("--limite-rps", type=float, default=0.0, help="Requisições por segundo antes de responder 429 (0 = sem limite)")
+    parser.add_argument("--pagar-apos", type=float, default=None, help="Segundos até uma cobrança Cora passar para PAID")
+    for servico, (_, porta, _) in SERVICOS.items():
+        parser.add_argument(f"--porta-{servico}", type=int, default=None, help=f"Porta (padrão {porta})")
+        parser.add_argument(f"--latencia-{servico}", default=None)
+        parser.add_argument(f"--taxa-erro-{servico}", type=float, default=None)
+        parser.add_argument(f"--limite-rps-{servico}", type=float, default=None)
+    args = parser.parse_args()
+    asyncio.run(_executar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Comportamento configurável dos emuladores: latência, taxa de erro e limite de requisições.
+"""
+
+import math
+import time
+import random
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+
+def distribuicao_latencia(especificacao: str) -> Callable[[], float]:
+    """
+    Converte uma especificação de latência (em milissegundos) em uma função que sorteia segundos.
+
+    Formatos:
+        "0"                      sem latência
+        "fixa:50"                sempre 50 ms
+        "uniforme:20-200"        uniforme entre 20 e 200 ms
+        "normal:100,30"          normal com média 100 ms e desvio 30 ms
+        "lognormal:80,0.6"       lognormal com mediana 80 ms e sigma 0.6 (cauda longa, mais realista)
+    """
+    especificacao = (especificacao or "0").strip()
+    if ":" not in especificacao:
+        valor = float(especificacao) / 1000
+        return lambda: valor
+
+    tipo, parametros = especificacao.split(":", 1)
+    if tipo == "fixa":
+        valor = float(parametros) / 1000
+        return lambda: valor
+    if tipo == "uniforme":
+        minimo, maximo = (float(p) / 1000 for p in parametros.split("-"))
+        return lambda: random.uniform(minimo, maximo)
+    if tipo == "normal":
+        media, desvio = (float(p) for p in parametros.split(","))
+        return lambda: max(0.0, random.gauss(media, desvio)) / 1000
+    if tipo == "lognormal":
+        mediana, sigma = (float(p) for p in parametros.split(","))
+        mu = math.log(mediana)
+        return lambda: random.lognormvariate(mu, sigma) / 1000
+    raise ValueError(f"Distribuição de latência desconhecida: {especificacao}")
+
+
+class LimiteTaxa:
+    """Token bucket simples: `rps` requisições por segundo com rajada de `rajada`."""
+
+    def __init__(self, rps: float, rajada: Optional[int] = None):
+        self.rps = rps
+        self.capacidade = rajada or max(1, int(rps))
+        self._fichas = float(self.capacidade)
+        self._ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.capacidade, self._fichas + (agora - self._ultima) * self.rps)
+            self._ultima = agora
+            if self._fichas >= 1:
+                self._fichas -= 1
+                return True
+            return False
+
+
+@dataclass
+class Comportamento:
+    """Parâmetros de comportamento de um emulador."""
+    latencia: str = "0"
+    taxa_erro: float = 0.0
+    limite_rps: float = 0.0  # 0 = sem limite
+    status_erro: int = 503
+    _sortear_latencia: Callable[[], float] = field(init=False, repr=False)
+    _limite: Optional[LimiteTaxa] = field(init=False, repr=False, default=None)
+
+    def __post_init__(self):
+        self._sortear_latencia = distribuicao_latencia(self.latencia)
+        self._limite = LimiteTaxa(self.limite_rps) if self.limite_rps > 0 else None
+
+    async def middleware(self, request: Request, call_next):
+        """Aplica limite de taxa, latência e erros aleatórios (rotas /_emulador são isentas)."""
+        if request.url.path.startswith("/_emulador"):
+            return await call_next(request)
+        if self._limite and not self._limite.permitir():
+            return JSONResponse(status_code=429, content={"message": "Too Many Requests"}, headers={"Retry-After": "1"})
+        atraso = self._sortear_latencia()
+        if atraso > 0:
+            await asyncio.sleep(atraso)
+        if self.taxa_erro and random.random() < self.taxa_erro:
+            return JSONResponse(status_code=self.status_erro, content={"message": "Erro simulado pelo emulador"})
+        return await call_next(request)
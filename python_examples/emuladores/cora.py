@@ -0,0 +1,133 @@
+"""
+Emulador da API da Cora: POST /token e /v2/invoices.
+
+Cobranças são mantidas em memória. O status evolui apenas via rota de
+controle (/_emulador/invoices/{id}/status) ou automaticamente após
+`pagar_apos` segundos, para simular o pagamento do PIX/boleto.
+"""
+
+import time
+import uuid
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Form, Header, HTTPException, Query, Request
+
+from emuladores.comportamento import Comportamento
+
+
+class EstadoCora:
+    def __init__(self, expires_in: int = 1800, pagar_apos: Optional[float] = None):
+        self.expires_in = expires_in
+        self.pagar_apos = pagar_apos
+        self.tokens: Dict[str, float] = {}
+        self.invoices: Dict[str, Dict[str, Any]] = {}
+        self.idempotencia: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def emitir_token(self) -> Dict[str, Any]:
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens[token] = time.time() + self.expires_in
+        return {"access_token": token, "token_type": "Bearer", "expires_in": self.expires_in}
+
+    def validar(self, authorization: Optional[str]):
+        token = (authorization or "").replace("Bearer ", "").strip()
+        expira = self.tokens.get(token)
+        if expira is None or expira < time.time():
+            raise HTTPException(status_code=401, detail="invalid_token")
+
+    def atualizar_status_automatico(self, invoice: Dict[str, Any]):
+        if self.pagar_apos is not None and invoice["status"] == "OPEN" and time.time() - invoice["_criado"] >= self.pagar_apos:
+            invoice["status"] = "PAID"
+            invoice["paid_at"] = datetime.now(timezone.utc).isoformat()
+
+
+def _publico(invoice: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in invoice.items() if not k.startswith("_")}
+
+
+def criar_app(comportamento: Optional[Comportamento] = None, estado: Optional[EstadoCora] = None) -> FastAPI:
+    estado = estado or EstadoCora()
+    app = FastAPI(title="Emulador Cora")
+    app.state.estado = estado
+    if comportamento:
+        app.middleware("http")(comportamento.middleware)
+
+    @app.post("/token")
+    async def token(grant_type: str = Form(...), client_id: str = Form(...)):
+        if grant_type != "client_credentials":
+            raise HTTPException(status_code=400, detail="unsupported_grant_type")
+        return estado.emitir_token()
+
+    @app.post("/v2/invoices/")
+    @app.post("/v2/invoices", include_in_schema=False)
+    async def criar_invoice(request: Request, authorization: Optional[str] = Header(None),
+                            idempotency_key: Optional[str] = Header(None)):
+        estado.validar(authorization)
+        corpo = await request.json()
+        with estado.lock:
+            if idempotency_key and idempotency_key in estado.idempotencia:
+                return _publico(estado.invoices[estado.idempotencia[idempotency_key]])
+
+            invoice_id = f"inv_{uuid.uuid4().hex[:20]}"
+            formas = corpo.get("payment_forms") or []
+            invoice = {
+                "id": invoice_id,
+                "code": corpo.get("code"),
+                "status": "OPEN",
+                "total_amount": corpo.get("total_amount"),
+                "customer": corpo.get("customer"),
+                "services": corpo.get("services"),
+                "payment_terms": corpo.get("payment_terms"),
+                "payment_forms": formas,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "paid_at": None,
+                "_criado": time.time(),
+            }
+            if "PIX" in formas:
+                invoice["pix"] = {"emv": f"00020126580014br.gov.bcb.pix0136{uuid.uuid4()}5204000053039865802BR"}
+            if "BANK_SLIP" in formas:
+                invoice["payment_options"] = {"bank_slip": {"url": f"https://emulador.local/boletos/{invoice_id}.pdf"}}
+            estado.invoices[invoice_id] = invoice
+            if idempotency_key:
+                estado.idempotencia[idempotency_key] = invoice_id
+        return _publico(invoice)
+
+    @app.get("/v2/invoices/{invoice_id}")
+    async def obter_invoice(invoice_id: str, authorization: Optional[str] = Header(None)):
+        estado.validar(authorization)
+        invoice = estado.invoices.get(invoice_id)
+        if invoice is None:
+            raise HTTPException(status_code=404, detail="invoice_not_found")
+        estado.atualizar_status_automatico(invoice)
+        return _publico(invoice)
+
+    @app.get("/v2/invoices/")
+    @app.get("/v2/invoices", include_in_schema=False)
+    async def listar_invoices(authorization: Optional[str] = Header(None), start: Optional[str] = None,
+                              end: Optional[str] = None, state: Optional[str] = None,
+                              page: int = Query(1, ge=1), perPage: int = Query(200, ge=1, le=1000)):
+        estado.validar(authorization)
+        itens = []
+        for invoice in list(estado.invoices.values()):
+            estado.atualizar_status_automatico(invoice)
+            dia = invoice["created_at"][:10]
+            if (start and dia < start) or (end and dia > end) or (state and invoice["status"] != state):
+                continue
+            itens.append(_publico(invoice))
+        inicio = (page - 1) * perPage
+        return {"totalItems": len(itens), "items": itens[inicio:inicio + perPage]}
+
+    @app.post("/_emulador/invoices/{invoice_id}/status")
+    async def definir_status(invoice_id: str, status: str = Query(...)):
+        invoice = estado.invoices.get(invoice_id)
+        if invoice is None:
+            raise HTTPException(status_code=404, detail="invoice_not_found")
+        invoice["status"] = status
+        if status == "PAID":
+            invoice["paid_at"] = datetime.now(timezone.utc).isoformat()
+        return _publico(invoice)
+
+    return app
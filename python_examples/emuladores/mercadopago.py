@@ -0,0 +1,140 @@
+"""
+Emulador da API do Mercado Pago: /v1/payments e /v1/payments/search.
+
+O resultado do pagamento é determinado pelo nome do titular do cartão, como
+nos cartões de teste do Mercado Pago: "APRO" (aprovado, padrão), "OTHE"
+(rejeitado), "CONT" (pendente), "FUND" (saldo insuficiente). Aqui o valor é
+lido do token do cartão ou de payer.first_name.
+"""
+
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+from emuladores.comportamento import Comportamento
+
+RESULTADOS = {
+    "APRO": ("approved", "accredited"),
+    "OTHE": ("rejected", "cc_rejected_other_reason"),
+    "CONT": ("in_process", "pending_contingency"),
+    "FUND": ("rejected", "cc_rejected_insufficient_amount"),
+    "SECU": ("rejected", "cc_rejected_bad_filled_security_code"),
+}
+
+
+class EstadoMercadoPago:
+    def __init__(self):
+        self.payments: Dict[int, Dict[str, Any]] = {}
+        self.idempotencia: Dict[str, int] = {}  # x-idempotency-key -> id do pagamento
+        self.proximo_id = 1_000_000_000
+        self.lock = threading.Lock()
+
+
+def _resultado(corpo: Dict[str, Any]):
+    titular = str((corpo.get("payer") or {}).get("first_name") or corpo.get("token") or "").upper()
+    for chave, resultado in RESULTADOS.items():
+        if chave in titular:
+            return resultado
+    return RESULTADOS["APRO"]
+
+
+def criar_app(comportamento: Optional[Comportamento] = None, estado: Optional[EstadoMercadoPago] = None) -> FastAPI:
+    estado = estado or EstadoMercadoPago()
+    app = FastAPI(title="Emulador Mercado Pago")
+    app.state.estado = estado
+    if comportamento:
+        app.middleware("http")(comportamento.middleware)
+
+    def autenticar(authorization: Optional[str]):
+        if not authorization or not authorization.startswith("Bearer ") or len(authorization) <= len("Bearer "):
+            raise HTTPException(status_code=401, detail="unauthorized")
+
+    @app.post("/v1/payments")
+    async def criar_pagamento(request: Request, authorization: Optional[str] = Header(None),
+                              x_idempotency_key: Optional[str] = Header(None)):
+        autenticar(authorization)
+        corpo = await request.json()
+        if not corpo.get("transaction_amount") or not corpo.get("payment_method_id"):
+            return JSONResponse(status_code=400, content={"message": "invalid parameters", "status": 400})
+
+        status, status_detail = _resultado(corpo)
+        agora = datetime.now(timezone.utc).isoformat()
+        with estado.lock:
+            # Como na API real: a mesma chave devolve o pagamento já criado
+            if x_idempotency_key in estado.idempotencia:
+                return JSONResponse(status_code=201, content=estado.payments[estado.idempotencia[x_idempotency_key]])
+            payment_id = estado.proximo_id
+            estado.proximo_id += 1
+            payment = {
+                "id": payment_id,
+                "status": status,
+                "status_detail": status_detail,
+                "external_reference": corpo.get("external_reference"),
+                "description": corpo.get("description"),
+                "transaction_amount": corpo.get("transaction_amount"),
+                "installments": corpo.get("installments"),
+                "payment_method_id": corpo.get("payment_method_id"),
+                "payment_type_id": "credit_card",
+                "issuer_id": corpo.get("issuer_id"),
+                "payer": corpo.get("payer"),
+                "card": {"first_six_digits": "503143", "last_four_digits": "6351"},
+                "processing_mode": "aggregator",
+                "date_created": agora,
+                "date_approved": agora if status == "approved" else None,
+                "date_last_updated": agora,
+            }
+            estado.payments[payment_id] = payment
+            if x_idempotency_key:
+                estado.idempotencia[x_idempotency_key] = payment_id
+        return JSONResponse(status_code=201, content=payment)
+
+    @app.get("/v1/payments/search")
+    async def buscar_pagamentos(authorization: Optional[str] = Header(None),
+                                external_reference: Optional[str] = None, status: Optional[str] = None,
+                                begin_date: Optional[str] = None, end_date: Optional[str] = None,
+                                offset: int = Query(0, ge=0), limit: int = Query(30, ge=1, le=1000)):
+        autenticar(authorization)
+        resultados = []
+        for payment in list(estado.payments.values()):
+            if external_reference and payment["external_reference"] != external_reference:
+                continue
+            if status and payment["status"] != status:
+                continue
+            if begin_date and payment["date_created"] < begin_date:
+                continue
+            if end_date and payment["date_created"] > end_date:
+                continue
+            resultados.append(payment)
+        return {
+            "paging": {"total": len(resultados), "offset": offset, "limit": limit},
+            "results": resultados[offset:offset + limit],
+        }
+
+    @app.get("/v1/payments/{payment_id}")
+    async def obter_pagamento(payment_id: int, authorization: Optional[str] = Header(None)):
+        autenticar(authorization)
+        payment = estado.payments.get(payment_id)
+        if payment is None:
+            return JSONResponse(status_code=404, content={"message": "Payment not found", "status": 404})
+        return payment
+
+    @app.get("/v1/payment_methods")
+    async def metodos_pagamento(authorization: Optional[str] = Header(None)):
+        autenticar(authorization)
+        return [{"id": "master", "payment_type_id": "credit_card"}, {"id": "visa", "payment_type_id": "credit_card"}]
+
+    @app.post("/_emulador/payments/{payment_id}/status")
+    async def definir_status(payment_id: int, status: str = Query(...), status_detail: str = Query("")):
+        payment = estado.payments.get(payment_id)
+        if payment is None:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        payment.update(status=status, status_detail=status_detail,
+                       date_last_updated=datetime.now(timezone.utc).isoformat())
+        if status == "approved":
+            payment["date_approved"] = payment["date_last_updated"]
+        return payment
+
+    return app
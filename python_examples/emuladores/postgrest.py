@@ -0,0 +1,109 @@
+"""
+Emulador mínimo da API PostgREST do Supabase (/rest/v1).
+
+Suporta GET (select), POST (insert) e PATCH (update) em qualquer tabela, com
+os filtros eq., neq., in.(), gt., gte., lt. e lte. Isso cobre as tabelas
+`payments`, `registrations` e `pagamentos_supabase` usadas pelo projeto.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+from emuladores.comportamento import Comportamento
+
+PARAMETROS_RESERVADOS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class EstadoPostgrest:
+    def __init__(self):
+        self.tabelas: Dict[str, List[Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+
+    def semear(self, tabela: str, linhas: List[Dict[str, Any]]):
+        with self.lock:
+            self.tabelas.setdefault(tabela, []).extend(dict(linha) for linha in linhas)
+
+
+def _comparar(valor: Any, operador: str, alvo: str) -> bool:
+    texto = "" if valor is None else str(valor)
+    if operador == "eq":
+        return texto == alvo
+    if operador == "neq":
+        return texto != alvo
+    if operador == "in":
+        return texto in [v.strip().strip('"') for v in alvo.strip("()").split(",")]
+    if operador in ("gt", "gte", "lt", "lte"):
+        try:
+            a, b = float(texto), float(alvo)
+        except ValueError:
+            a, b = texto, alvo
+        return {"gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[operador]
+    if operador == "is":
+        return (valor is None) if alvo == "null" else texto.lower() == alvo
+    raise HTTPException(status_code=400, detail=f"operador não suportado: {operador}")
+
+
+def _filtrar(linhas: List[Dict[str, Any]], request: Request) -> List[Dict[str, Any]]:
+    filtros = []
+    for coluna, expressao in request.query_params.multi_items():
+        if coluna in PARAMETROS_RESERVADOS:
+            continue
+        operador, _, alvo = expressao.partition(".")
+        filtros.append((coluna, operador, alvo))
+    return [linha for linha in linhas if all(_comparar(linha.get(c), op, alvo) for c, op, alvo in filtros)]
+
+
+def criar_app(comportamento: Optional[Comportamento] = None, estado: Optional[EstadoPostgrest] = None) -> FastAPI:
+    estado = estado or EstadoPostgrest()
+    app = FastAPI(title="Emulador PostgREST")
+    app.state.estado = estado
+    if comportamento:
+        app.middleware("http")(comportamento.middleware)
+
+    def autenticar(apikey: Optional[str]):
+        if not apikey:
+            raise HTTPException(status_code=401, detail="No API key found in request")
+
+    def responder(linhas: List[Dict[str, Any]], prefer: Optional[str], status: int) -> Response:
+        if prefer and "return=representation" in prefer:
+            return JSONResponse(status_code=status if status != 204 else 200, content=linhas)
+        return Response(status_code=204)
+
+    @app.get("/rest/v1/")
+    async def raiz(apikey: Optional[str] = Header(None)):
+        autenticar(apikey)
+        return {"tabelas": sorted(estado.tabelas)}
+
+    @app.get("/rest/v1/{tabela}")
+    async def selecionar(tabela: str, request: Request, apikey: Optional[str] = Header(None)):
+        autenticar(apikey)
+        linhas = _filtrar(estado.tabelas.get(tabela, []), request)
+        offset = int(request.query_params.get("offset", 0))
+        limite = request.query_params.get("limit")
+        linhas = linhas[offset:offset + int(limite)] if limite else linhas[offset:]
+        return linhas
+
+    @app.post("/rest/v1/{tabela}")
+    async def inserir(tabela: str, request: Request, apikey: Optional[str] = Header(None),
+                      prefer: Optional[str] = Header(None)):
+        autenticar(apikey)
+        corpo = await request.json()
+        linhas = corpo if isinstance(corpo, list) else [corpo]
+        estado.semear(tabela, linhas)
+        return responder(linhas, prefer, 201)
+
+    @app.patch("/rest/v1/{tabela}")
+    async def atualizar(tabela: str, request: Request, apikey: Optional[str] = Header(None),
+                        prefer: Optional[str] = Header(None)):
+        autenticar(apikey)
+        alteracoes = await request.json()
+        with estado.lock:
+            linhas = _filtrar(estado.tabelas.get(tabela, []), request)
+            for linha in linhas:
+                linha.update(alteracoes)
+        return responder(linhas, prefer, 204)
+
+    return app
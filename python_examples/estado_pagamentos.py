@@ -0,0 +1,125 @@
+"""
+Máquina de estados do status dos pagamentos consultados pelos verificadores.
+
+A cada ciclo, todo pagamento pendente é consultado no provedor; na maioria das
+vezes o status não mudou. MaquinaEstados lembra o último status e
+status_detail aplicados em cada destino (banco local e Supabase) e só deixa
+escrever quando há uma transição real:
+
+- mesmo status e status_detail já aplicados: escrita evitada;
+- transição regressiva (ex.: approved -> pending) ou resposta com
+  last_updated anterior à já aplicada: ignorada;
+- falha ao gravar: nada é lembrado, a escrita é repetida no próximo ciclo.
+
+Os contadores de cada ciclo são registrados em log e no Prometheus
+(status_write_total).
+"""
+
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from metrics import STATUS_WRITES
+from provider_status import StatusProvedor
+
+logger = logging.getLogger(__name__)
+
+# Ordem das etapas (status já mapeado para o banco local); não se volta para uma etapa anterior.
+# Status do Mercado Pago repassados sem mapeamento também têm etapa: authorized (aguardando
+# captura) e in_mediation (disputa aberta após a aprovação, que pode voltar a approved).
+# Status fora desta tabela nunca são tratados como regressão.
+ETAPAS = {
+    "pending": 0,
+    "in_process": 1,
+    "authorized": 1,
+    "approved": 2,
+    "in_mediation": 2,
+    "rejected": 2,
+    "cancelled": 2,
+    "expired": 2,
+    "refunded": 3,
+    "charged_back": 3,
+}
+
+DESTINOS = ("local", "supabase")
+LIMITE_PAGAMENTOS = 100_000  # pagamentos lembrados por provedor (os mais antigos são esquecidos)
+
+
+def _instante(valor: Optional[str]) -> Optional[datetime]:
+    if not valor:
+        return None
+    try:
+        instante = datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # Datas sem fuso (ex.: só a data) são tratadas como UTC para serem comparáveis
+    return instante if instante.tzinfo else instante.replace(tzinfo=timezone.utc)
+
+
+class MaquinaEstados:
+    """Último status aplicado por pagamento e destino, com contagem das escritas por ciclo."""
+
+    def __init__(self, provedor: str, limite: int = LIMITE_PAGAMENTOS):
+        self.provedor = provedor
+        self.limite = limite
+        # referencia -> {destino: (status, status_detail, last_updated)}
+        self._aplicados: "OrderedDict[str, Dict[str, Tuple[str, str, Optional[datetime]]]]" = OrderedDict()
+        self.contagem: Dict[str, int] = {}
+        self.iniciar_ciclo()
+
+    def iniciar_ciclo(self):
+        self.contagem = {"escritas": 0, "evitadas": 0, "ignoradas": 0}
+
+    def decidir(self, destino: str, status_mapeado: str, status: StatusProvedor) -> bool:
+        """
+        Indica se o status deve ser gravado no destino ("local" ou "supabase").
+
+        Returns:
+            bool: True para uma transição real; False para repetição, regressão ou resposta antiga
+        """
+        anterior = self._aplicados.get(status.id, {}).get(destino)
+        if anterior is None:
+            return True
+
+        status_anterior, detail_anterior, atualizado_anterior = anterior
+        if (status_mapeado, status.status_detail or "") == (status_anterior, detail_anterior):
+            self._contar(destino, "skipped")
+            return False
+
+        atualizado = _instante(status.last_updated)
+        antiga = atualizado and atualizado_anterior and atualizado < atualizado_anterior
+        regressiva = (
+            status_mapeado in ETAPAS and status_anterior in ETAPAS
+            and ETAPAS[status_mapeado] < ETAPAS[status_anterior]
+        )
+        if antiga or regressiva:
+            logger.warning(
+                "[%s] Transição ignorada para %s em %s: %s -> %s%s",
+                self.provedor, status.id, destino, status_anterior, status_mapeado,
+                " (resposta antiga)" if antiga else "",
+            )
+            self._contar(destino, "ignored")
+            return False
+        return True
+
+    def aplicado(self, destino: str, status_mapeado: str, status: StatusProvedor):
+        """Registra que o status foi gravado com sucesso no destino."""
+        registro = self._aplicados.setdefault(status.id, {})
+        registro[destino] = (status_mapeado, status.status_detail or "", _instante(status.last_updated))
+        self._aplicados.move_to_end(status.id)
+        while len(self._aplicados) > self.limite:
+            self._aplicados.popitem(last=False)
+        self._contar(destino, "written")
+
+    def esquecer(self, referencia: str):
+        """Descarta o que foi lembrado (o próximo status será gravado)."""
+        self._aplicados.pop(referencia, None)
+
+    def _contar(self, destino: str, resultado: str):
+        chave = {"written": "escritas", "skipped": "evitadas", "ignored": "ignoradas"}[resultado]
+        self.contagem[chave] += 1
+        STATUS_WRITES.labels(self.provedor, destino, resultado).inc()
+
+    def resumo(self) -> str:
+        return ", ".join(f"{chave}={valor}" for chave, valor in self.contagem.items())
@@ -0,0 +1,184 @@
+"""
+Eventos de mudança de status dos pagamentos, entregues por SSE em
+GET /pagamento/stream/{referencia_externa}.
+
+- BarramentoStatus: pub/sub em memória por processo. Cada conexão SSE assina
+  a referência externa e recebe os eventos em uma fila própria.
+- publicar_status: chamado por quem muda o status (webhooks, verificadores,
+  criação de cobrança). Entrega na hora aos assinantes deste processo e, com
+  EVENTOS_FANOUT="banco", grava o evento na tabela eventos_status.
+- LeitorEventos: em cada worker da API, lê eventos_status a cada
+  EVENTOS_INTERVALO segundos e entrega os eventos gravados por outros
+  processos (outros workers e os verificadores).
+
+Com EVENTOS_FANOUT="local" nada é gravado e só os assinantes do próprio
+processo recebem os eventos (um único worker, sem verificadores separados).
+"""
+
+import os
+import socket
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+from config import EVENTOS_FANOUT, EVENTOS_FILA, EVENTOS_INTERVALO, EVENTOS_RETENCAO
+from metrics import registrar_saturacao
+from repositorio import obter_repositorio
+
+logger = logging.getLogger(__name__)
+
+# Status a partir dos quais o pagamento não muda mais (o stream envia "event: fim" e é encerrado).
+# "rejected" não é final: o checkout permite nova tentativa com a mesma referência externa.
+STATUS_FINAIS = {"approved", "cancelled", "refunded", "charged_back", "expired", "PAID"}
+
+SOBREPOSICAO_IDS = 100  # eventos relidos a cada consulta (ids confirmados fora de ordem)
+
+
+def _processo() -> str:
+    """Identifica este processo na coluna origem de eventos_status."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class BarramentoStatus:
+    """Assinaturas por referência externa, com entrega segura a partir de qualquer thread."""
+
+    def __init__(self):
+        self._assinantes: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def assinar(self, referencia_externa: str) -> asyncio.Queue:
+        """Cria a fila de uma conexão (chamado no event loop da API)."""
+        self._loop = asyncio.get_running_loop()
+        fila: asyncio.Queue = asyncio.Queue(maxsize=EVENTOS_FILA)
+        self._assinantes.setdefault(referencia_externa, set()).add(fila)
+        return fila
+
+    def cancelar(self, referencia_externa: str, fila: asyncio.Queue):
+        filas = self._assinantes.get(referencia_externa)
+        if filas is not None:
+            filas.discard(fila)
+            if not filas:
+                del self._assinantes[referencia_externa]
+
+    def conexoes(self) -> int:
+        return sum(len(filas) for filas in list(self._assinantes.values()))
+
+    def entregar(self, evento: Dict[str, Any]):
+        """Entrega o evento às filas da referência; pode ser chamado de threads do threadpool."""
+        if self._loop is None or evento["referencia_externa"] not in self._assinantes:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._entregar, evento)
+        except RuntimeError:
+            # Event loop já encerrado (shutdown)
+            pass
+
+    def _entregar(self, evento: Dict[str, Any]):
+        for fila in list(self._assinantes.get(evento["referencia_externa"], ())):
+            try:
+                fila.put_nowait(evento)
+            except asyncio.QueueFull:
+                # Cliente lento: descarta o evento intermediário (o status final ainda chega)
+                logger.warning("Fila SSE cheia para %s, evento descartado", evento["referencia_externa"])
+
+
+barramento = BarramentoStatus()
+registrar_saturacao("sse", "stream", barramento.conexoes)
+
+
+def publicar_status(referencia_externa: Optional[str], status: str, status_detail: Optional[str] = None,
+                    referencia: Optional[str] = None):
+    """
+    Publica uma mudança de status. Sem referencia_externa, ela é buscada pela
+    referência (id no provedor); pagamentos sem referência externa são ignorados.
+
+    Falhas ao gravar o evento só são registradas em log: a mudança de status já foi gravada.
+    """
+    try:
+        repositorio = obter_repositorio()
+        if not referencia_externa and referencia:
+            referencia_externa = repositorio.referencia_externa_de(referencia)
+        if not referencia_externa:
+            return
+        evento = {
+            "id": None,
+            "referencia_externa": referencia_externa,
+            "referencia": referencia,
+            "status": status,
+            "status_detail": status_detail,
+            "criado_em": datetime.now().isoformat(),
+        }
+        barramento.entregar(evento)
+        if EVENTOS_FANOUT == "banco":
+            repositorio.registrar_evento_status(referencia_externa, referencia, status, status_detail, _processo())
+    except Exception as e:
+        logger.error(f"Erro ao publicar status de {referencia_externa or referencia}: {str(e)}")
+
+
+class LeitorEventos:
+    """Tarefa do worker que repassa ao barramento os eventos gravados por outros processos."""
+
+    def __init__(self, intervalo: float = EVENTOS_INTERVALO):
+        self.intervalo = intervalo
+        self._tarefa: Optional[asyncio.Task] = None
+        self._ultimo_id = 0
+        self._vistos: deque = deque(maxlen=SOBREPOSICAO_IDS * 10)
+        self._proxima_limpeza = 0.0
+
+    async def iniciar(self):
+        self._ultimo_id = await asyncio.to_thread(obter_repositorio().ultimo_evento_status)
+        self._tarefa = asyncio.create_task(self._executar(), name="leitor-eventos")
+
+    async def encerrar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+
+    async def _executar(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await asyncio.to_thread(self._ler)
+                if loop.time() >= self._proxima_limpeza:
+                    self._proxima_limpeza = loop.time() + 60
+                    await asyncio.to_thread(
+                        obter_repositorio().remover_eventos_status, datetime.now() - timedelta(seconds=EVENTOS_RETENCAO)
+                    )
+            except Exception as e:
+                logger.error(f"Erro ao ler eventos de status: {str(e)}")
+
+    def _ler(self):
+        # Sem assinantes neste worker a entrega não faz nada, mas a posição avança
+        eventos = obter_repositorio().ler_eventos_status(max(0, self._ultimo_id - SOBREPOSICAO_IDS))
+        proprio = _processo()
+        for evento in eventos:
+            self._ultimo_id = max(self._ultimo_id, evento["id"])
+            if evento["id"] in self._vistos:
+                continue
+            self._vistos.append(evento["id"])
+            if evento["origem"] != proprio:
+                barramento.entregar(evento)
+
+
+_leitor: Optional[LeitorEventos] = None
+
+
+async def iniciar_leitor_eventos():
+    """Inicia o leitor de eventos_status deste worker (lifespan da API), se EVENTOS_FANOUT="banco"."""
+    global _leitor
+    if _leitor is None and EVENTOS_FANOUT == "banco":
+        _leitor = LeitorEventos()
+        await _leitor.iniciar()
+
+
+async def encerrar_leitor_eventos():
+    global _leitor
+    if _leitor is not None:
+        await _leitor.encerrar()
+        _leitor = None
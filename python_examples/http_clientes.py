@@ -0,0 +1,83 @@
+"""
+Clientes HTTP compartilhados por processo.
+
+- sessao(): requests.Session com pool de conexões (consultas de status e
+  criação de cobranças na Cora, código síncrono);
+- cliente_async(): httpx.AsyncClient com pool de conexões (rotas async).
+
+Os clientes são criados no lifespan de cada worker (main.py) ou, em scripts,
+no primeiro uso. Um cliente criado antes de um fork nunca é reaproveitado no
+processo filho: o pid é conferido a cada acesso.
+"""
+
+import os
+import logging
+import threading
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_sessao: Optional[requests.Session] = None
+_cliente_async: Optional[httpx.AsyncClient] = None
+_pid: Optional[int] = None
+
+
+def _criar_sessao(pool_size: int) -> requests.Session:
+    sessao = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    sessao.mount("https://", adapter)
+    sessao.mount("http://", adapter)
+    return sessao
+
+
+def _criar_cliente_async(pool_size: int) -> httpx.AsyncClient:
+    limites = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return httpx.AsyncClient(limits=limites, timeout=30)
+
+
+def iniciar(pool_size: int = HTTP_POOL_SIZE):
+    """Cria os clientes deste processo (chamado no startup do worker)."""
+    global _sessao, _cliente_async, _pid
+    with _lock:
+        _sessao = _criar_sessao(pool_size)
+        _cliente_async = _criar_cliente_async(pool_size)
+        _pid = os.getpid()
+
+
+async def encerrar():
+    """Fecha os clientes deste processo (chamado no shutdown do worker)."""
+    global _sessao, _cliente_async, _pid
+    with _lock:
+        sessao, cliente, _sessao, _cliente_async, _pid = _sessao, _cliente_async, None, None, None
+    if sessao is not None:
+        sessao.close()
+    if cliente is not None:
+        await cliente.aclose()
+
+
+def _garantir():
+    global _sessao, _cliente_async, _pid
+    if _pid == os.getpid():
+        return
+    with _lock:
+        if _pid != os.getpid():
+            _sessao = _criar_sessao(HTTP_POOL_SIZE)
+            _cliente_async = _criar_cliente_async(HTTP_POOL_SIZE)
+            _pid = os.getpid()
+
+
+def sessao() -> requests.Session:
+    _garantir()
+    return _sessao
+
+
+def cliente_async() -> httpx.AsyncClient:
+    _garantir()
+    return _cliente_async
@@ -0,0 +1,42 @@
+"""
+Pontos de instrumentação usados pelas rotas, clientes de provedores e banco de dados.
+"""
+
+import time
+from contextlib import contextmanager
+
+from metrics import DB_QUERY_DURATION, OUTBOUND_REQUEST_DURATION
+from tracing import span
+
+
+@contextmanager
+def chamada_externa(provider: str, operacao: str):
+    """
+    Mede a latência de uma chamada a um provedor externo e abre um span para ela.
+
+    Exemplo:
+        with chamada_externa("cora", "create_invoice"):
+            response = requests.post(...)
+    """
+    inicio = time.perf_counter()
+    resultado = "ok"
+    try:
+        with span(f"{provider}.{operacao}", provider=provider, operation=operacao):
+            yield
+    except Exception:
+        resultado = "error"
+        raise
+    finally:
+        OUTBOUND_REQUEST_DURATION.labels(provider, operacao, resultado).observe(time.perf_counter() - inicio)
+
+
+@contextmanager
+def consulta_db(sql: str):
+    """Mede o tempo de um comando SQL, rotulado pelo verbo (SELECT, INSERT, UPDATE...), e abre um span para ele."""
+    operacao = sql.lstrip().split(None, 1)[0].upper() if sql and sql.strip() else "UNKNOWN"
+    inicio = time.perf_counter()
+    try:
+        with span(f"db.{operacao.lower()}", statement=" ".join(sql.split())[:200]):
+            yield
+    finally:
+        DB_QUERY_DURATION.labels(operacao).observe(time.perf_counter() - inicio)
@@ -0,0 +1,186 @@
+"""
+Configuração de logging não bloqueante e estruturado.
+
+- Os handlers de arquivo e console rodam em uma thread de fundo (QueueListener);
+  a thread da requisição apenas enfileira o LogRecord.
+- A mensagem é formatada na thread de fundo (formatação preguiçosa) quando os
+  argumentos são imutáveis; a saída é JSON por linha (LOG_JSON).
+- Logs de sucesso de alto volume marcados com extra={"amostra": "<categoria>"}
+  são amostrados (LOG_AMOSTRAGEM); WARNING ou acima nunca são descartados.
+- Arquivos rotacionam por tamanho (LOG_MAX_BYTES) e diariamente.
+- Tokens, chaves e cabeçalhos de autorização são mascarados antes da gravação.
+
+Uso:
+    from logging_config import configurar_logging
+    configurar_logging("cora_payment_checker.log")
+"""
+
+import os
+import re
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from typing import Dict, Optional
+
+from config import LOG_AMOSTRAGEM, LOG_BACKUP_COUNT, LOG_JSON, LOG_LEVEL, LOG_MAX_BYTES
+from serializacao import dumps_str
+
+# Atributos padrão do LogRecord; os demais são campos estruturados passados via extra=
+_ATRIBUTOS_PADRAO = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "amostra"}
+_TIPOS_IMUTAVEIS = (str, int, float, bool, type(None), bytes)
+
+_PADROES_SEGREDO = [
+    (re.compile(r"(?i)(bearer\s+)[A-Za-z0-9\-._~+/]+=*"), r"\1***"),
+    (re.compile(r"(?i)(['\"]?(?:authorization|access_token|refresh_token|apikey|api_key|client_secret|password|token)['\"]?\s*[:=]\s*['\"]?)(?!bearer\s)([^'\",\s}]+)"), r"\1***"),
+    (re.compile(r"\b(APP_USR|TEST)-[0-9A-Za-z-]{20,}"), r"\1-***"),
+]
+
+
+def redigir(texto: str) -> str:
+    """Mascara tokens, chaves de API e cabeçalhos de autorização em um texto."""
+    for padrao, substituto in _PADROES_SEGREDO:
+        texto = padrao.sub(substituto, texto)
+    return texto
+
+
+class FormatadorJson(logging.Formatter):
+    """Uma linha JSON por registro, com campos extras e segredos mascarados."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redigir(record.getMessage()),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO and not chave.startswith("_"):
+                dados[chave] = redigir(valor) if isinstance(valor, str) else valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            dados["exc"] = redigir(record.exc_text)
+        return dumps_str(dados)
+
+
+class FormatadorTexto(logging.Formatter):
+    """Formato texto tradicional, com segredos mascarados."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        return redigir(super().format(record))
+
+
+class FiltroAmostragem(logging.Filter):
+    """
+    Descarta parte dos registros marcados com extra={"amostra": categoria}.
+
+    Apenas níveis abaixo de WARNING são amostrados.
+    """
+
+    def __init__(self, taxa_padrao: float = LOG_AMOSTRAGEM, taxas: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.taxa_padrao = taxa_padrao
+        self.taxas = taxas or {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        categoria = getattr(record, "amostra", None)
+        if categoria is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.taxas.get(categoria, self.taxa_padrao)
+
+
+class QueueHandlerPreguicoso(QueueHandler):
+    """
+    QueueHandler que adia a formatação da mensagem para a thread de fundo.
+
+    O QueueHandler padrão formata a mensagem na thread que chamou o logger.
+    Aqui isso só acontece se algum argumento for mutável (dict, list, objetos),
+    pois ele poderia mudar antes de a thread de fundo formatar o registro.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not all(isinstance(a, _TIPOS_IMUTAVEIS) for a in (args.values() if isinstance(args, dict) else args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Tracebacks precisam ser formatados enquanto os frames ainda existem
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class ArquivoRotativo(TimedRotatingFileHandler):
+    """Arquivo de log rotacionado diariamente ou ao atingir max_bytes, o que ocorrer primeiro."""
+
+    def __init__(self, filename: str, max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT):
+        super().__init__(filename, when="midnight", backupCount=backup_count, encoding="utf-8")
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() >= self.max_bytes
+
+    def rotation_filename(self, default_name: str) -> str:
+        # Várias rotações por tamanho no mesmo dia geram nomes .1, .2... em vez de sobrescrever
+        nome = default_name
+        contador = 0
+        while os.path.exists(nome):
+            contador += 1
+            nome = f"{default_name}.{contador}"
+        return super().rotation_filename(nome)
+
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def configurar_logging(arquivo: Optional[str] = None, nivel: str = LOG_LEVEL, json_: bool = LOG_JSON,
+                       taxas_amostragem: Optional[Dict[str, float]] = None) -> QueueListener:
+    """
+    Configura o logger raiz com fila + thread de fundo. Idempotente: chamadas seguintes retornam o listener existente.
+
+    Args:
+        arquivo (str): arquivo de log com rotação (opcional; sem ele, apenas console)
+        nivel (str): nível mínimo (padrão LOG_LEVEL)
+        json_ (bool): saída estruturada em JSON (padrão LOG_JSON)
+        taxas_amostragem (dict): taxa por categoria de amostragem
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        formatador = FormatadorJson() if json_ else FormatadorTexto()
+        handlers = [logging.StreamHandler()]
+        if arquivo:
+            handlers.append(ArquivoRotativo(arquivo))
+        for handler in handlers:
+            handler.setFormatter(formatador)
+
+        fila: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        handler_fila = QueueHandlerPreguicoso(fila)
+        handler_fila.addFilter(FiltroAmostragem(taxas=taxas_amostragem))
+
+        raiz = logging.getLogger()
+        for handler in list(raiz.handlers):
+            raiz.removeHandler(handler)
+        raiz.addHandler(handler_fila)
+        raiz.setLevel(nivel)
+
+        _listener = QueueListener(fila, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
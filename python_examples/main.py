@@ -1,23 +1,85 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from responses import RespostaJSON
 from mercadopago_routes import mp_router
 from webhooks import webhook_router
 from cora_routes import  router as cora_router 
 from cora_api import router as cora_api_router
 from manual_routes import manual_router
+from dashboard.dashboard_routes import dashboard_router
+from dashboard.resumo import encerrar_atualizacao_resumo, iniciar_atualizacao_resumo
+from eventos_pagamentos import encerrar_leitor_eventos, iniciar_leitor_eventos
+from admissao import middleware_admissao
+from compartimentos import CompartimentoSaturado, TempoEsgotado
+from metrics import encerrar_metricas_processo, metrics_router, middleware_metricas
+from tracing import middleware_tracing
+from logging_config import configurar_logging
+from database import fechar_pool, iniciar_pool
+from repositorio import obter_repositorio
+from requisicaotokencora import encerrar_renovacao_token, iniciar_renovacao_token
+from config import AQUECIMENTO_HABILITADO, CORA_CLIENT_ID
+from aquecimento import aquecer, aquecer_async, etapas_api, marcar_encerrando, marcar_pronto, registrar, saude_router, urls_async
+import compartimentos
+import http_clientes
+import mercadopago_client
 import logging
 
 
 
-# Configuração básica de logging
-logging.basicConfig(level=logging.INFO)
+# Logging estruturado com escrita em thread de fundo
+configurar_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Recursos de cada worker, criados depois do fork (servidor.py) e liberados no shutdown:
+    pool de conexões do banco, SDK/executor do Mercado Pago, clientes HTTP,
+    renovação do token da Cora, atualização do resumo do dashboard e leitura
+    dos eventos de status (SSE).
+
+    Antes de aceitar tráfego, o worker é aquecido (aquecimento.py): conexões
+    do pool, token da Cora e conexões keep-alive com cada provedor.
+    """
+    iniciar_pool()
+    mercadopago_client.iniciar()
+    http_clientes.iniciar()
+    obter_repositorio()
+    if AQUECIMENTO_HABILITADO:
+        resultados = await asyncio.to_thread(aquecer, etapas_api())
+        resultados.update(await aquecer_async(http_clientes.cliente_async(), urls_async()))
+        registrar(resultados)
+    else:
+        marcar_pronto()
+    if CORA_CLIENT_ID:
+        iniciar_renovacao_token()
+    iniciar_atualizacao_resumo()
+    await iniciar_leitor_eventos()
+    logger.info("Worker %s inicializado", os.getpid())
+    try:
+        yield
+    finally:
+        marcar_encerrando()
+        await encerrar_leitor_eventos()
+        encerrar_atualizacao_resumo()
+        encerrar_renovacao_token()
+        await http_clientes.encerrar()
+        mercadopago_client.encerrar()
+        compartimentos.encerrar()
+        fechar_pool()
+        encerrar_metricas_processo()
+        logger.info("Worker %s encerrado", os.getpid())
+
+
 # Criação da aplicação
 
-app = FastAPI(title="API de Cobrança Cora")
+# Respostas serializadas com orjson em todas as rotas
+app = FastAPI(title="API de Cobrança Cora", default_response_class=RespostaJSON, lifespan=lifespan)
 
 app.include_router(cora_router)
 
@@ -38,30 +100,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Controle de admissão das rotas de criação de pagamentos (o último registrado é o mais externo:
+# as recusas também passam pelas métricas e pelo tracing)
+app.middleware("http")(middleware_admissao)
+
+# Métricas por rota (latência e status) e span raiz de cada requisição
+app.middleware("http")(middleware_metricas)
+app.middleware("http")(middleware_tracing)
+
 # Inclusão das rotas
 app.include_router(mp_router, prefix="/mercadopago")
 app.include_router(cora_router, prefix="/cora")
 app.include_router(cora_api_router, prefix="/cora/api")
 app.include_router(manual_router, prefix="/pagamento")
 app.include_router(webhook_router, prefix="/webhook")
+app.include_router(dashboard_router, prefix="/dashboard")
+app.include_router(metrics_router)
+app.include_router(saude_router)
 
 # Manipulador personalizado para erros de validação
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    try:
-        # Tenta extrair o corpo da requisição como JSON
-        body = await request.json()
-    except Exception:
-        # Se falhar, tenta extrair como texto
-        body_bytes = await request.body()
-        body = body_bytes.decode('utf-8')
+    # Corpo já decodificado pelo FastAPI (bytes/str quando não era JSON válido)
+    body = exc.body
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode('utf-8', errors='replace')
 
     # Registra o corpo da requisição e os erros de validação
-    logger.error(f"Erro de validação na requisição: {request.url}")
-    logger.error(f"Corpo da requisição: {body}")
-    logger.error(f"Detalhes do erro: {exc.errors()}")
+    logger.error("Erro de validação na requisição: %s", request.url)
+    logger.error("Corpo da requisição: %s", body)
+    logger.error("Detalhes do erro: %s", exc.errors())
 
-    return JSONResponse(
+    return RespostaJSON(
         status_code=422,
         content={"detail": exc.errors(), "body": body}
     )
+
+
+# Compartimento de uma dependência cheio ou lento (compartimentos.py): falha rápida em vez de ocupar o worker
+@app.exception_handler(CompartimentoSaturado)
+async def compartimento_saturado_handler(request: Request, exc: CompartimentoSaturado):
+    logger.warning("Compartimento saturado em %s: %s", request.url.path, exc)
+    return RespostaJSON(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "2"})
+
+
+@app.exception_handler(TempoEsgotado)
+async def tempo_esgotado_handler(request: Request, exc: TempoEsgotado):
+    logger.warning("Tempo esgotado em %s: %s", request.url.path, exc)
+    return RespostaJSON(status_code=504, content={"detail": str(exc)})
@@ -1,39 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from database import get_db_connection
+import csv
+import io
+import asyncio
+import threading
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from config import DB_EXPORTACAO_LOTE, EVENTOS_CONEXOES_MAXIMAS, EVENTOS_DURACAO_MAXIMA, EVENTOS_KEEPALIVE
+from compartimentos import CompartimentoSaturado, TempoEsgotado, banco
+from eventos_pagamentos import STATUS_FINAIS, barramento
+from repositorio import PagamentosRepository, get_repositorio
+from serializacao import dumps
 from utils.supabase_sync import confirmar_pagamento_supabase
 from responses import ConfirmacaoManualResponse, ErroPadrao , ObterDadosManualResponse
 import logging
 
-# Configure logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 
 manual_router = APIRouter()
 
-def get_db():
-    with get_db_connection() as conn:
-        yield conn
-
 @manual_router.post("/confirmar-pagamento/{referencia_externa}", response_model=ConfirmacaoManualResponse, responses={500: {"model": ErroPadrao}})
-async def confirmar_pagamento(referencia_externa: str, db=Depends(get_db)):
+async def confirmar_pagamento(referencia_externa: str, repositorio: PagamentosRepository = Depends(get_repositorio)):
     try:
         # Log the incoming request
         logger.info(f"Endpoint called: POST /pagamento/https://obtuvufykxvbzrykpqvm.supabase.co/{referencia_externa}")
 
         # Query the pagamentos table
-        cursor = db.cursor()
-        query = """
-            SELECT status
-            FROM pagamentos
-            WHERE referencia_externa = ?
-        """
-        cursor.execute(query, (referencia_externa,))
-        result = cursor.fetchone()
+        status = await banco.chamar(repositorio.obter_status, referencia_externa)
 
-        if not result:
+        if status is None:
             logger.warning(f"Payment not found for referencia_externa: {referencia_externa}")
             return ConfirmacaoManualResponse(
                 referencia_externa=referencia_externa,
@@ -41,7 +36,6 @@ async def confirmar_pagamento(referencia_externa: str, db=Depends(get_db)):
                 resposta_supabase="Pagamento não encontrado."
             )
 
-        status = result[0]  # status column
         logger.info(f"Endpoint called: POST /confirmar-pagamento/{referencia_externa}")
 
         # Check if the payment is confirmed (approved in Mercado Pago terms)
@@ -74,28 +68,20 @@ async def confirmar_pagamento(referencia_externa: str, db=Depends(get_db)):
             resposta_supabase=message
         )
 
+    except (CompartimentoSaturado, TempoEsgotado):
+        raise
     except Exception as e:
         logger.error(f"Error confirming payment for referencia_externa {referencia_externa}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao confirmar pagamento: {str(e)}")
     
     
 @manual_router.get("/obter-dados/{referencia_externa}", response_model=ObterDadosManualResponse, responses={500: {"model": ErroPadrao}})
-async def obter_dados_pagamento(referencia_externa: str, db=Depends(get_db)):
+async def obter_dados_pagamento(referencia_externa: str, repositorio: PagamentosRepository = Depends(get_repositorio)):
     try:
-        # Log da requisição
-        logger.info(f"Endpoint called: POST /obter-dados/{referencia_externa}")
-
-        # Criação do cursor
-        cursor = db.cursor()
-        query = """
-            SELECT TOP 1 referencia, valor*100, nome, documento, [status], tipo, origem, criado_em, referencia_externa, url_pagamento
-            FROM pagamentos
-            WHERE referencia_externa = ?
-            ORDER BY id DESC
-        """
-        cursor.execute(query, (referencia_externa,))
-        result = cursor.fetchone()
-        cursor.close()  # Fecha o cursor explicitamente
+        # Log da requisição (rota consultada em polling pelo checkout)
+        logger.info("Endpoint called: GET /obter-dados/%s", referencia_externa, extra={"amostra": "pagamento.obter_dados"})
+
+        result = await banco.chamar(repositorio.obter_ultimo, referencia_externa)
 
         if not result:
             logger.warning(f"Payment not found for referencia_externa: {referencia_externa}")
@@ -117,18 +103,207 @@ async def obter_dados_pagamento(referencia_externa: str, db=Depends(get_db)):
 
         # Mapeamento correto dos campos
         return ObterDadosManualResponse(
-            id=str(result[0]),  # referencia
-            valor=str(result[1]),  # valor
-            nome=str(result[2]),  # nome
-            documento=str(result[3]),  # documento
-            status=str(result[4]),  # status
-            tipo=str(result[5]),  # tipo
-            origem=str(result[6]),  # origem
-            criado_em=str(result[7]),  # criado_em
-            referencia_externa=str(result[8]),  # referencia_externa
-            url_pagamento=str(result[9])  # url_pagamento
+            id=str(result["referencia"]),  # referencia
+            valor=str(result["valor"]),  # valor
+            nome=str(result["nome"]),  # nome
+            documento=str(result["documento"]),  # documento
+            status=str(result["status"]),  # status
+            tipo=str(result["tipo"]),  # tipo
+            origem=str(result["origem"]),  # origem
+            criado_em=str(result["criado_em"]),  # criado_em
+            referencia_externa=str(result["referencia_externa"]),  # referencia_externa
+            url_pagamento=str(result["url_pagamento"])  # url_pagamento
         )
 
+    except (CompartimentoSaturado, TempoEsgotado):
+        raise
     except Exception as e:
         logger.error(f"Error fetching payment for referencia_externa {referencia_externa}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao obter dados do pagamento: {str(e)}")
+
+
+@manual_router.get("/stream/{referencia_externa}", responses={503: {"model": ErroPadrao}})
+async def stream_status_pagamento(referencia_externa: str, repositorio: PagamentosRepository = Depends(get_repositorio)):
+    """
+    Status do pagamento em tempo real (Server-Sent Events), no lugar do polling em /obter-dados.
+
+    O primeiro evento é o status atual no banco; os seguintes chegam a cada
+    mudança publicada (eventos_pagamentos.py).
+
+    Contrato com o frontend:
+    - `event: status`: status atual (inclusive "rejected", que não encerra o
+      stream: o cliente pode tentar de novo com a mesma referência);
+    - `event: fim`: enviado logo após um status de STATUS_FINAIS; o cliente deve
+      chamar EventSource.close(), senão o navegador reconecta e recebe o mesmo
+      status final em seguida;
+    - fim da conexão sem `event: fim` (após EVENTOS_DURACAO_MAXIMA segundos):
+      o EventSource reconecta normalmente.
+    """
+    if barramento.conexoes() >= EVENTOS_CONEXOES_MAXIMAS:
+        raise HTTPException(status_code=503, detail="Muitas conexões abertas, tente novamente", headers={"Retry-After": "5"})
+
+    # Assina antes de ler o banco para não perder uma mudança entre a leitura e a assinatura
+    fila = barramento.assinar(referencia_externa)
+    try:
+        atual = await banco.chamar(repositorio.obter_ultimo, referencia_externa)
+    except Exception:
+        barramento.cancelar(referencia_externa, fila)
+        raise
+    inicial = {
+        "referencia_externa": referencia_externa,
+        "referencia": atual["referencia"] if atual else None,
+        "status": atual["status"] if atual else None,
+        "status_detail": None,
+        "criado_em": str(atual["criado_em"]) if atual else None,
+    }
+    return StreamingResponse(
+        _eventos_sse(referencia_externa, fila, inicial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+SSE_FIM = b"event: fim\ndata: {}\n\n"
+
+
+def _sse(evento: dict) -> bytes:
+    dados = {chave: evento.get(chave) for chave in ("referencia_externa", "referencia", "status", "status_detail", "criado_em")}
+    identificador = f"id: {evento['id']}\n" if evento.get("id") else ""
+    return f"{identificador}event: status\n".encode() + b"data: " + dumps(dados) + b"\n\n"
+
+
+async def _eventos_sse(referencia_externa: str, fila: asyncio.Queue, inicial: dict) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    limite = loop.time() + EVENTOS_DURACAO_MAXIMA
+    try:
+        if inicial["status"] in STATUS_FINAIS:
+            yield b"retry: 3000\n\n" + _sse(inicial) + SSE_FIM
+            return
+        yield b"retry: 3000\n\n" + _sse(inicial)
+        while loop.time() < limite:
+            try:
+                evento = await asyncio.wait_for(fila.get(), timeout=min(EVENTOS_KEEPALIVE, limite - loop.time()))
+            except asyncio.TimeoutError:
+                # Comentário SSE: mantém a conexão viva em proxies com timeout de inatividade
+                yield b": keep-alive\n\n"
+                continue
+            if evento["status"] in STATUS_FINAIS:
+                yield _sse(evento) + SSE_FIM
+                return
+            yield _sse(evento)
+    finally:
+        barramento.cancelar(referencia_externa, fila)
+
+
+@manual_router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={200: {
+        "content": {"text/csv": {}, "application/x-ndjson": {}},
+        "description": "Pagamentos em ordem de id; a coluna id é o token de retomada",
+    }},
+)
+async def exportar_pagamentos(
+    formato: Literal["csv", "ndjson"] = "csv",
+    origem: Optional[str] = None,
+    tipo: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    desde: Optional[datetime] = Query(None, description="criado_em a partir de (inclusivo)"),
+    ate: Optional[datetime] = Query(None, description="criado_em antes de (exclusivo)"),
+    retomar: Optional[int] = Query(None, description="id da última linha recebida; continua a partir da seguinte"),
+    repositorio: PagamentosRepository = Depends(get_repositorio),
+):
+    """
+    Exporta pagamentos em CSV ou NDJSON, lendo o banco em blocos (fetchmany) e
+    enviando cada bloco assim que é lido.
+
+    As linhas saem em ordem de id. Se a exportação for interrompida, repita a
+    chamada com os mesmos filtros e retomar=<id da última linha recebida>; na
+    retomada em CSV o cabeçalho não é repetido.
+
+    Cada bloco é lido nas threads do compartimento do banco, como as demais
+    consultas: uma exportação longa não ocupa o threadpool padrão.
+    """
+    logger.info("Exportação de pagamentos: formato=%s origem=%s tipo=%s status=%s desde=%s ate=%s retomar=%s",
+                formato, origem, tipo, status, desde, ate, retomar)
+    blocos = repositorio.exportar_pagamentos(
+        origem=origem, tipo=tipo, status=status, desde=desde, ate=ate,
+        apos_id=retomar, tamanho_lote=DB_EXPORTACAO_LOTE,
+    )
+    colunas = repositorio.COLUNAS_EXPORTACAO
+    if formato == "ndjson":
+        conteudo = _ndjson(blocos, colunas)
+        media_type = "application/x-ndjson"
+    else:
+        conteudo = _csv(blocos, colunas, cabecalho=retomar is None)
+        media_type = "text/csv; charset=utf-8"
+    return StreamingResponse(
+        _no_compartimento(conteudo),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="pagamentos.{formato}"'},
+    )
+
+
+def _csv(blocos: Iterator[List[tuple]], colunas, cabecalho: bool = True) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    if cabecalho:
+        escritor.writerow(colunas)
+    for linhas in blocos:
+        escritor.writerows(linhas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _ndjson(blocos: Iterator[List[tuple]], colunas) -> Iterator[bytes]:
+    for linhas in blocos:
+        yield b"".join(dumps(dict(zip(colunas, linha))) + b"\n" for linha in linhas)
+
+
+class _PassosExportacao:
+    """
+    Gerador da exportação avançado um passo por vez nas threads do compartimento do banco.
+
+    Um passo que estourou o timeout do compartimento continua rodando na thread;
+    fechar() espera esse passo terminar (mesmo lock) antes de fechar o gerador,
+    senão close() falharia com "generator already executing" e o cursor e a
+    conexão só seriam devolvidos pelo GC.
+    """
+
+    FIM = object()
+
+    def __init__(self, conteudo: Iterator[bytes]):
+        self._conteudo = conteudo
+        self._lock = threading.Lock()
+
+    def proximo(self):
+        with self._lock:
+            return next(self._conteudo, self.FIM)
+
+    def fechar(self):
+        with self._lock:
+            self._conteudo.close()
+
+
+async def _no_compartimento(conteudo: Iterator[bytes]) -> AsyncIterator[bytes]:
+    # Um passo do gerador (um fetchmany) por chamada ao compartimento do banco
+    passos = _PassosExportacao(conteudo)
+    try:
+        while True:
+            parte = await banco.chamar(passos.proximo)
+            if parte is passos.FIM:
+                return
+            yield parte
+    except Exception as e:
+        # Depois do primeiro bloco o status 200 já foi enviado: a falha só pode ser registrada
+        logger.error(f"Exportação de pagamentos interrompida: {str(e)}")
+        raise
+    finally:
+        # Fecha o cursor e devolve a conexão também quando o cliente desconecta
+        try:
+            await banco.garantir(passos.fechar)
+        except Exception as e:
+            logger.warning(f"Erro ao encerrar a exportação de pagamentos: {str(e)}")
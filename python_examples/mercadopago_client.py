@@ -0,0 +1,192 @@
+"""
+Cliente do SDK do Mercado Pago para uso a partir de handlers async.
+
+O SDK é síncrono (requests). Para não bloquear o event loop do uvicorn, as
+chamadas são executadas no compartimento do Mercado Pago (compartimentos.py):
+threads próprias e limitadas, com timeout e cancelamento por chamada. O SDK
+usa uma sessão HTTP com pool de conexões em vez de abrir uma sessão nova a
+cada requisição.
+
+Criação de pagamento e timeout: quando o compartimento desiste da espera, o
+POST pode já ter chegado ao Mercado Pago. Por isso cada criação leva um
+x-idempotency-key estável (a mesma tentativa repetida pelo cliente não cobra
+duas vezes) e, se a resposta chegar depois do timeout, é entregue ao callback
+`ao_concluir_apos_timeout` para que o pagamento seja gravado mesmo assim.
+
+SDK e pool são criados por processo em iniciar() (lifespan de cada
+worker) e liberados em encerrar().
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import compartimentos
+from config import MP_ACCESS_TOKEN, MP_API_URL, MP_POOL_SIZE, MP_TIMEOUT
+from instrumentacao import chamada_externa
+
+logger = logging.getLogger(__name__)
+
+_MP_API_URL_PADRAO = "https://api.mercadopago.com"
+
+
+class PooledHttpClient:
+    """
+    Transporte HTTP do SDK (mesma interface de mercadopago.http.HttpClient) reutilizando
+    uma única requests.Session com pool de conexões. Combinado com HttpClient em iniciar().
+    """
+
+    def __init__(self, pool_size: int = MP_POOL_SIZE, max_retries: int = 3):
+        self.session = requests.Session()
+        retry_strategy = Retry(
+            total=max_retries,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "PUT", "DELETE"]  # POST não é repetido automaticamente
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry_strategy)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, maxretries=None, retry_on=None, backoff_factor=None, **kwargs):
+        # O SDK monta as URLs com a base fixa; MP_API_URL permite usar o emulador local
+        if MP_API_URL != _MP_API_URL_PADRAO and url.startswith(_MP_API_URL_PADRAO):
+            url = MP_API_URL + url[len(_MP_API_URL_PADRAO):]
+        api_result = self.session.request(method, url, **kwargs)
+        response = {"status": api_result.status_code, "response": None}
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError:
+                # Proxies e gateways respondem HTML/texto em 502/503
+                response["response"] = {"message": api_result.text[:500]}
+        return response
+
+    def get(self, url, headers, params=None, timeout=None, **opcoes):
+        return self.request("GET", url, headers=headers, params=params, timeout=timeout, **opcoes)
+
+    def post(self, url, headers, data=None, params=None, timeout=None, **opcoes):
+        return self.request("POST", url, headers=headers, data=data, params=params, timeout=timeout, **opcoes)
+
+    def put(self, url, headers, data=None, params=None, timeout=None, **opcoes):
+        return self.request("PUT", url, headers=headers, data=data, params=params, timeout=timeout, **opcoes)
+
+    def delete(self, url, headers, params=None, timeout=None, **opcoes):
+        return self.request("DELETE", url, headers=headers, params=params, timeout=timeout, **opcoes)
+
+    def close(self):
+        self.session.close()
+
+
+http_client: Optional[PooledHttpClient] = None
+sdk = None
+_lock = threading.RLock()
+
+
+def iniciar(pool_size: int = MP_POOL_SIZE):
+    """Cria o SDK e o pool HTTP deste processo (lifespan do worker)."""
+    global http_client, sdk
+    # O SDK é importado apenas aqui: importar rotas e scripts não carrega o pacote mercadopago
+    import mercadopago
+    from mercadopago.config import RequestOptions
+    from mercadopago.http.http_client import HttpClient
+
+    # O SDK exige uma instância de HttpClient; os métodos de PooledHttpClient têm precedência
+    classe = type("PooledHttpClient", (PooledHttpClient, HttpClient), {})
+
+    with _lock:
+        http_client = classe(pool_size=pool_size)
+        sdk = mercadopago.SDK(
+            MP_ACCESS_TOKEN,
+            http_client=http_client,
+            request_options=RequestOptions(connection_timeout=MP_TIMEOUT)
+        )
+
+
+def encerrar():
+    """Libera as conexões HTTP deste processo."""
+    global http_client, sdk
+    with _lock:
+        if http_client is not None:
+            http_client.close()
+        http_client, sdk = None, None
+
+
+def _garantir():
+    # Scripts e testes fora do servidor inicializam no primeiro uso
+    if sdk is None:
+        with _lock:
+            if sdk is None:
+                iniciar()
+
+
+def chave_idempotencia(payment_data: dict) -> str:
+    """
+    x-idempotency-key da criação: derivada da referência externa e do token do cartão.
+
+    O token é de uso único e muda a cada nova digitação do cartão, então a
+    repetição da mesma tentativa (ex.: após um 504) reaproveita o pagamento já
+    criado, enquanto uma nova tentativa com outro cartão gera outro pagamento.
+    """
+    base = f"{payment_data.get('external_reference') or ''}:{payment_data.get('token') or ''}"
+    return hashlib.sha256(base.encode()).hexdigest()
+
+
+def _criar_pagamento_sdk(payment_data: dict, chave: str) -> dict:
+    from mercadopago.config import RequestOptions
+
+    opcoes = RequestOptions(connection_timeout=MP_TIMEOUT, custom_headers={"x-idempotency-key": chave})
+    with chamada_externa("mercadopago", "create_payment"):
+        return sdk.payment().create(payment_data, opcoes)
+
+
+async def criar_pagamento(payment_data: dict, timeout: float = MP_TIMEOUT,
+                          ao_concluir_apos_timeout: Optional[Callable[[dict], None]] = None) -> tuple:
+    """
+    Cria um pagamento via sdk.payment().create no compartimento do Mercado Pago.
+
+    Args:
+        payment_data (dict): corpo do pagamento
+        timeout (float): espera máxima, incluindo a fila do compartimento
+        ao_concluir_apos_timeout: chamado na thread do compartimento com o resultado
+            do SDK se a criação terminar depois do TempoEsgotado
+
+    Returns:
+        tuple: (resultado do SDK, TempoChamada)
+
+    Raises:
+        CompartimentoSaturado: se o compartimento do Mercado Pago estiver cheio
+        TempoEsgotado: se a chamada exceder o timeout
+    """
+    _garantir()
+    chave = chave_idempotencia(payment_data)
+    estado = {"expirada": False, "resultado": None}
+    trava = threading.Lock()
+
+    def criar():
+        resultado = _criar_pagamento_sdk(payment_data, chave)
+        with trava:
+            expirada = estado["expirada"]
+            estado["resultado"] = resultado
+        if expirada:
+            logger.warning(f"Mercado Pago payment.create concluído após o timeout: status={resultado.get('status')}")
+            if ao_concluir_apos_timeout is not None:
+                ao_concluir_apos_timeout(resultado)
+        return resultado
+
+    try:
+        resultado, tempo = await compartimentos.mercadopago.executar(criar, timeout=timeout)
+    except compartimentos.TempoEsgotado:
+        with trava:
+            estado["expirada"] = True
+            resultado = estado["resultado"]
+        if resultado is None:
+            raise
+        # Concluiu no instante do timeout: o resultado já está disponível
+        tempo = compartimentos.TempoChamada(prefixo=compartimentos.mercadopago.prefixo_timing)
+    logger.info(f"Mercado Pago payment.create: fila={tempo.fila * 1000:.1f}ms provedor={tempo.provedor * 1000:.1f}ms")
+    return resultado, tempo
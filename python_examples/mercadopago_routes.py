@@ -1,20 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-import mercadopago
-from config import MP_ACCESS_TOKEN
-from database import get_db_connection
+from repositorio import Pagamento, PagamentosRepository, get_repositorio
+from compartimentos import CompartimentoSaturado, TempoEsgotado, banco
+from mercadopago_client import criar_pagamento
 from responses import CartaoResponse, ErroPadrao
 import logging
-import json
 
-# Configure logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
-sdk = mercadopago.SDK(MP_ACCESS_TOKEN)
 
 mp_router = APIRouter()
 
@@ -48,12 +40,32 @@ class MercadoPagoProcessedResponse(BaseModel):
     message: str | None = None
     mp_payment_id: str | None = None
 
-def get_db():
-    with get_db_connection() as conn:
-        yield conn
+
+def _gravar_se_novo(repositorio: PagamentosRepository, pagamento: Pagamento, registrar_datas: bool = True):
+    # A repetição com a mesma chave de idempotência devolve o mesmo pagamento do Mercado Pago,
+    # que pode já ter sido gravado pela criação concluída após o timeout
+    if not repositorio.existe(pagamento.referencia):
+        repositorio.inserir_pagamento(pagamento, registrar_datas=registrar_datas)
+
+
+def _gravar_apos_timeout(repositorio: PagamentosRepository, criar_registro, registrar_datas: bool = True):
+    """Callback de criar_pagamento: grava o pagamento criado depois que a rota já respondeu 504."""
+    def gravar(result: dict):
+        response = result.get("response") or {}
+        if result.get("status", 500) >= 400 or not response.get("id"):
+            return
+        try:
+            _gravar_se_novo(repositorio, criar_registro(response), registrar_datas)
+        except Exception as e:
+            logger.error(f"Erro ao gravar pagamento {response.get('id')} concluído após o timeout: {str(e)}")
+    return gravar
+
+
+MENSAGEM_TIMEOUT = ("Mercado Pago não respondeu a tempo; o pagamento pode ter sido criado. "
+                    "Repita a requisição com os mesmos dados para obter o resultado sem nova cobrança")
 
 @mp_router.post("/pagar", response_model=CartaoResponse, responses={500: {"model": ErroPadrao}})
-async def pagar(pagamento: PagamentoCreate, db=Depends(get_db)):
+async def pagar(pagamento: PagamentoCreate, response_http: Response, repositorio: PagamentosRepository = Depends(get_repositorio)):
     try:
         payment_data = {
             "transaction_amount": pagamento.transaction_amount,
@@ -64,37 +76,44 @@ async def pagar(pagamento: PagamentoCreate, db=Depends(get_db)):
             "payer": {"email": pagamento.payer_email},
         }
 
-        result = sdk.payment().create(payment_data)
+        def registro(response: dict) -> Pagamento:
+            return Pagamento(
+                referencia=str(response.get("id", "")),
+                valor=response.get("transaction_amount", 0),
+                nome=pagamento.nome,
+                documento=pagamento.documento,
+                status=response.get("status", "desconhecido"),
+                tipo=pagamento.tipo,
+                origem="mercadopago"
+            )
+
+        result, tempo = await criar_pagamento(
+            payment_data, ao_concluir_apos_timeout=_gravar_apos_timeout(repositorio, registro, registrar_datas=False)
+        )
+        response_http.headers["Server-Timing"] = tempo.server_timing()
         response = result["response"]
 
-        cursor = db.cursor()
-        query = """
-            INSERT INTO pagamentos (referencia, valor, nome, documento, status, tipo, origem)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        values = (
-            str(response.get("id", "")),
-            response.get("transaction_amount", 0),
-            pagamento.nome,
-            pagamento.documento,
-            response.get("status", "desconhecido"),
-            pagamento.tipo,
-            "mercadopago"
-        )
-        cursor.execute(query, values)
-        db.commit()
+        # Pagamento já criado no Mercado Pago: a gravação não é recusada pelo compartimento do banco
+        await banco.garantir(_gravar_se_novo, repositorio, registro(response), registrar_datas=False)
 
         return response
+    except CompartimentoSaturado as e:
+        logger.error(f"Error processing /pagar endpoint: {str(e)}")
+        raise HTTPException(status_code=503, detail="Mercado Pago indisponível no momento, tente novamente")
+    except TempoEsgotado as e:
+        logger.error(f"Error processing /pagar endpoint: {str(e)}")
+        raise HTTPException(status_code=504, detail=MENSAGEM_TIMEOUT)
     except Exception as e:
         logger.error(f"Error processing /pagar endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao processar pagamento: {str(e)}")
 
 @mp_router.post("/processar-pagamento-token", response_model=MercadoPagoProcessedResponse, responses={500: {"model": ErroPadrao}})
-async def processar_pagamento_token(request: Request, pagamento: PagamentoTokenCreate, db=Depends(get_db)):
+async def processar_pagamento_token(request: Request, pagamento: PagamentoTokenCreate, response_http: Response, repositorio: PagamentosRepository = Depends(get_repositorio)):
     try:
-        # Log request details
-        logger.info(f"Endpoint called: {request.method} {request.url}")
-        logger.info(f"Request body: {json.dumps(pagamento.dict(), ensure_ascii=False)}")
+        logger.info(
+            "Processando pagamento: external_reference=%s payment_method_id=%s installments=%s",
+            pagamento.external_reference, pagamento.payment_method_id, pagamento.installments
+        )
 
         # Convert transaction_amount from centavos to reais (e.g., 11490 -> 114.90)
         transaction_amount_reais = pagamento.transaction_amount / 100
@@ -117,39 +136,41 @@ async def processar_pagamento_token(request: Request, pagamento: PagamentoTokenC
             "external_reference": pagamento.external_reference
         }
 
+        def registro(response: dict) -> Pagamento:
+            return Pagamento(
+                referencia=str(response.get("id", "")),
+                valor=transaction_amount_reais,  # Store amount in reais
+                documento=pagamento.payer.get("identification", {}).get("number"),
+                status=str(response.get("status", "desconhecido")),
+                tipo="CARTAO",
+                origem="mercadopago",
+                referencia_externa=pagamento.external_reference,
+                status_detail=str(response.get("status_detail", "desconhecido"))
+            )
+
         # Create payment using Mercado Pago SDK
-        result = sdk.payment().create(payment_data)
-        logger.info(f"Mercado Pago response: {json.dumps(result, ensure_ascii=False)}")
+        result, tempo = await criar_pagamento(
+            payment_data, ao_concluir_apos_timeout=_gravar_apos_timeout(repositorio, registro)
+        )
+        response_http.headers["Server-Timing"] = tempo.server_timing()
+        logger.debug("Mercado Pago response: %s", result)
         
         # Check if the response indicates an error
         if result.get("status") >= 400:
-            logger.error(f"Mercado Pago error: status={result.get('status')}, message={result.get('response', {}).get('message', 'Unknown error')}")
+            logger.error("Mercado Pago error: status=%s, message=%s", result.get("status"), result.get("response", {}).get("message", "Unknown error"))
             raise HTTPException(status_code=result.get("status", 500), detail=f"Mercado Pago error: {result.get('response', {}).get('message', 'Unknown error')}")
 
         response = result["response"]
 
         # Log successful payment creation
-        logger.info(f"Payment created successfully: mp_payment_id={response.get('id', '')}, status={response.get('status', 'desconhecido')}, status_detail={response.get('status_detail', 'N/A')}")
-
-        # Save to database
-        cursor = db.cursor()
-        query = """
-            INSERT INTO pagamentos (referencia, valor, nome, documento, status, tipo, origem, criado_em, referencia_externa, status_detail, atualizado_em)
-            VALUES (?, ?, ?, ?, ?, ?, ?, getdate(), ?,? ,getdate() )
-        """
-        values = (
-            str(response.get("id", "")),
-            transaction_amount_reais,  # Store amount in reais
-            None,
-            pagamento.payer.get("identification", {}).get("number"),
-            str(response.get("status", "desconhecido")),
-            "CARTAO",
-            "mercadopago",
-            pagamento.external_reference,
-            str(response.get("status_detail", "desconhecido"))
+        logger.info(
+            "Payment created successfully: mp_payment_id=%s, status=%s, status_detail=%s",
+            response.get("id", ""), response.get("status", "desconhecido"), response.get("status_detail", "N/A"),
+            extra={"amostra": "mercadopago.pagamento"}
         )
-        cursor.execute(query, values)
-        db.commit()
+
+        # Save to database (pagamento já criado no Mercado Pago: a gravação não é recusada pelo compartimento do banco)
+        await banco.garantir(_gravar_se_novo, repositorio, registro(response))
 
         # Prepare response message based on status
         message = None
@@ -168,9 +189,15 @@ async def processar_pagamento_token(request: Request, pagamento: PagamentoTokenC
             mp_payment_id=str(response.get("id", "")),
             message=message
         )
-        logger.info(f"Response sent: {json.dumps(response_data.dict(), ensure_ascii=False)}")
+        logger.debug("Response sent: %s", response_data)
 
         return response_data
+    except CompartimentoSaturado as e:
+        logger.error(f"Error processing /processar-pagamento-token endpoint: {str(e)}")
+        raise HTTPException(status_code=503, detail="Mercado Pago indisponível no momento, tente novamente")
+    except TempoEsgotado as e:
+        logger.error(f"Error processing /processar-pagamento-token endpoint: {str(e)}")
+        raise HTTPException(status_code=504, detail=MENSAGEM_TIMEOUT)
     except HTTPException as e:
         # Re-raise HTTP exceptions (e.g., Mercado Pago errors)
         logger.error(f"Error processing /processar-pagamento-token endpoint: {str(e)}")
@@ -0,0 +1,172 @@
+"""
+Métricas no formato Prometheus expostas em GET /metrics.
+
+- Latência e contagem de status por rota (middleware HTTP);
+- recusas do controle de admissão das rotas de criação de pagamentos;
+- latência de chamadas externas por provedor e operação (Cora, Mercado Pago, Supabase);
+- hedges e novas tentativas das consultas de status;
+- tempo de consultas ao banco de dados;
+- ocupação de pools de conexão, executores e compartimentos por dependência;
+- renovações de token.
+
+Com vários workers (servidor.py), PROMETHEUS_MULTIPROC_DIR é definido antes de
+iniciar os processos e /metrics agrega os arquivos de todos os workers. A
+ocupação de pools e executores (resource_in_use) é a do worker que atendeu o scrape.
+"""
+
+import os
+import time
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import APIRouter, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+from rotas import template_rota
+
+logger = logging.getLogger(__name__)
+
+# Buckets cobrindo de poucos milissegundos até o timeout de rede (30s)
+LATENCIA_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latência das requisições HTTP por rota",
+    ["method", "route"],
+    buckets=LATENCIA_BUCKETS,
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "Requisições HTTP por rota e status",
+    ["method", "route", "status"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejected_total",
+    "Requisições recusadas (503) pelo controle de admissão por grupo de rotas",
+    ["group"],
+)
+BULKHEAD_REJECTIONS = Counter(
+    "bulkhead_rejected_total",
+    "Chamadas recusadas por compartimento (saturated) ou encerradas pelo timeout (timeout)",
+    ["bulkhead", "reason"],
+)
+OUTBOUND_REQUEST_DURATION = Histogram(
+    "outbound_request_duration_seconds",
+    "Latência das chamadas externas por provedor e operação",
+    ["provider", "operation", "outcome"],
+    buckets=LATENCIA_BUCKETS,
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Tempo de execução de comandos SQL",
+    ["operation"],
+    buckets=LATENCIA_BUCKETS,
+)
+OUTBOUND_HEDGEABLE = Counter(
+    "outbound_hedgeable_requests_total",
+    "Requisições de saída idempotentes elegíveis a hedge (politica_requisicoes.py)",
+    ["provider", "operation"],
+)
+OUTBOUND_HEDGES = Counter(
+    "outbound_hedge_total",
+    "Hedges por provedor, operação e resultado (sent, won, denied)",
+    ["provider", "operation", "result"],
+)
+OUTBOUND_RETRIES = Counter(
+    "outbound_retry_total",
+    "Novas tentativas após erro, permitidas ou negadas pelo orçamento do provedor",
+    ["provider", "result"],
+)
+TOKEN_REFRESHES = Counter(
+    "token_refresh_total",
+    "Renovações de token de acesso por provedor e resultado",
+    ["provider", "result"],
+)
+STATUS_WRITES = Counter(
+    "status_write_total",
+    "Gravações de status dos verificadores por destino e resultado (written, skipped, ignored)",
+    ["provider", "target", "result"],
+)
+
+
+class _ColetorSaturacao:
+    """Coleta, no momento do scrape, a ocupação de pools e executores registrados."""
+
+    def __init__(self):
+        self._fontes: Dict[str, Tuple[str, Callable[[], int], Optional[Callable[[], int]]]] = {}
+
+    def registrar(self, nome: str, tipo: str, ocupacao: Callable[[], int], capacidade: Optional[Callable[[], int]] = None):
+        self._fontes[nome] = (tipo, ocupacao, capacidade)
+
+    def collect(self):
+        em_uso = GaugeMetricFamily("resource_in_use", "Itens em uso em pools e executores", labels=["resource", "kind"])
+        limite = GaugeMetricFamily("resource_capacity", "Capacidade de pools e executores", labels=["resource", "kind"])
+        for nome, (tipo, ocupacao, capacidade) in list(self._fontes.items()):
+            try:
+                em_uso.add_metric([nome, tipo], ocupacao())
+                if capacidade is not None:
+                    limite.add_metric([nome, tipo], capacidade())
+            except Exception as e:
+                logger.warning(f"Falha ao coletar ocupação de {nome}: {str(e)}")
+        yield em_uso
+        yield limite
+
+
+_saturacao = _ColetorSaturacao()
+REGISTRY.register(_saturacao)
+
+
+def registrar_saturacao(nome: str, tipo: str, ocupacao: Callable[[], int], capacidade: Optional[Callable[[], int]] = None):
+    """
+    Registra um pool ou executor para exposição de ocupação/capacidade.
+
+    Args:
+        nome (str): identificador do recurso (ex.: "mercadopago")
+        tipo (str): "executor" ou "pool"
+        ocupacao: função que retorna o número de itens em uso
+        capacidade: função que retorna a capacidade máxima (opcional)
+    """
+    _saturacao.registrar(nome, tipo, ocupacao, capacidade)
+
+
+async def middleware_metricas(request: Request, call_next):
+    """Middleware HTTP que mede latência e status por rota."""
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Usa o template da rota (ex.: /pagamento/obter-dados/{referencia_externa}) para limitar a cardinalidade
+        route = template_rota(request) or "nao_encontrada"
+        HTTP_REQUEST_DURATION.labels(request.method, route).observe(time.perf_counter() - inicio)
+        HTTP_REQUESTS.labels(request.method, route, str(status)).inc()
+
+
+def _multiprocesso() -> bool:
+    return bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def _registro_exposicao():
+    if not _multiprocesso():
+        return REGISTRY
+    registro = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registro)
+    registro.register(_saturacao)
+    return registro
+
+
+def encerrar_metricas_processo():
+    """Marca o worker atual como encerrado (modo multiprocesso); chamado no shutdown do worker."""
+    if _multiprocesso():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(_registro_exposicao()), media_type=CONTENT_TYPE_LATEST)
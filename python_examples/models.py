@@ -62,6 +62,16 @@ class CriarCobrancaResponse(BaseModel):
     url_pagamento: Optional[str] = None
     vencimento: str
 
+class ResultadoCobrancaLote(BaseModel):
+    """Uma linha do NDJSON de POST /cora/cobrancas/lote."""
+    indice: int
+    referencia: str
+    ok: bool
+    id: Optional[str] = None
+    status: Optional[str] = None
+    url_pagamento: Optional[str] = None
+    erro: Optional[str] = None
+
 class ObterDadosManualResponse(BaseModel):
     id: str
     valor : str
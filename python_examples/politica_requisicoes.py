@@ -0,0 +1,213 @@
+"""
+Política das requisições de saída idempotentes (consultas de status na Cora e no Mercado Pago).
+
+Com NETWORK_TIMEOUT de 30s, uma única resposta lenta do provedor segurava o
+ciclo inteiro do verificador. Para cada endpoint (provedor + operação) este
+módulo mantém:
+
+- JanelaLatencia: as últimas HEDGE_AMOSTRAS latências de respostas recebidas,
+  de onde sai o percentil HEDGE_PERCENTIL (p95 por padrão);
+- hedge: se a primeira requisição não responde até esse percentil, uma segunda
+  requisição idêntica é enviada e vale a primeira resposta que chegar. A
+  requisição perdedora termina em segundo plano (requests não permite
+  cancelá-la) e devolve a conexão ao pool;
+- OrcamentoTentativas: hedges e novas tentativas (Verificador.consultar) do
+  mesmo provedor gastam de um orçamento comum, que recebe RETRY_ORCAMENTO_RAZAO
+  ficha por requisição original mais RETRY_ORCAMENTO_MINIMO fichas por segundo.
+  Com o provedor degradado as requisições extras param no limite do orçamento
+  em vez de multiplicar a carga.
+
+Taxa de hedge (Prometheus):
+    sum(rate(outbound_hedge_total{result="sent"}[5m])) / sum(rate(outbound_hedgeable_requests_total[5m]))
+
+Uso apenas com GETs: o hedge envia a mesma requisição duas vezes.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional, Tuple
+
+import requests
+
+import http_clientes
+from config import (
+    HEDGE_AMOSTRAS,
+    HEDGE_AMOSTRAS_MINIMAS,
+    HEDGE_ATRASO_MAXIMO_MS,
+    HEDGE_ATRASO_MINIMO_MS,
+    HEDGE_HABILITADO,
+    HEDGE_PERCENTIL,
+    HEDGE_THREADS,
+    RETRY_ORCAMENTO_MINIMO,
+    RETRY_ORCAMENTO_RAZAO,
+)
+from instrumentacao import chamada_externa
+from metrics import OUTBOUND_HEDGEABLE, OUTBOUND_HEDGES, OUTBOUND_RETRIES, registrar_saturacao
+
+logger = logging.getLogger(__name__)
+
+FICHAS_MAXIMAS = 10.0  # rajada máxima de requisições extras por provedor
+
+
+class JanelaLatencia:
+    """Últimas N latências (segundos) de um endpoint."""
+
+    def __init__(self, tamanho: int = HEDGE_AMOSTRAS):
+        self._amostras: deque = deque(maxlen=tamanho)
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos: float):
+        with self._lock:
+            self._amostras.append(segundos)
+
+    def percentil(self, p: float, minimo_amostras: int = HEDGE_AMOSTRAS_MINIMAS) -> Optional[float]:
+        """Percentil `p` (0 a 1) das amostras, ou None enquanto houver menos de `minimo_amostras`."""
+        with self._lock:
+            amostras = sorted(self._amostras)
+        if not amostras or len(amostras) < minimo_amostras:
+            return None
+        return amostras[min(len(amostras) - 1, int(p * len(amostras)))]
+
+
+class OrcamentoTentativas:
+    """Token bucket das requisições extras (hedges e novas tentativas) de um provedor."""
+
+    def __init__(self, razao: float = RETRY_ORCAMENTO_RAZAO, minimo_por_segundo: float = RETRY_ORCAMENTO_MINIMO,
+                 maximo: float = FICHAS_MAXIMAS):
+        self.razao = razao
+        self.minimo_por_segundo = minimo_por_segundo
+        self.maximo = maximo
+        self._fichas = maximo
+        self._ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._fichas = min(self.maximo, self._fichas + (agora - self._ultima) * self.minimo_por_segundo)
+        self._ultima = agora
+
+    def depositar(self):
+        """Chamado a cada requisição original."""
+        with self._lock:
+            self._repor()
+            self._fichas = min(self.maximo, self._fichas + self.razao)
+
+    def gastar(self) -> bool:
+        """Consome uma ficha para uma requisição extra; False se o orçamento acabou."""
+        with self._lock:
+            self._repor()
+            if self._fichas >= 1:
+                self._fichas -= 1
+                return True
+            return False
+
+
+_janelas: Dict[Tuple[str, str], JanelaLatencia] = {}
+_orcamentos: Dict[str, OrcamentoTentativas] = {}
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_em_andamento = 0
+
+
+def janela(provider: str, operacao: str) -> JanelaLatencia:
+    with _lock:
+        return _janelas.setdefault((provider, operacao), JanelaLatencia())
+
+
+def orcamento(provider: str) -> OrcamentoTentativas:
+    with _lock:
+        return _orcamentos.setdefault(provider, OrcamentoTentativas())
+
+
+def permitir_nova_tentativa(provider: str) -> bool:
+    """Nova tentativa após erro (Verificador.consultar): consome do mesmo orçamento dos hedges."""
+    permitida = orcamento(provider).gastar()
+    OUTBOUND_RETRIES.labels(provider, "allowed" if permitida else "denied").inc()
+    return permitida
+
+
+def atraso_hedge(provider: str, operacao: str) -> Optional[float]:
+    """Segundos até o hedge do endpoint, ou None sem amostras suficientes."""
+    observado = janela(provider, operacao).percentil(HEDGE_PERCENTIL)
+    if observado is None:
+        return None
+    return min(max(observado, HEDGE_ATRASO_MINIMO_MS / 1000), HEDGE_ATRASO_MAXIMO_MS / 1000)
+
+
+def _obter_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=HEDGE_THREADS, thread_name_prefix="hedge")
+        return _executor
+
+
+def _get(provider: str, operacao: str, url: str, headers: Dict[str, str], timeout: float) -> requests.Response:
+    inicio = time.perf_counter()
+    with chamada_externa(provider, operacao):
+        response = http_clientes.sessao().get(url, headers=headers, timeout=timeout)
+    # Só respostas entram na janela; erros de rede e timeouts distorceriam o percentil
+    janela(provider, operacao).registrar(time.perf_counter() - inicio)
+    return response
+
+
+def _get_executor(*args) -> requests.Response:
+    global _em_andamento
+    with _lock:
+        _em_andamento += 1
+    try:
+        return _get(*args)
+    finally:
+        with _lock:
+            _em_andamento -= 1
+
+
+def get_idempotente(provider: str, operacao: str, url: str, headers: Dict[str, str], timeout: float) -> requests.Response:
+    """
+    GET idempotente com hedge após o percentil observado do endpoint.
+
+    Returns:
+        requests.Response: a primeira resposta recebida (original ou hedge)
+
+    Raises:
+        requests.RequestException: se nenhuma das requisições obtiver resposta
+    """
+    OUTBOUND_HEDGEABLE.labels(provider, operacao).inc()
+    orcamento(provider).depositar()
+    atraso = atraso_hedge(provider, operacao) if HEDGE_HABILITADO else None
+    if atraso is None:
+        return _get(provider, operacao, url, headers, timeout)
+
+    executor = _obter_executor()
+    original = executor.submit(_get_executor, provider, operacao, url, headers, timeout)
+    concluidos, _ = wait([original], timeout=atraso)
+    if concluidos:
+        return original.result()
+
+    if not orcamento(provider).gastar():
+        OUTBOUND_HEDGES.labels(provider, operacao, "denied").inc()
+        return original.result()
+
+    OUTBOUND_HEDGES.labels(provider, operacao, "sent").inc()
+    hedge = executor.submit(_get_executor, provider, operacao, url, headers, timeout)
+    pendentes = {original, hedge}
+    erro: Optional[BaseException] = None
+    while pendentes:
+        concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+        for futuro in concluidos:
+            if futuro.exception() is None:
+                if futuro is hedge:
+                    OUTBOUND_HEDGES.labels(provider, operacao, "won").inc()
+                return futuro.result()
+            erro = futuro.exception()
+    raise erro
+
+
+def _ocupacao() -> int:
+    return _em_andamento
+
+
+registrar_saturacao("hedge", "executor", _ocupacao, lambda: HEDGE_THREADS)
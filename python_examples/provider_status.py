@@ -0,0 +1,253 @@
+"""
+Camada de consulta de status nos provedores de pagamento (Cora e Mercado Pago).
+
+Webhooks, verificadores periódicos e ferramentas de suporte consultam o mesmo
+pagamento várias vezes em poucos segundos. Este módulo centraliza essas
+consultas com:
+
+- cache curto (TTL) por (provedor, id do pagamento);
+- "single-flight": chamadas concorrentes para o mesmo id compartilham uma
+  única requisição de saída;
+- hedge após o p95 observado de cada endpoint e orçamento de requisições
+  extras (politica_requisicoes.py);
+- registros tipados (StatusProvedor) consumidos diretamente por
+  update_payment_status e pelos handlers de webhook.
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import compartimentos
+from config import CORA_INVOICES_URL, MP_ACCESS_TOKEN, MP_API_URL
+from politica_requisicoes import get_idempotente
+from requisicaotokencora import obter_token_cora
+
+logger = logging.getLogger(__name__)
+
+MP_PAYMENTS_URL = f"{MP_API_URL}/v1/payments/"
+
+NETWORK_TIMEOUT = 30  # segundos
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "15"))  # segundos
+
+
+class ErroConsultaStatus(Exception):
+    """Falha ao consultar o status de um pagamento no provedor."""
+
+
+@dataclass(frozen=True)
+class StatusProvedor:
+    """Status de um pagamento conforme retornado pelo provedor."""
+    provider: str
+    id: str
+    status: str
+    external_reference: Optional[str] = None
+    status_detail: str = ""
+    payment_type: Optional[str] = None
+    description: Optional[str] = None
+    amount: float = 0
+    date_approved: Optional[str] = None
+    date_created: Optional[str] = None
+    last_updated: Optional[str] = None
+    detalhes: Dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Formato de dicionário esperado pelo RobustSupabaseClient."""
+        dados = asdict(self)
+        dados.update(dados.pop("detalhes"))
+        return dados
+
+
+def buscar_status_cora(payment_reference: str) -> StatusProvedor:
+    """
+    Consulta o status de uma cobrança na Cora via GET /v2/invoices/{id}.
+
+    Raises:
+        ErroConsultaStatus: se o token não puder ser obtido ou a Cora responder com erro
+    """
+    token = obter_token_cora()
+    if not token:
+        raise ErroConsultaStatus("Não foi possível obter token da Cora")
+
+    headers = {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "authorization": f"Bearer {token}"
+    }
+    response = get_idempotente("cora", "get_invoice", f"{CORA_INVOICES_URL}{payment_reference}", headers, NETWORK_TIMEOUT)
+    if response.status_code != 200:
+        raise ErroConsultaStatus(f"HTTP {response.status_code}: {response.text}")
+
+    payment_data = response.json()
+    services = payment_data.get("services") or [{}]
+    return StatusProvedor(
+        provider="cora",
+        id=str(payment_reference),
+        external_reference=payment_data.get("code"),
+        status=payment_data.get("status"),
+        status_detail=payment_data.get("status_detail", ""),
+        payment_type="PIX",
+        description=services[0].get("name", ""),
+        amount=payment_data.get("total_amount", 0),
+        date_approved=payment_data.get("paid_at"),
+        date_created=payment_data.get("created_at"),
+        # Instante do próprio provedor: a hora da consulta não ordena respostas atrasadas
+        last_updated=payment_data.get("updated_at") or payment_data.get("paid_at") or payment_data.get("created_at"),
+        detalhes={
+            "due_date": payment_data.get("payment_terms", {}).get("due_date"),
+            "pix_qr_code": payment_data.get("pix_qr_code"),
+        },
+    )
+
+
+def buscar_status_mercadopago(payment_id: str, access_token: Optional[str] = None) -> StatusProvedor:
+    """
+    Consulta o status de um pagamento no Mercado Pago via GET /v1/payments/{id}.
+
+    Raises:
+        ErroConsultaStatus: se o Mercado Pago responder com erro
+    """
+    token = access_token or MP_ACCESS_TOKEN or os.getenv("MERCADO_PAGO_ACCESS_TOKEN")
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    response = get_idempotente("mercadopago", "get_payment", f"{MP_PAYMENTS_URL}{payment_id}", headers, NETWORK_TIMEOUT)
+    if response.status_code != 200:
+        raise ErroConsultaStatus(f"HTTP {response.status_code}: {response.text}")
+
+    payment_data = response.json()
+    card = payment_data.get("card") or {}
+    return StatusProvedor(
+        provider="mercadopago",
+        id=str(payment_data["id"]),
+        external_reference=payment_data.get("external_reference"),
+        status=payment_data["status"],
+        status_detail=payment_data.get("status_detail") or "",
+        payment_type=payment_data.get("payment_type_id"),
+        description=payment_data.get("description"),
+        amount=payment_data.get("transaction_amount", 0),
+        date_approved=payment_data.get("date_approved"),
+        date_created=payment_data.get("date_created"),
+        last_updated=payment_data.get("date_last_updated"),
+        detalhes={
+            "payment_method_id": payment_data.get("payment_method_id"),
+            "issuer_id": payment_data.get("issuer_id"),
+            "installments": payment_data.get("installments"),
+            "card_first_six_digits": card.get("first_six_digits"),
+            "card_last_four_digits": card.get("last_four_digits"),
+            "processing_mode": payment_data.get("processing_mode"),
+            "merchant_account_id": payment_data.get("merchant_account_id"),
+        },
+    )
+
+
+FETCHERS: Dict[str, Callable[..., StatusProvedor]] = {
+    "cora": buscar_status_cora,
+    "mercadopago": buscar_status_mercadopago,
+}
+
+
+class _Voo:
+    """Requisição em andamento compartilhada pelas chamadas concorrentes."""
+
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.resultado: Optional[StatusProvedor] = None
+        self.erro: Optional[BaseException] = None
+
+
+class ProviderStatusCache:
+    """
+    Cache de status com TTL curto e single-flight por (provedor, id).
+
+    Apenas respostas bem-sucedidas são armazenadas; erros são repassados a
+    todas as chamadas que aguardavam a mesma requisição e não ficam em cache.
+    """
+
+    def __init__(self, ttl: float = STATUS_CACHE_TTL, fetchers: Optional[Dict[str, Callable[..., StatusProvedor]]] = None):
+        self.ttl = ttl
+        self.fetchers = fetchers or FETCHERS
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, str], Tuple[float, StatusProvedor]] = {}
+        self._em_voo: Dict[Tuple[str, str], _Voo] = {}
+
+    def obter(self, provider: str, payment_id: str, usar_cache: bool = True, **kwargs) -> StatusProvedor:
+        """
+        Retorna o status do pagamento, consultando o provedor apenas se necessário.
+
+        Args:
+            provider (str): "cora" ou "mercadopago"
+            payment_id (str): ID do pagamento no provedor
+            usar_cache (bool): se False, ignora o valor em cache (mas ainda compartilha requisições em andamento)
+            **kwargs: repassados ao fetcher do provedor
+
+        Raises:
+            ErroConsultaStatus: se a consulta ao provedor falhar
+        """
+        chave = (provider, str(payment_id))
+        fetcher = self.fetchers[provider]
+
+        with self._lock:
+            if usar_cache:
+                item = self._cache.get(chave)
+                if item and time.monotonic() - item[0] < self.ttl:
+                    return item[1]
+            voo = self._em_voo.get(chave)
+            lider = voo is None
+            if lider:
+                voo = _Voo()
+                self._em_voo[chave] = voo
+
+        if not lider:
+            voo.concluido.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return voo.resultado
+
+        try:
+            voo.resultado = fetcher(str(payment_id), **kwargs)
+            with self._lock:
+                self._cache[chave] = (time.monotonic(), voo.resultado)
+            return voo.resultado
+        except ErroConsultaStatus as e:
+            voo.erro = e
+            raise
+        except Exception as e:
+            voo.erro = ErroConsultaStatus(str(e))
+            raise voo.erro from e
+        finally:
+            with self._lock:
+                self._em_voo.pop(chave, None)
+                self._limpar_expirados()
+            voo.concluido.set()
+
+    async def obter_async(self, provider: str, payment_id: str, usar_cache: bool = True, **kwargs) -> StatusProvedor:
+        """Versão para handlers async: executa a consulta no compartimento do provedor (compartimentos.py)."""
+        return await compartimentos.COMPARTIMENTOS[provider].chamar(self.obter, provider, payment_id, usar_cache, **kwargs)
+
+    def invalidar(self, provider: str, payment_id: str):
+        """Remove o status em cache (ex.: após receber um webhook com novo status)."""
+        with self._lock:
+            self._cache.pop((provider, str(payment_id)), None)
+
+    def _limpar_expirados(self):
+        agora = time.monotonic()
+        expirados = [k for k, (t, _) in self._cache.items() if agora - t >= self.ttl]
+        for chave in expirados:
+            del self._cache[chave]
+
+
+# Instância compartilhada pelo processo (rotas, webhooks e verificadores)
+status_cache = ProviderStatusCache()
+
+
+def obter_status(provider: str, payment_id: str, **kwargs) -> StatusProvedor:
+    return status_cache.obter(provider, payment_id, **kwargs)
+
+
+async def obter_status_async(provider: str, payment_id: str, **kwargs) -> StatusProvedor:
+    return await status_cache.obter_async(provider, payment_id, **kwargs)
@@ -0,0 +1,373 @@
+"""
+Reconciliação em lote entre o banco local (pagamentos), os provedores (Cora e
+Mercado Pago) e o Supabase (payments e registrations).
+
+As três fontes são carregadas para um intervalo de datas em DataFrames
+(pandas) e cruzadas pelas chaves de referência:
+
+- pagamentos.referencia = id da cobrança/pagamento no provedor;
+- pagamentos.referencia_externa = código/external_reference no provedor =
+  payments.registration_id = registrations.id no Supabase.
+
+As divergências são classificadas de forma vetorizada (sem laço por
+pagamento): ausente no banco local, no provedor ou no Supabase, status
+divergente entre as fontes e valor divergente. O resultado é um relatório
+JSON e, opcionalmente, um plano de correção em JSON Lines (uma ação por
+linha) para revisão; nada é alterado automaticamente.
+
+Uso:
+    python reconciliacao.py --desde 2026-10-01 --ate 2026-10-19
+    python reconciliacao.py --desde 2026-10-01 --ate 2026-10-19 --provedores cora --saida relatorio.json --plano plano.jsonl
+"""
+
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import chain
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+import http_clientes
+from config import CORA_INVOICES_URL, MP_ACCESS_TOKEN, MP_API_URL, SUPABASE_KEY, SUPABASE_URL
+from instrumentacao import chamada_externa
+from repositorio import PagamentosRepository, obter_repositorio
+from serializacao import dumps
+from verificador_pagamentos import ProvedorCora
+
+load_dotenv()
+
+logger = logging.getLogger("Reconciliacao")
+
+NETWORK_TIMEOUT = 60  # segundos por página
+PAGINA_CORA = 200
+PAGINA_MERCADOPAGO = 1000
+PAGINA_SUPABASE = 1000
+MARGEM_PROVEDOR = timedelta(days=1)  # o provedor é carregado com folga: a data de criação difere alguns segundos da local
+TOLERANCIA_VALOR = 0.009  # reais
+AMOSTRA_RELATORIO = 20  # linhas de exemplo por divergência no relatório
+
+# Provedores e banco local usam nomes diferentes (Cora "PAID", local "approved"...)
+STATUS_NORMALIZADO = dict(ProvedorCora.STATUS)
+
+DIVERGENCIAS = (
+    "ausente_local",
+    "ausente_provedor",
+    "ausente_supabase",
+    "status_local_divergente",
+    "status_supabase_divergente",
+    "valor_divergente",
+    "valor_pago_divergente",
+)
+
+
+# === carga ===
+
+def carregar_local(repositorio: PagamentosRepository, desde: date, ate: date) -> pd.DataFrame:
+    """Pagamentos criados no intervalo [desde, ate] (lidos em blocos pelo exportar_pagamentos)."""
+    colunas = repositorio.COLUNAS_EXPORTACAO
+    blocos = repositorio.exportar_pagamentos(
+        desde=datetime.combine(desde, datetime.min.time()),
+        ate=datetime.combine(ate + timedelta(days=1), datetime.min.time()),
+    )
+    df = pd.DataFrame.from_records([tuple(linha) for linha in chain.from_iterable(blocos)], columns=colunas)
+    df = df[df["referencia"].notna()]
+    # Mais de uma linha para a mesma cobrança: vale a mais recente
+    df = df.sort_values("id").drop_duplicates("referencia", keep="last")
+    return pd.DataFrame({
+        "referencia": df["referencia"].astype(str),
+        "registration_id": df["referencia_externa"],
+        "provedor": df["origem"],
+        "status_local": df["status"],
+        "valor_local": pd.to_numeric(df["valor"], errors="coerce"),
+        "criado_em_local": df["criado_em"].astype(str),
+    })
+
+
+def _paginas(buscar, tamanho: int) -> List[Dict[str, Any]]:
+    itens, pagina = [], 0
+    while True:
+        parte = buscar(pagina)
+        itens.extend(parte)
+        if len(parte) < tamanho:
+            return itens
+        pagina += 1
+
+
+def carregar_cora(desde: date, ate: date) -> pd.DataFrame:
+    """Invoices da Cora criadas no intervalo (GET /v2/invoices paginado)."""
+    from requisicaotokencora import obter_token_cora
+
+    headers = {"accept": "application/json", "authorization": f"Bearer {obter_token_cora()}"}
+    params = {"start": (desde - MARGEM_PROVEDOR).isoformat(), "end": (ate + MARGEM_PROVEDOR).isoformat(), "perPage": PAGINA_CORA}
+
+    def buscar(pagina: int):
+        with chamada_externa("cora", "list_invoices"):
+            response = http_clientes.sessao().get(CORA_INVOICES_URL, headers=headers, params={**params, "page": pagina + 1},
+                                                  timeout=NETWORK_TIMEOUT)
+        response.raise_for_status()
+        return response.json().get("items", [])
+
+    itens = _paginas(buscar, PAGINA_CORA)
+    total = pd.to_numeric(pd.Series([i.get("total_amount") for i in itens], dtype=object), errors="coerce")
+    return pd.DataFrame({
+        "referencia": pd.Series([str(i.get("id")) for i in itens], dtype=object),
+        "provedor_remoto": "cora",
+        "registration_id_provedor": pd.Series([i.get("code") for i in itens], dtype=object),
+        "status_provedor": pd.Series([i.get("status") for i in itens], dtype=object),
+        "valor_provedor": total / 100,
+        # Valor enviado ao Supabase pelo verificador (price_paid): total_amount em centavos
+        "valor_informado": total,
+        "criado_em_provedor": pd.Series([str(i.get("created_at") or "") for i in itens], dtype=object),
+    })
+
+
+def carregar_mercadopago(desde: date, ate: date, access_token: Optional[str] = MP_ACCESS_TOKEN) -> pd.DataFrame:
+    """Pagamentos do Mercado Pago criados no intervalo (GET /v1/payments/search paginado)."""
+    headers = {"Authorization": f"Bearer {access_token}"}
+    params = {
+        "range": "date_created",
+        "begin_date": f"{(desde - MARGEM_PROVEDOR).isoformat()}T00:00:00.000Z",
+        "end_date": f"{(ate + MARGEM_PROVEDOR).isoformat()}T23:59:59.999Z",
+        "sort": "date_created",
+        "criteria": "asc",
+        "limit": PAGINA_MERCADOPAGO,
+    }
+
+    def buscar(pagina: int):
+        with chamada_externa("mercadopago", "search_payments"):
+            response = http_clientes.sessao().get(f"{MP_API_URL}/v1/payments/search", headers=headers,
+                                                  params={**params, "offset": pagina * PAGINA_MERCADOPAGO},
+                                                  timeout=NETWORK_TIMEOUT)
+        response.raise_for_status()
+        return response.json().get("results", [])
+
+    itens = _paginas(buscar, PAGINA_MERCADOPAGO)
+    valor = pd.to_numeric(pd.Series([i.get("transaction_amount") for i in itens], dtype=object), errors="coerce")
+    return pd.DataFrame({
+        "referencia": pd.Series([str(i.get("id")) for i in itens], dtype=object),
+        "provedor_remoto": "mercadopago",
+        "registration_id_provedor": pd.Series([i.get("external_reference") for i in itens], dtype=object),
+        "status_provedor": pd.Series([i.get("status") for i in itens], dtype=object),
+        "valor_provedor": valor,
+        "valor_informado": valor,
+        "criado_em_provedor": pd.Series([str(i.get("date_created") or "") for i in itens], dtype=object),
+    })
+
+
+def carregar_supabase(tabela: str, colunas: List[str], desde: date, ate: date) -> pd.DataFrame:
+    """Linhas de uma tabela do Supabase criadas no intervalo (PostgREST paginado por offset)."""
+    headers = {"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"}
+    params = [
+        ("select", ",".join(colunas)),
+        ("created_at", f"gte.{(desde - MARGEM_PROVEDOR).isoformat()}"),
+        ("created_at", f"lt.{(ate + MARGEM_PROVEDOR + timedelta(days=1)).isoformat()}"),
+        ("order", "created_at.asc"),
+        ("limit", str(PAGINA_SUPABASE)),
+    ]
+
+    def buscar(pagina: int):
+        with chamada_externa("supabase", f"select_{tabela}"):
+            response = http_clientes.sessao().get(f"{SUPABASE_URL}/rest/v1/{tabela}", headers=headers,
+                                                  params=params + [("offset", str(pagina * PAGINA_SUPABASE))],
+                                                  timeout=NETWORK_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    return pd.DataFrame.from_records(_paginas(buscar, PAGINA_SUPABASE), columns=colunas)
+
+
+# === classificação ===
+
+def _normalizar(status: pd.Series) -> pd.Series:
+    return status.astype(object).replace(STATUS_NORMALIZADO)
+
+
+def reconciliar(local: pd.DataFrame, provedor: pd.DataFrame, payments: pd.DataFrame,
+                registrations: pd.DataFrame, desde: date, ate: date) -> pd.DataFrame:
+    """
+    Cruza as fontes e marca cada divergência em uma coluna booleana (DIVERGENCIAS).
+
+    Returns:
+        DataFrame: uma linha por cobrança presente no banco local ou no provedor
+    """
+    df = local.merge(provedor, on="referencia", how="outer", indicator="_fontes")
+
+    # Cobranças só do provedor, criadas fora do intervalo, vieram apenas pela margem de carga
+    dia_provedor = df["criado_em_provedor"].astype(object).fillna("").str[:10]
+    fora = (df["_fontes"] == "right_only") & ((dia_provedor < desde.isoformat()) | (dia_provedor > ate.isoformat()))
+    df = df[~fora].copy()
+
+    df["provedor"] = df["provedor"].fillna(df["provedor_remoto"])
+    df["registration_id"] = df["registration_id"].fillna(df["registration_id_provedor"])
+
+    payments = payments.rename(columns={"status": "status_supabase"}).drop_duplicates("registration_id", keep="last")
+    registrations = registrations.rename(columns={"id": "registration_id", "payment_status": "status_inscricao"})
+    registrations = registrations.drop_duplicates("registration_id", keep="last")
+    for tabela in (payments, registrations):
+        tabela["registration_id"] = tabela["registration_id"].astype(object).where(tabela["registration_id"].isna(),
+                                                                                   tabela["registration_id"].astype(str))
+    df["registration_id"] = df["registration_id"].astype(object).where(df["registration_id"].isna(),
+                                                                       df["registration_id"].astype(str))
+    df = df.merge(payments[["registration_id", "status_supabase"]], on="registration_id", how="left")
+    df = df.merge(registrations[["registration_id", "status_inscricao", "price_paid"]], on="registration_id", how="left")
+
+    tem_local = df["_fontes"].isin(["both", "left_only"]).to_numpy()
+    tem_provedor = df["_fontes"].isin(["both", "right_only"]).to_numpy()
+    ambos = tem_local & tem_provedor
+
+    status_provedor = _normalizar(df["status_provedor"]).to_numpy()
+    status_local = _normalizar(df["status_local"]).to_numpy()
+    status_supabase = df["status_supabase"].astype(object).to_numpy()
+    tem_supabase = pd.notna(status_supabase)
+
+    valor_local = pd.to_numeric(df["valor_local"], errors="coerce").to_numpy(dtype=float)
+    valor_provedor = pd.to_numeric(df["valor_provedor"], errors="coerce").to_numpy(dtype=float)
+    valor_informado = pd.to_numeric(df["valor_informado"], errors="coerce").to_numpy(dtype=float)
+    valor_pago = pd.to_numeric(df["price_paid"], errors="coerce").to_numpy(dtype=float)
+
+    df["status_provedor_normalizado"] = status_provedor
+    df["ausente_local"] = tem_provedor & ~tem_local
+    df["ausente_provedor"] = tem_local & ~tem_provedor
+    df["ausente_supabase"] = df["registration_id"].notna().to_numpy() & ~tem_supabase
+    df["status_local_divergente"] = ambos & (status_local != status_provedor)
+    df["status_supabase_divergente"] = tem_provedor & tem_supabase & (status_supabase != status_provedor)
+    df["valor_divergente"] = ambos & (np.abs(valor_local - valor_provedor) > TOLERANCIA_VALOR)
+    df["valor_pago_divergente"] = (
+        tem_provedor & (status_provedor == "approved") & ~np.isnan(valor_pago)
+        & (np.abs(valor_pago - valor_informado) > TOLERANCIA_VALOR)
+    )
+    df["divergencias"] = df[list(DIVERGENCIAS)].sum(axis=1)
+    return df.drop(columns=["_fontes", "provedor_remoto", "registration_id_provedor"])
+
+
+# === saída ===
+
+def _registros(df: pd.DataFrame, colunas: List[str]) -> List[Dict[str, Any]]:
+    parte = df[colunas].astype(object)
+    return parte.where(parte.notna(), None).to_dict("records")
+
+
+def relatorio(df: pd.DataFrame, fontes: Dict[str, int], desde: date, ate: date, tempos: Dict[str, float]) -> Dict[str, Any]:
+    colunas = ["provedor", "referencia", "registration_id", "status_local", "status_provedor", "status_supabase",
+               "valor_local", "valor_provedor", "price_paid"]
+    por_provedor = df.groupby("provedor")[list(DIVERGENCIAS)].sum().astype(int).to_dict("index")
+    return {
+        "periodo": {"desde": desde.isoformat(), "ate": ate.isoformat()},
+        "fontes": fontes,
+        "cobrancas": int(len(df)),
+        "conciliadas": int((df["divergencias"] == 0).sum()),
+        "divergencias": {nome: int(df[nome].sum()) for nome in DIVERGENCIAS},
+        "por_provedor": por_provedor,
+        "amostras": {nome: _registros(df[df[nome]].head(AMOSTRA_RELATORIO), colunas) for nome in DIVERGENCIAS if df[nome].any()},
+        "tempos_s": tempos,
+    }
+
+
+def plano_correcao(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Ações sugeridas, uma por divergência. Correções de status seguem o provedor
+    (fonte da verdade); ausências e valores divergentes vão para revisão manual.
+    """
+    acoes = []
+
+    def adicionar(mascara, acao: str, colunas: List[str], **renomear):
+        parte = df.loc[mascara, colunas].rename(columns=renomear)
+        parte.insert(0, "acao", acao)
+        acoes.extend(_registros(parte, list(parte.columns)))
+
+    adicionar(df["status_local_divergente"], "atualizar_status_local",
+              ["provedor", "referencia", "status_local", "status_provedor_normalizado"],
+              status_local="de", status_provedor_normalizado="para")
+    adicionar(df["status_supabase_divergente"], "atualizar_status_supabase",
+              ["provedor", "referencia", "registration_id", "status_supabase", "status_provedor_normalizado"],
+              status_supabase="de", status_provedor_normalizado="para")
+    adicionar(df["ausente_supabase"] & df["status_provedor"].notna(), "revisar_ausente_supabase",
+              ["provedor", "referencia", "registration_id", "status_provedor_normalizado"],
+              status_provedor_normalizado="status")
+    adicionar(df["ausente_local"], "revisar_ausente_local",
+              ["provedor", "referencia", "registration_id", "status_provedor_normalizado", "valor_provedor"],
+              status_provedor_normalizado="status")
+    adicionar(df["ausente_provedor"], "revisar_ausente_provedor",
+              ["provedor", "referencia", "registration_id", "status_local", "valor_local"])
+    adicionar(df["valor_divergente"] | df["valor_pago_divergente"], "revisar_valor",
+              ["provedor", "referencia", "registration_id", "valor_local", "valor_provedor", "price_paid"])
+    return acoes
+
+
+def executar(desde: date, ate: date, provedores: List[str], supabase: bool = True) -> Dict[str, Any]:
+    """Carrega as fontes em paralelo, reconcilia e retorna (relatório, plano)."""
+    carregadores = {"cora": carregar_cora, "mercadopago": carregar_mercadopago}
+    tempos = {}
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(provedores) + 3) as executor:
+        futuro_local = executor.submit(carregar_local, obter_repositorio(), desde, ate)
+        futuros = {nome: executor.submit(carregadores[nome], desde, ate) for nome in provedores}
+        if supabase:
+            futuro_payments = executor.submit(carregar_supabase, "payments",
+                                              ["registration_id", "status", "provider_ref"], desde, ate)
+            futuro_registrations = executor.submit(carregar_supabase, "registrations",
+                                                   ["id", "payment_status", "price_paid"], desde, ate)
+        local = futuro_local.result()
+        remotos = [futuro.result() for futuro in futuros.values()]
+        payments = futuro_payments.result() if supabase else pd.DataFrame(columns=["registration_id", "status"])
+        registrations = futuro_registrations.result() if supabase else \
+            pd.DataFrame(columns=["id", "payment_status", "price_paid"])
+    tempos["carga"] = round(time.perf_counter() - inicio, 3)
+
+    local = local[local["provedor"].isin(provedores)]
+    provedor = pd.concat(remotos, ignore_index=True)
+    fontes = {"local": len(local), **{nome: len(r) for nome, r in zip(futuros, remotos)},
+              "supabase_payments": len(payments), "supabase_registrations": len(registrations)}
+
+    inicio = time.perf_counter()
+    df = reconciliar(local, provedor, payments, registrations, desde, ate)
+    if not supabase:
+        df["ausente_supabase"] = False
+        df["divergencias"] = df[list(DIVERGENCIAS)].sum(axis=1)
+    tempos["classificacao"] = round(time.perf_counter() - inicio, 3)
+    return relatorio(df, fontes, desde, ate, tempos), plano_correcao(df)
+
+
+def main():
+    from logging_config import configurar_logging
+
+    configurar_logging("reconciliacao.log")
+    parser = argparse.ArgumentParser(description="Reconciliação entre banco local, provedores e Supabase")
+    parser.add_argument("--desde", type=date.fromisoformat, default=date.today() - timedelta(days=7))
+    parser.add_argument("--ate", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--provedores", default="cora,mercadopago", help="Lista separada por vírgulas")
+    parser.add_argument("--sem-supabase", action="store_true", help="Não carrega nem compara o Supabase")
+    parser.add_argument("--saida", help="Arquivo JSON do relatório (padrão: apenas o resumo no terminal)")
+    parser.add_argument("--plano", help="Arquivo JSON Lines com o plano de correção")
+    args = parser.parse_args()
+
+    provedores = [p.strip() for p in args.provedores.split(",") if p.strip()]
+    resultado, plano = executar(args.desde, args.ate, provedores, supabase=not args.sem_supabase)
+
+    print(f"Período {resultado['periodo']['desde']} a {resultado['periodo']['ate']}: "
+          f"{resultado['cobrancas']} cobranças, {resultado['conciliadas']} conciliadas")
+    print("Fontes: " + ", ".join(f"{nome}={total}" for nome, total in resultado["fontes"].items()))
+    for nome, total in resultado["divergencias"].items():
+        print(f"  {nome:28s} {total}")
+    print(f"Tempos: carga {resultado['tempos_s']['carga']}s, classificação {resultado['tempos_s']['classificacao']}s")
+
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, "wb") as arquivo:
+            arquivo.write(dumps(resultado))
+    if args.plano:
+        os.makedirs(os.path.dirname(os.path.abspath(args.plano)), exist_ok=True)
+        with open(args.plano, "wb") as arquivo:
+            for acao in plano:
+                arquivo.write(dumps(acao) + b"\n")
+        print(f"Plano de correção: {len(plano)} ações em {args.plano}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,980 @@
+"""
+Repositório de pagamentos: único ponto de acesso às tabelas `pagamentos`,
+`webhook_logs`, `token_cora`, `checker_replicas`, `pagamentos_resumo`,
+`resumo_marcas` e `eventos_status`.
+
+Rotas, webhooks e verificadores usam PagamentosRepository em vez de SQL
+espalhado. Há duas implementações:
+
+- SqlServerPagamentosRepository: produção (pyodbc / ITSERP);
+- SQLitePagamentosRepository: banco embutido para benchmarks, emuladores e
+  profiling local, criando o schema automaticamente.
+
+`checker_replicas` guarda os leases dos verificadores (coordenacao.py) e
+`token_cora` o token da Cora compartilhado entre processos, uma linha por
+client_id, com o lease de renovação (requisicaotokencora.py).
+`pagamentos_resumo` guarda os totais por dia, origem, tipo e status lidos pelo
+dashboard, mantidos incrementalmente a partir da marca d'água em
+`resumo_marcas` (dashboard/resumo.py). `eventos_status` é a caixa de saída
+das mudanças de status lida pelos workers da API (eventos_pagamentos.py).
+
+A implementação é escolhida por DB_BACKEND ("sqlserver" ou "sqlite").
+"""
+
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from config import DB_BACKEND, SQLITE_PATH
+from database import ConexaoInstrumentada, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Pagamento:
+    """Linha da tabela pagamentos. Campos None não são incluídos no INSERT."""
+    referencia: Optional[str] = None
+    valor: Optional[float] = None
+    nome: Optional[str] = None
+    documento: Optional[str] = None
+    status: Optional[str] = None
+    tipo: Optional[str] = None
+    origem: Optional[str] = None
+    referencia_externa: Optional[str] = None
+    status_detail: Optional[str] = None
+    url_pagamento: Optional[str] = None
+    requisicaooriginal: Optional[str] = None
+
+
+class PagamentosRepository(ABC):
+    """
+    Operações sobre pagamentos independentes do banco.
+
+    As consultas usam parâmetros `?` (aceitos por pyodbc e sqlite3); as
+    diferenças de dialeto ficam nos atributos SQL_* das subclasses.
+    """
+
+    # Expressões dependentes do dialeto
+    SQL_AGORA = "GETDATE()"
+    SQL_PENDENTES_CORA = """
+        SELECT DISTINCT(referencia), referencia_externa
+        FROM pagamentos
+        WHERE [status] NOT IN ('PAID', 'approved', 'rejected', 'cancelled', 'refunded')
+        AND [status] IS NOT NULL
+        AND referencia IS NOT NULL
+        AND tipo = 'PIX'
+        AND criado_em >= DATEADD(day, -?, GETDATE())
+    """
+    SQL_PENDENTES_MERCADOPAGO = """
+        SELECT referencia, referencia_externa
+        FROM pagamentos
+        WHERE [status] NOT IN ('rejected', 'cancelled', 'refunded')
+        AND [status] IS NOT NULL
+        AND referencia IS NOT NULL
+        AND tipo <> 'PIX'
+        AND criado_em >= DATEADD(hour, -?, GETDATE())
+    """
+    SQL_ULTIMO_POR_REFERENCIA_EXTERNA = """
+        SELECT TOP 1 referencia, valor*100, nome, documento, [status], tipo, origem, criado_em, referencia_externa, url_pagamento
+        FROM pagamentos
+        WHERE referencia_externa = ?
+        ORDER BY id DESC
+    """
+
+    SQL_RENOVAR_REPLICA = """
+        MERGE checker_replicas WITH (HOLDLOCK) AS alvo
+        USING (SELECT ? AS servico, ? AS replica_id) AS origem
+        ON alvo.servico = origem.servico AND alvo.replica_id = origem.replica_id
+        WHEN MATCHED THEN UPDATE SET expira_em = DATEADD(second, ?, GETDATE())
+        WHEN NOT MATCHED THEN INSERT (servico, replica_id, expira_em)
+            VALUES (origem.servico, origem.replica_id, DATEADD(second, ?, GETDATE()));
+    """
+
+    SQL_SALVAR_TOKEN = """
+        MERGE token_cora WITH (HOLDLOCK) AS alvo
+        USING (SELECT ? AS client_id) AS origem
+        ON alvo.client_id = origem.client_id
+        WHEN MATCHED THEN UPDATE SET access_token = ?, expires_at = ?, atualizado_em = GETDATE(),
+            renovando_por = NULL, renovando_ate = NULL
+        WHEN NOT MATCHED THEN INSERT (client_id, access_token, expires_at, atualizado_em)
+            VALUES (origem.client_id, ?, ?, GETDATE());
+    """
+    SQL_GARANTIR_TOKEN = """
+        MERGE token_cora WITH (HOLDLOCK) AS alvo
+        USING (SELECT ? AS client_id) AS origem
+        ON alvo.client_id = origem.client_id
+        WHEN NOT MATCHED THEN INSERT (client_id) VALUES (origem.client_id);
+    """
+    SQL_DAQUI_A_SEGUNDOS = "DATEADD(second, ?, GETDATE())"
+
+    SQL_DIA_CRIACAO = "CAST(criado_em AS DATE)"
+    SQL_GARANTIR_MARCA = """
+        MERGE resumo_marcas WITH (HOLDLOCK) AS alvo
+        USING (SELECT ? AS nome) AS origem
+        ON alvo.nome = origem.nome
+        WHEN NOT MATCHED THEN INSERT (nome, ultimo_id) VALUES (origem.nome, 0);
+    """
+    SQL_EVENTOS_APOS = """
+        SELECT TOP 500 id, referencia_externa, referencia, status, status_detail, origem, criado_em
+        FROM eventos_status
+        WHERE id > ?
+        ORDER BY id
+    """
+
+    # Folga ao reler pagamentos_resumo a partir das marcas d'água (transações confirmadas fora de ordem)
+    SOBREPOSICAO_IDS = 1000
+    SOBREPOSICAO_TEMPO = timedelta(minutes=5)
+
+    COLUNAS_EXPORTACAO = (
+        "id", "referencia", "referencia_externa", "valor", "nome", "documento", "status",
+        "status_detail", "tipo", "origem", "criado_em", "atualizado_em", "url_pagamento",
+    )
+
+    @abstractmethod
+    def conexao(self):
+        """Context manager que fornece uma conexão DB-API (fechada ao sair)."""
+
+    # === pagamentos ===
+
+    def inserir_pagamento(self, pagamento: Pagamento, registrar_datas: bool = True):
+        """
+        Insere um pagamento.
+
+        Args:
+            pagamento (Pagamento): dados da linha
+            registrar_datas (bool): preenche criado_em e atualizado_em com a hora do banco
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            self._inserir(cursor, pagamento, registrar_datas)
+            conn.commit()
+
+    def inserir_pagamentos(self, pagamentos: List[Pagamento], registrar_datas: bool = True) -> int:
+        """
+        Insere vários pagamentos em uma única transação, com um executemany por
+        conjunto de colunas preenchidas.
+
+        Returns:
+            int: quantidade de pagamentos inseridos
+        """
+        grupos: Dict[Tuple[str, ...], List[List[Any]]] = {}
+        for pagamento in pagamentos:
+            colunas, valores = self._colunas(pagamento)
+            grupos.setdefault(tuple(colunas), []).append(valores)
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            self._preparar_lote(cursor)
+            for colunas, linhas in grupos.items():
+                cursor.executemany(self._sql_inserir(list(colunas), registrar_datas), linhas)
+            conn.commit()
+        return len(pagamentos)
+
+    def _preparar_lote(self, cursor):
+        """Ajustes do driver para executemany (opcional)."""
+
+    def referencias_aprovadas(self, referencias_externas: List[str]) -> Set[str]:
+        """Referências externas, entre as informadas, que já têm pagamento aprovado."""
+        aprovadas = set()
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            for parte in self._partes(referencias_externas):
+                cursor.execute(
+                    f"SELECT DISTINCT referencia_externa FROM pagamentos "
+                    f"WHERE status = 'approved' AND referencia_externa IN ({', '.join('?' * len(parte))})",
+                    parte
+                )
+                aprovadas.update(row[0] for row in cursor.fetchall())
+        return aprovadas
+
+    def remover_rejeitados_lote(self, referencias_externas: List[str]) -> int:
+        """remover_rejeitados para várias referências externas em uma única transação."""
+        removidos = 0
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            for parte in self._partes(referencias_externas):
+                cursor.execute(
+                    f"DELETE FROM pagamentos WHERE status = 'rejected' "
+                    f"AND referencia_externa IN ({', '.join('?' * len(parte))})",
+                    parte
+                )
+                removidos += max(cursor.rowcount, 0)
+            conn.commit()
+        return removidos
+
+    @staticmethod
+    def _partes(valores: List[Any], tamanho: int = 500) -> List[List[Any]]:
+        # Abaixo do limite de 2100 parâmetros por comando do SQL Server
+        return [list(valores[i:i + tamanho]) for i in range(0, len(valores), tamanho)]
+
+    def _sql_inserir(self, colunas: List[str], registrar_datas: bool = True) -> str:
+        marcadores = ["?"] * len(colunas)
+        if registrar_datas:
+            colunas = colunas + ["criado_em", "atualizado_em"]
+            marcadores += [self.SQL_AGORA, self.SQL_AGORA]
+        return f"INSERT INTO pagamentos ({', '.join(colunas)}) VALUES ({', '.join(marcadores)})"
+
+    def _inserir(self, cursor, pagamento: Pagamento, registrar_datas: bool = True):
+        colunas, valores = self._colunas(pagamento)
+        cursor.execute(self._sql_inserir(colunas, registrar_datas), valores)
+
+    @staticmethod
+    def _colunas(pagamento: Pagamento) -> Tuple[List[str], List[Any]]:
+        colunas, valores = [], []
+        for campo in fields(pagamento):
+            valor = getattr(pagamento, campo.name)
+            if valor is not None:
+                colunas.append(campo.name)
+                valores.append(valor)
+        return colunas, valores
+
+    def registrar_pagamento(self, pagamento: Pagamento) -> bool:
+        """
+        Registra o pagamento se ainda não houver um aprovado para a mesma referência,
+        removendo tentativas rejeitadas anteriores.
+
+        Returns:
+            bool: False se já existia pagamento aprovado (nada é inserido)
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*) FROM pagamentos WHERE referencia = ? AND status = 'approved'",
+                (pagamento.referencia,)
+            )
+            if cursor.fetchone()[0]:
+                return False
+            cursor.execute("DELETE FROM pagamentos WHERE referencia = ? AND status = 'rejected'", (pagamento.referencia,))
+            self._inserir(cursor, pagamento)
+            conn.commit()
+            return True
+
+    def remover_rejeitados(self, referencia_externa: str) -> int:
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM pagamentos WHERE referencia_externa = ? AND status = 'rejected'",
+                (referencia_externa,)
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def existe_aprovado(self, referencia_externa: str) -> bool:
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*) FROM pagamentos WHERE referencia_externa = ? AND status = 'approved'",
+                (referencia_externa,)
+            )
+            return cursor.fetchone()[0] > 0
+
+    def existe(self, referencia: str) -> bool:
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM pagamentos WHERE referencia = ?", (referencia,))
+            return cursor.fetchone()[0] > 0
+
+    def obter_status(self, referencia_externa: str) -> Optional[str]:
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status FROM pagamentos WHERE referencia_externa = ?", (referencia_externa,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def exportar_pagamentos(self, origem: Optional[str] = None, tipo: Optional[str] = None,
+                            status: Optional[List[str]] = None, desde: Optional[datetime] = None,
+                            ate: Optional[datetime] = None, apos_id: Optional[int] = None,
+                            tamanho_lote: int = 1000) -> Iterator[List[Tuple]]:
+        """
+        Percorre os pagamentos em ordem de id (keyset), em blocos de `tamanho_lote`
+        linhas lidas com fetchmany; a memória usada não depende do total de linhas.
+
+        A conexão fica aberta até o gerador terminar ou ser fechado.
+
+        Args:
+            desde / ate: intervalo de criado_em (ate exclusivo)
+            apos_id: continua a partir da linha seguinte a este id (retomada)
+
+        Yields:
+            list: linhas com as colunas de COLUNAS_EXPORTACAO
+        """
+        condicoes, parametros = [], []
+        if apos_id is not None:
+            condicoes.append("id > ?")
+            parametros.append(apos_id)
+        if origem:
+            condicoes.append("origem = ?")
+            parametros.append(origem)
+        if tipo:
+            condicoes.append("tipo = ?")
+            parametros.append(tipo)
+        if status:
+            condicoes.append(f"status IN ({', '.join('?' * len(status))})")
+            parametros.extend(status)
+        if desde:
+            condicoes.append("criado_em >= ?")
+            parametros.append(self._de_datetime(desde))
+        if ate:
+            condicoes.append("criado_em < ?")
+            parametros.append(self._de_datetime(ate))
+        onde = f" WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        sql = f"SELECT {', '.join(self.COLUNAS_EXPORTACAO)} FROM pagamentos{onde} ORDER BY id"
+
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            if parametros:
+                cursor.execute(sql, parametros)
+            else:
+                cursor.execute(sql)
+            while True:
+                linhas = cursor.fetchmany(tamanho_lote)
+                if not linhas:
+                    return
+                yield linhas
+
+    def obter_ultimo(self, referencia_externa: str) -> Optional[Dict[str, Any]]:
+        """Último pagamento (maior id) de uma referência externa, com valor em centavos."""
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.SQL_ULTIMO_POR_REFERENCIA_EXTERNA, (referencia_externa,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            chaves = ("referencia", "valor", "nome", "documento", "status", "tipo", "origem",
+                      "criado_em", "referencia_externa", "url_pagamento")
+            return dict(zip(chaves, row))
+
+    def atualizar_status(self, referencia: str, status: str, status_detail: Optional[str]) -> int:
+        """
+        Returns:
+            int: número de linhas atualizadas
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"UPDATE pagamentos SET status = ?, status_detail = ?, atualizado_em = {self.SQL_AGORA} WHERE referencia = ?",
+                (status, status_detail, referencia)
+            )
+            linhas = cursor.rowcount
+            conn.commit()
+            return linhas
+
+    def listar_pendentes_cora(self, dias: int = 7) -> List[Dict[str, str]]:
+        """PIX não finalizados criados nos últimos `dias` dias."""
+        return self._listar_pendentes(self.SQL_PENDENTES_CORA, dias)
+
+    def listar_pendentes_mercadopago(self, horas: int = 6) -> List[Dict[str, str]]:
+        """Pagamentos não-PIX não finalizados criados nas últimas `horas` horas."""
+        return self._listar_pendentes(self.SQL_PENDENTES_MERCADOPAGO, horas)
+
+    def _listar_pendentes(self, sql: str, janela: int) -> List[Dict[str, str]]:
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (janela,))
+            return [
+                {
+                    "id": str(row[0]),  # referencia (id no provedor)
+                    "reference": str(row[1]) if row[1] else ""  # referencia_externa (registration_id no Supabase)
+                }
+                for row in cursor.fetchall()
+            ]
+
+    # === webhook_logs ===
+
+    def registrar_webhook(self, origem: str, tipo_evento: str, referencia_externa: str, payload: str):
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"INSERT INTO webhook_logs (origem, tipo_evento, referencia_externa, payload, criado_em) "
+                f"VALUES (?, ?, ?, ?, {self.SQL_AGORA})",
+                (origem, tipo_evento, referencia_externa, payload)
+            )
+            conn.commit()
+
+    def atualizar_status_webhook(self, referencia: str, status: str, status_detail: Optional[str],
+                                 origem: str, tipo_evento: str, payload: str) -> bool:
+        """
+        Atualiza o pagamento (se existir) e registra o webhook na mesma transação.
+
+        Returns:
+            bool: True se o pagamento existia e foi atualizado
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM pagamentos WHERE referencia = ?", (referencia,))
+            existe = cursor.fetchone()[0] > 0
+            if existe:
+                cursor.execute(
+                    f"UPDATE pagamentos SET status = ?, status_detail = ?, atualizado_em = {self.SQL_AGORA} WHERE referencia = ?",
+                    (status, status_detail, referencia)
+                )
+            cursor.execute(
+                f"INSERT INTO webhook_logs (origem, tipo_evento, referencia_externa, payload, criado_em) "
+                f"VALUES (?, ?, ?, ?, {self.SQL_AGORA})",
+                (origem, tipo_evento, referencia, payload)
+            )
+            conn.commit()
+            return existe
+
+    # === checker_replicas ===
+
+    def renovar_replica(self, servico: str, replica_id: str, ttl_segundos: int) -> List[str]:
+        """
+        Renova o lease da réplica, remove leases expirados e retorna as réplicas vivas do serviço.
+
+        Tabela (SQL Server):
+            CREATE TABLE checker_replicas (
+                servico VARCHAR(50) NOT NULL,
+                replica_id VARCHAR(200) NOT NULL,
+                expira_em DATETIME NOT NULL,
+                PRIMARY KEY (servico, replica_id)
+            )
+
+        Returns:
+            list: ids das réplicas com lease válido, em ordem estável
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.SQL_RENOVAR_REPLICA, (servico, replica_id, ttl_segundos, ttl_segundos))
+            cursor.execute(
+                f"DELETE FROM checker_replicas WHERE servico = ? AND expira_em < {self.SQL_AGORA}",
+                (servico,)
+            )
+            cursor.execute(
+                "SELECT replica_id FROM checker_replicas WHERE servico = ? ORDER BY replica_id",
+                (servico,)
+            )
+            replicas = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            return replicas
+
+    def remover_replica(self, servico: str, replica_id: str):
+        """Libera o lease imediatamente (encerramento limpo)."""
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM checker_replicas WHERE servico = ? AND replica_id = ?",
+                (servico, replica_id)
+            )
+            conn.commit()
+
+    # === token_cora ===
+
+    def ler_token_cora(self, client_id: str) -> Optional[Tuple[str, datetime]]:
+        """
+        Token atual do client_id (expires_at em UTC) ou None se nunca foi obtido.
+
+        Tabela (SQL Server):
+            CREATE TABLE token_cora (
+                client_id VARCHAR(100) NOT NULL PRIMARY KEY,
+                access_token VARCHAR(MAX) NULL,
+                expires_at DATETIME NULL,
+                atualizado_em DATETIME NULL,
+                renovando_por VARCHAR(200) NULL,
+                renovando_ate DATETIME NULL
+            )
+
+        Bancos com o layout antigo (id, access_token, expires_at) são migrados
+        por sql/migrate_token_cora_client_id.sql.
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT access_token, expires_at FROM token_cora WHERE client_id = ? AND access_token IS NOT NULL",
+                (client_id,)
+            )
+            row = cursor.fetchone()
+            return (row[0], self._para_datetime(row[1])) if row else None
+
+    def salvar_token_cora(self, client_id: str, access_token: str, expires_at: datetime):
+        """Grava o token (upsert na linha do client_id), libera o lease e compacta a tabela."""
+        expiracao = self._de_datetime(expires_at)
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.SQL_SALVAR_TOKEN, (client_id, access_token, expiracao, access_token, expiracao))
+            self._compactar_tokens(cursor, client_id)
+            conn.commit()
+
+    def adquirir_renovacao_token_cora(self, client_id: str, dono: str, ttl_segundos: int) -> bool:
+        """
+        Tenta obter o lease de renovação do token: apenas o dono chama /token até
+        salvar o novo token, liberar o lease ou o lease expirar.
+
+        Returns:
+            bool: True se o lease é deste dono
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.SQL_GARANTIR_TOKEN, (client_id,))
+            cursor.execute(
+                f"UPDATE token_cora SET renovando_por = ?, renovando_ate = {self.SQL_DAQUI_A_SEGUNDOS} "
+                f"WHERE client_id = ? AND (renovando_ate IS NULL OR renovando_ate < {self.SQL_AGORA} OR renovando_por = ?)",
+                (dono, ttl_segundos, client_id, dono)
+            )
+            adquirido = cursor.rowcount == 1
+            conn.commit()
+            return adquirido
+
+    def liberar_renovacao_token_cora(self, client_id: str, dono: str):
+        """Libera o lease após falha em /token, para outro processo tentar sem esperar a expiração."""
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE token_cora SET renovando_por = NULL, renovando_ate = NULL WHERE client_id = ? AND renovando_por = ?",
+                (client_id, dono)
+            )
+            conn.commit()
+
+    def _compactar_tokens(self, cursor, client_id: str):
+        # Linhas antigas sem client_id (layout anterior à migração sql/migrate_token_cora_client_id.sql,
+        # em bancos sem a chave primária) e tokens de outros clients expirados há mais de um dia
+        cursor.execute(
+            "DELETE FROM token_cora WHERE client_id IS NULL OR (client_id <> ? AND expires_at < ?)",
+            (client_id, self._de_datetime(datetime.utcnow() - timedelta(days=1)))
+        )
+
+    # === pagamentos_resumo ===
+
+    def atualizar_resumo_pagamentos(self, dono: str, ttl_segundos: int, dias_recentes: int = 2,
+                                    completo: bool = False) -> Optional[int]:
+        """
+        Recalcula em pagamentos_resumo apenas os dias de criação com pagamentos
+        inseridos (id) ou atualizados (atualizado_em) desde a última marca d'água,
+        mais os `dias_recentes` últimos dias (cobre as remoções de rejeitados, que
+        não deixam rastro). Cada dia é recalculado por inteiro, então reprocessar
+        um dia é inofensivo e as marcas são relidas com folga.
+
+        Apenas um processo por vez atualiza (lease em resumo_marcas, como em token_cora).
+
+        Tabelas (SQL Server):
+            CREATE TABLE pagamentos_resumo (
+                dia DATE NOT NULL,
+                origem VARCHAR(50) NOT NULL,
+                tipo VARCHAR(50) NOT NULL,
+                status VARCHAR(50) NOT NULL,
+                quantidade INT NOT NULL,
+                valor_total DECIMAL(18, 2) NOT NULL,
+                PRIMARY KEY (dia, origem, tipo, status)
+            )
+            CREATE TABLE resumo_marcas (
+                nome VARCHAR(50) NOT NULL PRIMARY KEY,
+                ultimo_id BIGINT NOT NULL,
+                ultima_atualizacao DATETIME NULL,
+                atualizado_em DATETIME NULL,
+                processando_por VARCHAR(200) NULL,
+                processando_ate DATETIME NULL
+            )
+            CREATE INDEX ix_pagamentos_criado_em ON pagamentos (criado_em)
+            CREATE INDEX ix_pagamentos_atualizado_em ON pagamentos (atualizado_em)
+
+        Args:
+            completo: descarta o resumo e recalcula todos os dias
+
+        Returns:
+            int: dias recalculados, ou None se outro processo detém o lease
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.SQL_GARANTIR_MARCA, ("pagamentos",))
+            cursor.execute(
+                f"UPDATE resumo_marcas SET processando_por = ?, processando_ate = {self.SQL_DAQUI_A_SEGUNDOS} "
+                f"WHERE nome = ? AND (processando_ate IS NULL OR processando_ate < {self.SQL_AGORA} OR processando_por = ?)",
+                (dono, ttl_segundos, "pagamentos", dono)
+            )
+            adquirido = cursor.rowcount == 1
+            conn.commit()
+        if not adquirido:
+            return None
+
+        try:
+            return self._recalcular_resumo(dias_recentes, completo)
+        finally:
+            with self.conexao() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE resumo_marcas SET processando_por = NULL, processando_ate = NULL "
+                    "WHERE nome = ? AND processando_por = ?",
+                    ("pagamentos", dono)
+                )
+                conn.commit()
+
+    def _recalcular_resumo(self, dias_recentes: int, completo: bool) -> int:
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT ultimo_id, ultima_atualizacao FROM resumo_marcas WHERE nome = ?", ("pagamentos",))
+            ultimo_id, ultima_atualizacao = cursor.fetchone()
+            if completo:
+                ultimo_id, ultima_atualizacao = 0, None
+                cursor.execute("DELETE FROM pagamentos_resumo")
+
+            # Novas marcas lidas antes dos dias: o que chegar depois entra na próxima execução
+            cursor.execute("SELECT MAX(id), MAX(atualizado_em) FROM pagamentos")
+            maior_id, maior_atualizacao = cursor.fetchone()
+
+            dias: Set[date] = set()
+            cursor.execute(
+                f"SELECT DISTINCT {self.SQL_DIA_CRIACAO} FROM pagamentos WHERE id > ?",
+                (max(0, (ultimo_id or 0) - self.SOBREPOSICAO_IDS),)
+            )
+            dias.update(self._para_data(row[0]) for row in cursor.fetchall() if row[0] is not None)
+            if ultima_atualizacao is not None:
+                cursor.execute(
+                    f"SELECT DISTINCT {self.SQL_DIA_CRIACAO} FROM pagamentos WHERE atualizado_em > ?",
+                    (self._de_datetime(self._para_datetime(ultima_atualizacao) - self.SOBREPOSICAO_TEMPO),)
+                )
+                dias.update(self._para_data(row[0]) for row in cursor.fetchall() if row[0] is not None)
+            hoje = date.today()
+            dias.update(hoje - timedelta(days=n) for n in range(dias_recentes))
+
+            for dia in sorted(dias):
+                inicio = datetime.combine(dia, time.min)
+                cursor.execute("DELETE FROM pagamentos_resumo WHERE dia = ?", (self._de_data(dia),))
+                cursor.execute(
+                    "INSERT INTO pagamentos_resumo (dia, origem, tipo, status, quantidade, valor_total) "
+                    "SELECT ?, COALESCE(origem, ''), COALESCE(tipo, ''), COALESCE(status, ''), COUNT(*), COALESCE(SUM(valor), 0) "
+                    "FROM pagamentos WHERE criado_em >= ? AND criado_em < ? "
+                    "GROUP BY COALESCE(origem, ''), COALESCE(tipo, ''), COALESCE(status, '')",
+                    (self._de_data(dia), self._de_datetime(inicio), self._de_datetime(inicio + timedelta(days=1)))
+                )
+
+            cursor.execute(
+                f"UPDATE resumo_marcas SET ultimo_id = ?, ultima_atualizacao = ?, atualizado_em = {self.SQL_AGORA} "
+                f"WHERE nome = ?",
+                (maior_id or 0, maior_atualizacao if maior_atualizacao is not None else ultima_atualizacao, "pagamentos")
+            )
+            conn.commit()
+            return len(dias)
+
+    def ler_resumo_pagamentos(self, desde: date, ate: date, origem: Optional[str] = None,
+                              tipo: Optional[str] = None, status: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Linhas de pagamentos_resumo com dia em [desde, ate]."""
+        condicoes, parametros = ["dia >= ?", "dia <= ?"], [self._de_data(desde), self._de_data(ate)]
+        if origem:
+            condicoes.append("origem = ?")
+            parametros.append(origem)
+        if tipo:
+            condicoes.append("tipo = ?")
+            parametros.append(tipo)
+        if status:
+            condicoes.append(f"status IN ({', '.join('?' * len(status))})")
+            parametros.extend(status)
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT dia, origem, tipo, status, quantidade, valor_total FROM pagamentos_resumo "
+                f"WHERE {' AND '.join(condicoes)} ORDER BY dia, origem, tipo, status",
+                parametros
+            )
+            return [
+                {"dia": self._para_data(row[0]), "origem": row[1], "tipo": row[2], "status": row[3],
+                 "quantidade": int(row[4]), "valor_total": float(row[5])}
+                for row in cursor.fetchall()
+            ]
+
+    def marca_resumo_pagamentos(self) -> Optional[datetime]:
+        """Quando o resumo foi atualizado pela última vez (None se nunca foi)."""
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT atualizado_em FROM resumo_marcas WHERE nome = ?", ("pagamentos",))
+            row = cursor.fetchone()
+            return self._para_datetime(row[0]) if row and row[0] is not None else None
+
+    # === eventos_status ===
+
+    def referencia_externa_de(self, referencia: str) -> Optional[str]:
+        """Referência externa do último pagamento com a referência (id no provedor)."""
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT referencia_externa FROM pagamentos WHERE referencia = ? AND referencia_externa IS NOT NULL "
+                "ORDER BY id DESC",
+                (referencia,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def registrar_evento_status(self, referencia_externa: str, referencia: Optional[str], status: str,
+                                status_detail: Optional[str], origem: str):
+        """
+        Grava uma mudança de status na caixa de saída lida pelos workers da API.
+
+        Tabela (SQL Server):
+            CREATE TABLE eventos_status (
+                id BIGINT IDENTITY(1,1) PRIMARY KEY,
+                referencia_externa VARCHAR(100) NOT NULL,
+                referencia VARCHAR(100) NULL,
+                status VARCHAR(50) NULL,
+                status_detail VARCHAR(255) NULL,
+                origem VARCHAR(200) NULL,
+                criado_em DATETIME NOT NULL
+            )
+            CREATE INDEX ix_eventos_status_criado_em ON eventos_status (criado_em)
+        """
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"INSERT INTO eventos_status (referencia_externa, referencia, status, status_detail, origem, criado_em) "
+                f"VALUES (?, ?, ?, ?, ?, {self.SQL_AGORA})",
+                (referencia_externa, referencia, status, status_detail, origem)
+            )
+            conn.commit()
+
+    def ler_eventos_status(self, apos_id: int) -> List[Dict[str, Any]]:
+        """Próximos eventos (até 500) com id maior que `apos_id`, em ordem de id."""
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.SQL_EVENTOS_APOS, (apos_id,))
+            chaves = ("id", "referencia_externa", "referencia", "status", "status_detail", "origem", "criado_em")
+            eventos = [dict(zip(chaves, row)) for row in cursor.fetchall()]
+        for evento in eventos:
+            evento["criado_em"] = self._para_datetime(evento["criado_em"]).isoformat()
+        return eventos
+
+    def ultimo_evento_status(self) -> int:
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(id) FROM eventos_status")
+            return cursor.fetchone()[0] or 0
+
+    def remover_eventos_status(self, antes: datetime) -> int:
+        """Remove eventos já entregues (criados antes de `antes`)."""
+        with self.conexao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM eventos_status WHERE criado_em < ?", (self._de_datetime(antes),))
+            removidos = cursor.rowcount
+            conn.commit()
+            return removidos
+
+    @staticmethod
+    def _para_datetime(valor) -> datetime:
+        return valor
+
+    @staticmethod
+    def _de_datetime(valor: datetime):
+        return valor
+
+    @staticmethod
+    def _para_data(valor) -> date:
+        # Conforme o driver ODBC, CAST(... AS date) chega como date, datetime ou texto ISO
+        if isinstance(valor, str):
+            return date.fromisoformat(valor[:10])
+        if isinstance(valor, datetime):
+            return valor.date()
+        return valor
+
+    @staticmethod
+    def _de_data(valor: date):
+        return valor
+
+
+class SqlServerPagamentosRepository(PagamentosRepository):
+    """Implementação de produção sobre SQL Server (pyodbc)."""
+
+    def conexao(self):
+        return get_db_connection()
+
+    def _preparar_lote(self, cursor):
+        # Envia todas as linhas do executemany em um único round trip
+        cursor.fast_executemany = True
+
+
+class SQLitePagamentosRepository(PagamentosRepository):
+    """
+    Implementação embutida sobre SQLite, com o mesmo comportamento das consultas de produção.
+
+    Datas são gravadas como texto 'YYYY-MM-DD HH:MM:SS.fff' no horário local, o que
+    mantém a ordenação e as comparações por janela de tempo.
+    """
+
+    SQL_AGORA = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+    SQL_PENDENTES_CORA = """
+        SELECT DISTINCT referencia, referencia_externa
+        FROM pagamentos
+        WHERE status NOT IN ('PAID', 'approved', 'rejected', 'cancelled', 'refunded')
+        AND status IS NOT NULL
+        AND referencia IS NOT NULL
+        AND tipo = 'PIX'
+        AND criado_em >= datetime('now', 'localtime', '-' || ? || ' days')
+    """
+    SQL_PENDENTES_MERCADOPAGO = """
+        SELECT referencia, referencia_externa
+        FROM pagamentos
+        WHERE status NOT IN ('rejected', 'cancelled', 'refunded')
+        AND status IS NOT NULL
+        AND referencia IS NOT NULL
+        AND tipo <> 'PIX'
+        AND criado_em >= datetime('now', 'localtime', '-' || ? || ' hours')
+    """
+    SQL_ULTIMO_POR_REFERENCIA_EXTERNA = """
+        SELECT referencia, valor*100, nome, documento, status, tipo, origem, criado_em, referencia_externa, url_pagamento
+        FROM pagamentos
+        WHERE referencia_externa = ?
+        ORDER BY id DESC
+        LIMIT 1
+    """
+
+    SQL_RENOVAR_REPLICA = """
+        INSERT INTO checker_replicas (servico, replica_id, expira_em)
+        VALUES (?, ?, datetime('now', 'localtime', '+' || ? || ' seconds'))
+        ON CONFLICT (servico, replica_id)
+        DO UPDATE SET expira_em = datetime('now', 'localtime', '+' || ? || ' seconds')
+    """
+
+    SQL_SALVAR_TOKEN = """
+        INSERT INTO token_cora (client_id, access_token, expires_at, atualizado_em)
+        VALUES (?, ?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+        ON CONFLICT (client_id)
+        DO UPDATE SET access_token = ?, expires_at = ?, atualizado_em = excluded.atualizado_em,
+            renovando_por = NULL, renovando_ate = NULL
+    """
+    SQL_GARANTIR_TOKEN = "INSERT INTO token_cora (client_id) VALUES (?) ON CONFLICT (client_id) DO NOTHING"
+    SQL_DAQUI_A_SEGUNDOS = "datetime('now', 'localtime', '+' || ? || ' seconds')"
+
+    SQL_DIA_CRIACAO = "substr(criado_em, 1, 10)"
+    SQL_GARANTIR_MARCA = "INSERT INTO resumo_marcas (nome, ultimo_id) VALUES (?, 0) ON CONFLICT (nome) DO NOTHING"
+    SQL_EVENTOS_APOS = """
+        SELECT id, referencia_externa, referencia, status, status_detail, origem, criado_em
+        FROM eventos_status
+        WHERE id > ?
+        ORDER BY id
+        LIMIT 500
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pagamentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            referencia TEXT,
+            valor REAL,
+            nome TEXT,
+            documento TEXT,
+            status TEXT,
+            tipo TEXT,
+            origem TEXT,
+            criado_em TEXT,
+            referencia_externa TEXT,
+            status_detail TEXT,
+            atualizado_em TEXT,
+            url_pagamento TEXT,
+            requisicaooriginal TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_pagamentos_referencia ON pagamentos (referencia);
+        CREATE INDEX IF NOT EXISTS ix_pagamentos_referencia_externa ON pagamentos (referencia_externa);
+        CREATE INDEX IF NOT EXISTS ix_pagamentos_pendentes ON pagamentos (tipo, criado_em);
+        CREATE INDEX IF NOT EXISTS ix_pagamentos_criado_em ON pagamentos (criado_em);
+        CREATE INDEX IF NOT EXISTS ix_pagamentos_atualizado_em ON pagamentos (atualizado_em);
+        CREATE TABLE IF NOT EXISTS webhook_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origem TEXT,
+            tipo_evento TEXT,
+            referencia_externa TEXT,
+            payload TEXT,
+            criado_em TEXT
+        );
+        CREATE TABLE IF NOT EXISTS checker_replicas (
+            servico TEXT NOT NULL,
+            replica_id TEXT NOT NULL,
+            expira_em TEXT NOT NULL,
+            PRIMARY KEY (servico, replica_id)
+        );
+        CREATE TABLE IF NOT EXISTS token_cora (
+            client_id TEXT NOT NULL PRIMARY KEY,
+            access_token TEXT,
+            expires_at TEXT,
+            atualizado_em TEXT,
+            renovando_por TEXT,
+            renovando_ate TEXT
+        );
+        CREATE TABLE IF NOT EXISTS pagamentos_resumo (
+            dia TEXT NOT NULL,
+            origem TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            status TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            valor_total REAL NOT NULL,
+            PRIMARY KEY (dia, origem, tipo, status)
+        );
+        CREATE TABLE IF NOT EXISTS resumo_marcas (
+            nome TEXT NOT NULL PRIMARY KEY,
+            ultimo_id INTEGER NOT NULL,
+            ultima_atualizacao TEXT,
+            atualizado_em TEXT,
+            processando_por TEXT,
+            processando_ate TEXT
+        );
+        CREATE TABLE IF NOT EXISTS eventos_status (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            referencia_externa TEXT NOT NULL,
+            referencia TEXT,
+            status TEXT,
+            status_detail TEXT,
+            origem TEXT,
+            criado_em TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_eventos_status_criado_em ON eventos_status (criado_em);
+    """
+
+    def __init__(self, caminho: str = SQLITE_PATH):
+        self.caminho = caminho
+        with self.conexao() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            colunas = [row[1] for row in conn.execute("PRAGMA table_info(token_cora)").fetchall()]
+            if colunas and "client_id" not in colunas:
+                # Formato antigo (linhas por append): o token é descartável e será obtido de novo
+                conn.execute("DROP TABLE token_cora")
+            conn.executescript(self.SCHEMA)
+            conn.commit()
+
+    @contextmanager
+    def conexao(self):
+        # check_same_thread=False: geradores como exportar_pagamentos são consumidos por
+        # threads diferentes do threadpool, sempre um passo por vez
+        conn = sqlite3.connect(self.caminho, timeout=30, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield ConexaoInstrumentada(conn)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _para_datetime(valor) -> datetime:
+        return datetime.fromisoformat(valor) if isinstance(valor, str) else valor
+
+    @staticmethod
+    def _de_datetime(valor: datetime):
+        return valor.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    @staticmethod
+    def _para_data(valor) -> date:
+        return date.fromisoformat(valor[:10]) if isinstance(valor, str) else valor
+
+    @staticmethod
+    def _de_data(valor: date):
+        return valor.isoformat()
+
+
+_repositorio: Optional[PagamentosRepository] = None
+_repositorio_lock = threading.Lock()
+
+
+def obter_repositorio() -> PagamentosRepository:
+    """Retorna o repositório configurado em DB_BACKEND (instância única por processo)."""
+    global _repositorio
+    if _repositorio is None:
+        with _repositorio_lock:
+            if _repositorio is None:
+                if DB_BACKEND == "sqlite":
+                    logger.info("Usando repositório SQLite em %s", SQLITE_PATH)
+                    _repositorio = SQLitePagamentosRepository(SQLITE_PATH)
+                else:
+                    _repositorio = SqlServerPagamentosRepository()
+    return _repositorio
+
+
+def get_repositorio() -> PagamentosRepository:
+    """Dependência FastAPI."""
+    return obter_repositorio()
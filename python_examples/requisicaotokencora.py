@@ -1,80 +1,276 @@
+"""
+Token de acesso da API da Cora (client_credentials com mTLS).
+
+O token fica em memória e é renovado por uma thread de fundo
+(RenovadorTokenCora) em um ponto aleatório entre CORA_TOKEN_ANTECEDENCIA e
+CORA_TOKEN_ANTECEDENCIA + CORA_TOKEN_JITTER segundos antes de expirar;
+enquanto a renovação está em andamento, obter_token_cora() continua
+devolvendo o token atual. O jitter evita que todos os processos renovem no
+mesmo instante.
+
+Se /token falhar, novas tentativas seguem backoff exponencial (até
+CORA_TOKEN_BACKOFF_MAX segundos) e, sem token válido em memória, a falha fica
+em cache pelo mesmo período: as chamadas falham na hora em vez de repetir a
+requisição ao endpoint.
+
+Entre processos (workers da API e verificadores), o token é compartilhado pela
+tabela token_cora, uma linha por client_id. Quem precisa renovar pega um lease
+curto (CORA_TOKEN_LEASE) na própria linha; só o dono do lease chama /token e os
+demais seguem com o último token válido ou, sem ele, esperam o novo token
+aparecer na tabela por até CORA_TOKEN_ESPERA segundos.
+"""
+
 import os
+import time
+import socket
+import random
+import logging
+import threading
 import requests
-import pyodbc
 from dotenv import load_dotenv
-from functools import lru_cache
 from datetime import datetime, timedelta
-from database import get_db_connection  # use a sua função já existente
+from typing import Optional, Tuple
+from config import (
+    CORA_CERT_PATH,
+    CORA_CLIENT_ID,
+    CORA_KEY_PATH,
+    CORA_TOKEN_ANTECEDENCIA,
+    CORA_TOKEN_BACKOFF_MAX,
+    CORA_TOKEN_ESPERA,
+    CORA_TOKEN_JITTER,
+    CORA_TOKEN_LEASE,
+    CORA_TOKEN_URL,
+)
+from repositorio import obter_repositorio
+from instrumentacao import chamada_externa
+from metrics import TOKEN_REFRESHES
+from tracing import rastrear
 
 
 # Carrega variáveis do .env
 
 load_dotenv()
 
-CERT_PATH = "C:/cert_key_cora_production/certificate.pem"
-KEY_PATH = "C:/cert_key_cora_production/private-key.key"
-TOKEN_URL = "https://matls-clients.api.cora.com.br/token"
+logger = logging.getLogger(__name__)
+
+CERT_PATH = CORA_CERT_PATH
+KEY_PATH = CORA_KEY_PATH
+TOKEN_URL = CORA_TOKEN_URL
 HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+TOKEN_TIMEOUT = 30  # segundos
+MARGEM_MINIMA = timedelta(seconds=30)  # abaixo disso o token em memória não é mais entregue
+
+
+class ErroTokenCora(Exception):
+    """Token da Cora indisponível (falha recente ainda em cache ou erro do endpoint)."""
 
 
 # Define variável de cache manual
 _token_cache = {
     "access_token": None,
-    "expires_at": datetime.min
+    "expires_at": datetime.min,
+    "renovar_em": datetime.min,
 }
+# Última falha de /token: enquanto `ate` não passar, nenhuma nova requisição é feita
+_falha = {"erro": None, "ate": datetime.min, "tentativas": 0}
+_lock = threading.Lock()
+
 
 def token_expirado():
     """Verifica se o token atual está expirado."""
     return datetime.utcnow() >= _token_cache["expires_at"]
 
-def obter_token_cora():
-    dados_conexao = (
-    "Driver={SQL Server};"
-    "Server=ITSERP\\ITSERPSRV;"
-    "Database=ConectudoPDV"
-            )
-    
-    conexao_direta = pyodbc.connect(dados_conexao)
-    cursor = conexao_direta.cursor()
-
-    cursor.execute("SELECT access_token, expires_at FROM token_cora WHERE id = 1")
-    row = cursor.fetchone()
 
+def _guardar(token: str, expires_at: datetime):
     agora = datetime.utcnow()
+    renovar_em = expires_at - timedelta(seconds=CORA_TOKEN_ANTECEDENCIA + random.uniform(0, CORA_TOKEN_JITTER))
+    if renovar_em <= agora:
+        # Token com vida curta: renova na metade do tempo restante
+        renovar_em = agora + (expires_at - agora) / 2
+    _token_cache.update(access_token=token, expires_at=expires_at, renovar_em=renovar_em)
+    _falha.update(erro=None, ate=datetime.min, tentativas=0)
+
+
+def _registrar_falha(erro: Exception):
+    _falha["tentativas"] += 1
+    espera = min(CORA_TOKEN_BACKOFF_MAX, 2 ** _falha["tentativas"]) * random.uniform(0.5, 1.0)
+    _falha.update(erro=str(erro), ate=datetime.utcnow() + timedelta(seconds=espera))
+    logger.error(f"Falha ao obter token da Cora (tentativa {_falha['tentativas']}), nova tentativa em {espera:.0f}s: {erro}")
+
 
-    # Se token existe e é válido por mais de 5 minutos, retorna
-    if row:
-        token, expires_at = row
-        if expires_at - agora > timedelta(minutes=5):
-            return token
+def _dono() -> str:
+    """Identifica este processo no lease de renovação."""
+    return f"{socket.gethostname()}:{os.getpid()}"
 
-    # Caso contrário, requisita novo token
-    client_id = os.getenv("CORA_CLIENT_ID")
+
+def _client_id() -> str:
+    return CORA_CLIENT_ID or os.getenv("CORA_CLIENT_ID") or ""
+
+
+def _compartilhado(row, anterior: Optional[datetime]) -> bool:
+    """Token da tabela pode ser usado: novo em relação ao lido antes e longe da janela de renovação."""
+    if not row:
+        return False
+    _, expires_at = row
+    restante = expires_at - datetime.utcnow()
+    if anterior is not None and expires_at > anterior:
+        return restante > MARGEM_MINIMA
+    return restante > timedelta(seconds=CORA_TOKEN_ANTECEDENCIA + CORA_TOKEN_JITTER)
+
+
+def _aguardar_outro_processo(repositorio, client_id: str, row, anterior: Optional[datetime]) -> Tuple[str, datetime]:
+    """
+    Outro processo detém o lease. Roda sob _lock, então não espera o lease inteiro:
+    devolve o último token ainda válido (o novo é lido na próxima renovação) ou
+    espera o token novo por até CORA_TOKEN_ESPERA segundos.
+    """
+    if row and row[1] - datetime.utcnow() > MARGEM_MINIMA:
+        TOKEN_REFRESHES.labels("cora", "shared").inc()
+        return row
+    limite = time.monotonic() + CORA_TOKEN_ESPERA
+    while time.monotonic() < limite:
+        time.sleep(0.5)
+        row = repositorio.ler_token_cora(client_id)
+        if _compartilhado(row, anterior):
+            TOKEN_REFRESHES.labels("cora", "shared").inc()
+            return row
+    raise ErroTokenCora("Renovação do token em andamento em outro processo não terminou a tempo")
+
+
+def _requisitar_token() -> Tuple[str, datetime]:
+    repositorio = obter_repositorio()
+    client_id = _client_id()
+    row = repositorio.ler_token_cora(client_id)
+    anterior = row[1] if row else None
+
+    # Token gravado por outro processo e ainda longe da janela de renovação
+    if _compartilhado(row, None):
+        TOKEN_REFRESHES.labels("cora", "shared").inc()
+        return row
+
+    # Apenas um processo por vez chama /token; os demais esperam e leem o resultado
+    if not repositorio.adquirir_renovacao_token_cora(client_id, _dono(), CORA_TOKEN_LEASE):
+        return _aguardar_outro_processo(repositorio, client_id, row, anterior)
+
+    try:
+        novo_token, nova_expiracao = _chamar_endpoint_token(client_id)
+    except Exception:
+        repositorio.liberar_renovacao_token_cora(client_id, _dono())
+        raise
+
+    # Grava na linha do client_id e libera o lease
+    repositorio.salvar_token_cora(client_id, novo_token, nova_expiracao)
+    return novo_token, nova_expiracao
+
+
+def _chamar_endpoint_token(client_id: str) -> Tuple[str, datetime]:
+    agora = datetime.utcnow()
     data = {
-        "grant_type": "client_credentials",  
+        "grant_type": "client_credentials",
         "client_id": client_id
     }
-    print([TOKEN_URL],HEADERS,data, CERT_PATH, KEY_PATH)
-
-    response = requests.post(
-        TOKEN_URL,
-        headers=HEADERS,
-        data=data,
-        cert=(CERT_PATH, KEY_PATH)
-    )
-
-    if response.status_code == 200:
-        token_data = response.json()
-        novo_token = token_data["access_token"]
-        nova_expiracao = agora + timedelta(seconds=token_data.get("expires_in", 1800))
-
-        # Insere ou atualiza
-        cursor.execute("""
-            INSERT INTO token_cora (id, access_token, expires_at)
-            VALUES ((select isnull(MAx(id),0)+1 from token_cora), ?, ?)
-        """, (novo_token, nova_expiracao))
-
-        conexao_direta.commit()
-        return novo_token
-    else:
-        raise Exception(f"Erro ao obter token: {response.status_code} - {response.text}")
\ No newline at end of file
+
+    try:
+        with chamada_externa("cora", "token"):
+            response = requests.post(
+                TOKEN_URL,
+                headers=HEADERS,
+                data=data,
+                # mTLS apenas contra a Cora real; o emulador local responde em HTTP simples
+                cert=(CERT_PATH, KEY_PATH) if TOKEN_URL.startswith("https") else None,
+                timeout=TOKEN_TIMEOUT
+            )
+    except Exception:
+        TOKEN_REFRESHES.labels("cora", "error").inc()
+        raise
+
+    TOKEN_REFRESHES.labels("cora", "ok" if response.status_code == 200 else "error").inc()
+    if response.status_code != 200:
+        raise ErroTokenCora(f"Erro ao obter token: {response.status_code} - {response.text}")
+
+    token_data = response.json()
+    return token_data["access_token"], agora + timedelta(seconds=token_data.get("expires_in", 1800))
+
+
+def renovar_token_cora(forcar: bool = False) -> str:
+    """
+    Obtém um novo token e atualiza o cache em memória (uma requisição por vez por processo).
+
+    Args:
+        forcar: renova mesmo que o token em memória ainda esteja válido (usado pelo renovador)
+    """
+    with _lock:
+        agora = datetime.utcnow()
+        if not forcar and _token_cache["access_token"] and _token_cache["expires_at"] - agora > MARGEM_MINIMA:
+            # Outra thread renovou enquanto esta aguardava o lock
+            return _token_cache["access_token"]
+        try:
+            token, expires_at = _requisitar_token()
+        except Exception as e:
+            _registrar_falha(e)
+            raise
+        _guardar(token, expires_at)
+        return token
+
+
+@rastrear("cora.obter_token")
+def obter_token_cora():
+    agora = datetime.utcnow()
+
+    # Token em memória válido: devolve sem esperar (a renovação acontece em segundo plano)
+    if _token_cache["access_token"] and _token_cache["expires_at"] - agora > MARGEM_MINIMA:
+        return _token_cache["access_token"]
+
+    # Sem token válido e com falha recente: não repete a requisição até o fim do backoff
+    if agora < _falha["ate"]:
+        raise ErroTokenCora(f"Token da Cora indisponível (última falha: {_falha['erro']})")
+
+    return renovar_token_cora()
+
+
+class RenovadorTokenCora:
+    """Thread de fundo que renova o token antes de expirar."""
+
+    def __init__(self):
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def iniciar(self):
+        """Inicia a renovação; a primeira obtenção do token também acontece em segundo plano."""
+        self._thread = threading.Thread(target=self._executar, name="renovador-token-cora", daemon=True)
+        self._thread.start()
+
+    def encerrar(self):
+        self._parar.set()
+
+    def _proxima_execucao(self) -> float:
+        proxima = max(_token_cache["renovar_em"], _falha["ate"])
+        return max(0.0, (proxima - datetime.utcnow()).total_seconds())
+
+    def _executar(self):
+        while not self._parar.wait(self._proxima_execucao()):
+            try:
+                renovar_token_cora(forcar=True)
+                logger.info("Token da Cora renovado, válido até %s (próxima renovação em %s)",
+                            _token_cache["expires_at"], _token_cache["renovar_em"])
+            except Exception:
+                # Falha registrada em _falha; o próximo ciclo respeita o backoff
+                pass
+
+
+_renovador: Optional[RenovadorTokenCora] = None
+
+
+def iniciar_renovacao_token():
+    """Inicia o renovador de token deste processo (chamado no lifespan da API e no serviço dos verificadores)."""
+    global _renovador
+    if _renovador is None:
+        _renovador = RenovadorTokenCora()
+        _renovador.iniciar()
+
+
+def encerrar_renovacao_token():
+    global _renovador
+    if _renovador is not None:
+        _renovador.encerrar()
+        _renovador = None
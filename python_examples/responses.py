@@ -1,6 +1,17 @@
 # schemas.py
+from fastapi import Response
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+from serializacao import dumps
+
+
+class RespostaJSON(Response):
+    """Resposta JSON serializada por serializacao.dumps (orjson); classe padrão das rotas (main.py)."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
 
 
 class PixResponse(BaseModel):
@@ -54,3 +65,32 @@ class ObterDadosManualResponse(BaseModel):
     url_pagamento: str
 
 
+
+
+class TotalResumo(BaseModel):
+    quantidade: int
+    valor_total: float
+
+
+class LinhaResumo(TotalResumo):
+    dia: Optional[str] = None
+    origem: Optional[str] = None
+    tipo: Optional[str] = None
+    status: Optional[str] = None
+
+
+class ResumoPagamentosResponse(BaseModel):
+    desde: str
+    ate: str
+    atualizado_em: Optional[str] = None
+    total: TotalResumo
+    linhas: List[LinhaResumo]
+
+
+class ResumoDiaResponse(BaseModel):
+    dia: str
+    atualizado_em: Optional[str] = None
+    total: TotalResumo
+    por_status: Dict[str, TotalResumo]
+    por_origem: Dict[str, TotalResumo]
+    por_tipo: Dict[str, TotalResumo]
@@ -1,10 +1,11 @@
 import socket
+from urllib.parse import urlparse
 import time
 import requests
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
-from supabase import create_client, Client
 import logging
+from instrumentacao import chamada_externa
 
 class RobustSupabaseClient:
     """
@@ -30,8 +31,8 @@ class RobustSupabaseClient:
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
+        # O cliente supabase-py (import pesado + verificação de rede) é criado no primeiro uso
         self.client = None
-        self._initialize_client()
     
     def _check_dns_resolution(self, hostname):
         """
@@ -49,7 +50,7 @@ class RobustSupabaseClient:
         """
         try:
             # Extrair hostname da URL
-            hostname = self.url.replace("https://", "").replace("http://", "")
+            hostname = urlparse(self.url).hostname  # ignora esquema e porta (ex.: emulador em 127.0.0.1:8103)
             
             # Verificar resolução DNS
             if not self._check_dns_resolution(hostname):
@@ -74,6 +75,7 @@ class RobustSupabaseClient:
         """
         try:
             if self._check_connectivity():
+                from supabase import create_client
                 self.client = create_client(self.url, self.api_key)
                 self.logger.info("Cliente Supabase inicializado com sucesso")
                 return True
@@ -94,13 +96,14 @@ class RobustSupabaseClient:
                     if not self._initialize_client():
                         raise Exception("Não foi possível inicializar cliente Supabase")
                 
-                self.logger.info(f"Tentativa {attempt + 1} de atualização na tabela {table_name}")
+                self.logger.info("Tentativa %s de atualização na tabela %s", attempt + 1, table_name, extra={"amostra": "supabase.update"})
                 
-                response = self.client.table(table_name).update(update_data).eq(filter_column, filter_value).execute()
+                with chamada_externa("supabase", f"update_{table_name}"):
+                    response = self.client.table(table_name).update(update_data).eq(filter_column, filter_value).execute()
                 
                 # Verificar se a resposta foi bem-sucedida
                 if hasattr(response, 'data') and response.data is not None:
-                    self.logger.info(f"Atualização na tabela {table_name} bem-sucedida na tentativa {attempt + 1}")
+                    self.logger.info("Atualização na tabela %s bem-sucedida na tentativa %s", table_name, attempt + 1, extra={"amostra": "supabase.update"})
                     return True
                 else:
                     raise Exception(f"Resposta inválida do Supabase para tabela {table_name}: {response}")
@@ -154,7 +157,7 @@ class RobustSupabaseClient:
             "provider_ref": payment_data["id"]
         }
         
-        self.logger.info(f"🔄 Atualizando tabela payments para registration_id: {registration_id}")
+        self.logger.info("🔄 Atualizando tabela payments para registration_id: %s", registration_id, extra={"amostra": "supabase.update"})
         results['payments'] = self.update_with_retry(
             table_name="payments",
             update_data=payment_update_data,
@@ -171,7 +174,7 @@ class RobustSupabaseClient:
                 "payment_method": "PIX"
             }
             
-            self.logger.info(f"🔄 Atualizando tabela registrations para registration_id: {registration_id}")
+            self.logger.info("🔄 Atualizando tabela registrations para registration_id: %s", registration_id, extra={"amostra": "supabase.update"})
             results['registrations'] = self.update_with_retry(
                 table_name="registrations",
                 update_data=registration_update_data,
@@ -184,7 +187,7 @@ class RobustSupabaseClient:
                 "payment_status": mapped_status
             }
             
-            self.logger.info(f"🔄 Atualizando payment_status na tabela registrations para registration_id: {registration_id}")
+            self.logger.info("🔄 Atualizando payment_status na tabela registrations para registration_id: %s", registration_id, extra={"amostra": "supabase.update"})
             results['registrations'] = self.update_with_retry(
                 table_name="registrations", 
                 update_data=registration_update_data,
@@ -194,7 +197,7 @@ class RobustSupabaseClient:
         
         # Log do resultado final
         if results['payments'] and results['registrations']:
-            self.logger.info(f"✅ Ambas as tabelas atualizadas com sucesso para registration_id: {registration_id}")
+            self.logger.info("✅ Ambas as tabelas atualizadas com sucesso para registration_id: %s", registration_id, extra={"amostra": "supabase.update"})
         elif results['payments']:
             self.logger.warning(f"⚠️ Apenas tabela payments atualizada para registration_id: {registration_id}")
         elif results['registrations']:
@@ -211,7 +214,7 @@ class RobustSupabaseClient:
         self.logger.info("Testando conexão com Supabase...")
         
         # Verificar DNS
-        hostname = self.url.replace("https://", "").replace("http://", "")
+        hostname = urlparse(self.url).hostname  # ignora esquema e porta (ex.: emulador em 127.0.0.1:8103)
         if not self._check_dns_resolution(hostname):
             self.logger.error(f"❌ Falha na resolução DNS para {hostname}")
             return False
@@ -269,7 +272,7 @@ class RobustSupabaseClient:
             "tipo": "Credito"  # Específico para MercadoPago
         }
         
-        self.logger.info(f"🔄 Atualizando tabela pa4ments (MercadoPago) para registration_id: {registration_id}")
+        self.logger.info("🔄 Atualizando tabela pa4ments (MercadoPago) para registration_id: %s", registration_id, extra={"amostra": "supabase.update"})
         results['payments'] = self.update_with_retry(
             table_name="payments",
             update_data=payment_update_data,
@@ -286,7 +289,7 @@ class RobustSupabaseClient:
                 "payment_method": "Credito"  # Específico para MercadoPago
             }
             
-            self.logger.info(f"🔄 Atualizando tabela registrations (MercadoPago) para registration_id: {registration_id}")
+            self.logger.info("🔄 Atualizando tabela registrations (MercadoPago) para registration_id: %s", registration_id, extra={"amostra": "supabase.update"})
             results['registrations'] = self.update_with_retry(
                 table_name="registrations",
                 update_data=registration_update_data,
@@ -299,7 +302,7 @@ class RobustSupabaseClient:
                 "payment_status": mapped_status
             }
             
-            self.logger.info(f"🔄 Atualizando payment_status na tabela registrations (MercadoPago) para registration_id: {registration_id}")
+            self.logger.info("🔄 Atualizando payment_status na tabela registrations (MercadoPago) para registration_id: %s", registration_id, extra={"amostra": "supabase.update"})
             results['registrations'] = self.update_with_retry(
                 table_name="registrations", 
                 update_data=registration_update_data,
@@ -309,7 +312,7 @@ class RobustSupabaseClient:
         
         # Log do resultado final
         if results['payments'] and results['registrations']:
-            self.logger.info(f"✅ Ambas as tabelas atualizadas com sucesso (MercadoPago) para registration_id: {registration_id}")
+            self.logger.info("✅ Ambas as tabelas atualizadas com sucesso (MercadoPago) para registration_id: %s", registration_id, extra={"amostra": "supabase.update"})
         elif results['payments']:
             self.logger.warning(f"⚠️ Apenas tabela payments atualizada (MercadoPago) para registration_id: {registration_id}")
         elif results['registrations']:
@@ -0,0 +1,70 @@
+"""
+Template completo da rota atendida, para rótulos de métricas e atributos de trace.
+
+A partir do FastAPI 0.14x os routers incluídos ficam encapsulados
+(_IncludedRouter) e request.scope["route"] é a rota original do APIRouter,
+cujo `path` não tem o prefixo do include_router: /pagamento/obter-dados/{x}
+aparecia como /obter-dados/{x}, os dois mounts do cora_router como
+/cora/cobranca e o webhook como /mercadopago.
+
+Os templates completos (prefixos dos includes + caminho da rota) são
+montados uma vez por aplicação, na ordem de roteamento, e a requisição é
+comparada com eles por método e caminho.
+"""
+
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import Request
+from starlette.routing import compile_path
+
+# (métodos aceitos ou None para qualquer um, regex do caminho, template completo)
+_Template = Tuple[Optional[Set[str]], object, str]
+
+_templates: Dict[int, List[_Template]] = {}
+_lock = threading.Lock()
+
+
+def _coletar(rotas, prefixo: str, destino: List[_Template]):
+    for rota in rotas:
+        contexto = getattr(rota, "include_context", None)
+        if contexto is not None:
+            _coletar(contexto.included_router.routes, prefixo + contexto.prefix, destino)
+            continue
+        caminho = getattr(rota, "path", None)
+        if caminho is None:
+            continue
+        template = prefixo + caminho
+        regex, _, _ = compile_path(template)
+        metodos = getattr(rota, "methods", None)
+        destino.append((set(metodos) if metodos else None, regex, template))
+
+
+def templates_da_aplicacao(app) -> List[_Template]:
+    """Templates completos das rotas da aplicação, na ordem de roteamento."""
+    chave = id(app)
+    if chave not in _templates:
+        with _lock:
+            if chave not in _templates:
+                destino: List[_Template] = []
+                _coletar(app.router.routes, "", destino)
+                _templates[chave] = destino
+    return _templates[chave]
+
+
+def template_rota(request: Request) -> Optional[str]:
+    """
+    Template completo da rota que atendeu a requisição (ex.: /pagamento/obter-dados/{referencia_externa}).
+
+    Returns:
+        Optional[str]: None se nenhuma rota atendeu (404)
+    """
+    rota = request.scope.get("route")
+    if rota is None:
+        return None
+    caminho = request.url.path
+    for metodos, regex, template in templates_da_aplicacao(request.app):
+        if (metodos is None or request.method in metodos) and regex.match(caminho):
+            return template
+    # Rotas sintéticas (ex.: recusas da admissão) já trazem o caminho completo
+    return getattr(rota, "path", None)
@@ -0,0 +1,57 @@
+"""
+Camada única de JSON do projeto, baseada em orjson.
+
+- dumps / dumps_str / loads: codificação e decodificação rápidas, aceitando
+  datetime, Decimal e dataclasses;
+- corpo_json: decodifica o corpo de uma requisição uma única vez e guarda os
+  bytes originais e o objeto em request.state para reuso (logs, webhook_logs).
+
+As respostas HTTP usam responses.RespostaJSON, baseada em dumps, como classe
+padrão (main.py). O módulo não importa FastAPI para poder ser usado pelos
+verificadores e pelo logging.
+"""
+
+from decimal import Decimal
+from typing import Any, Tuple
+
+import orjson
+
+OPCOES = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _padrao(obj: Any):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode("utf-8", errors="replace")
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializa para bytes UTF-8."""
+    return orjson.dumps(obj, default=_padrao, option=OPCOES)
+
+
+def dumps_str(obj: Any) -> str:
+    """Serializa para str (para logs e colunas texto)."""
+    return dumps(obj).decode("utf-8")
+
+
+def loads(dados: Any) -> Any:
+    """Decodifica bytes ou str."""
+    return orjson.loads(dados)
+
+
+async def corpo_json(request) -> Tuple[Any, bytes]:
+    """
+    Lê e decodifica o corpo JSON da requisição uma única vez.
+
+    Returns:
+        tuple: (objeto decodificado, bytes originais). Os bytes podem ser gravados
+        diretamente (ex.: webhook_logs) sem serializar o objeto novamente.
+    """
+    if not hasattr(request.state, "corpo_json"):
+        bruto = await request.body()
+        request.state.corpo_bruto = bruto
+        request.state.corpo_json = orjson.loads(bruto)
+    return request.state.corpo_json, request.state.corpo_bruto
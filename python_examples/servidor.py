@@ -0,0 +1,58 @@
+"""
+Ponto de entrada da API: sobe main:app no uvicorn com N processos worker.
+
+Cada worker importa a aplicação e cria seus próprios recursos no lifespan
+(main.py): pool de conexões do banco, SDK e executor do Mercado Pago e
+clientes HTTP, dimensionados por DB_POOL_SIZE, MP_POOL_SIZE,
+MP_EXECUTOR_WORKERS e HTTP_POOL_SIZE. Com mais de um worker, as métricas
+Prometheus passam a ser gravadas em PROMETHEUS_MULTIPROC_DIR e agregadas em /metrics.
+
+Uso:
+    python servidor.py                      # SERVIDOR_WORKERS workers em SERVIDOR_HOST:SERVIDOR_PORTA
+    python servidor.py --workers 8 --porta 9000
+"""
+
+import os
+import shutil
+import argparse
+import tempfile
+
+import uvicorn
+
+from config import SERVIDOR_HOST, SERVIDOR_PORTA, SERVIDOR_WORKERS
+
+
+def preparar_metricas_multiprocesso() -> str:
+    """Define e limpa o diretório das métricas compartilhadas entre workers."""
+    diretorio = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "itsells_prometheus")
+    )
+    # Arquivos de uma execução anterior somariam contadores de processos que já não existem
+    shutil.rmtree(diretorio, ignore_errors=True)
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor da API de pagamentos")
+    parser.add_argument("--host", default=SERVIDOR_HOST)
+    parser.add_argument("--porta", type=int, default=SERVIDOR_PORTA)
+    parser.add_argument("--workers", type=int, default=SERVIDOR_WORKERS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        preparar_metricas_multiprocesso()
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.porta,
+        workers=args.workers,
+        log_level=args.log_level,
+        access_log=False,  # latência e status por rota já são registrados em /metrics
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Tracing leve por requisição com exportação local em JSON Lines.
+
+Cada requisição HTTP abre um span raiz; chamadas de token, provedores, comandos
+SQL e Supabase abrem spans filhos. O span atual é propagado via contextvars,
+portanto atravessa rotas, dependências, asyncio.to_thread e executores que
+copiem o contexto.
+
+A decisão de exportar é tomada ao final do trace: traces mais lentos que
+TRACE_LENTO_MS são sempre gravados; os demais são amostrados com
+probabilidade TRACE_AMOSTRAGEM. A gravação acontece em uma thread de fundo.
+"""
+
+import os
+import time
+import queue
+import random
+import logging
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from config import TRACE_AMOSTRAGEM, TRACE_ARQUIVO, TRACE_HABILITADO, TRACE_LENTO_MS
+from rotas import template_rota
+from serializacao import dumps
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "inicio", "duracao_ms", "erro", "_trace")
+
+    def __init__(self, name: str, parent: Optional["Span"], attrs: Dict[str, Any]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self._trace: List["Span"] = parent._trace if parent else []
+        self.attrs = attrs
+        self.inicio = time.time()
+        self.duracao_ms: Optional[float] = None
+        self.erro: Optional[str] = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.inicio,
+            "duration_ms": round(self.duracao_ms or 0, 3),
+            "error": self.erro,
+            "attrs": self.attrs,
+        }
+
+
+class ExportadorJsonl:
+    """Grava traces em um arquivo JSON Lines a partir de uma thread de fundo."""
+
+    def __init__(self, caminho: str, max_fila: int = 10000):
+        self.caminho = caminho
+        self._fila: "queue.Queue[List[Span]]" = queue.Queue(maxsize=max_fila)
+        self._thread = threading.Thread(target=self._executar, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def exportar(self, spans: List[Span]):
+        try:
+            self._fila.put_nowait(spans)
+        except queue.Full:
+            pass  # descarta em vez de bloquear a requisição
+
+    def _executar(self):
+        while True:
+            spans = self._fila.get()
+            try:
+                with open(self.caminho, "ab") as arquivo:
+                    arquivo.writelines(dumps(s.as_dict()) + b"\n" for s in spans)
+            except Exception as e:
+                logger.warning(f"Falha ao gravar traces em {self.caminho}: {str(e)}")
+
+
+_span_atual: ContextVar[Optional[Span]] = ContextVar("span_atual", default=None)
+_exportador: Optional[ExportadorJsonl] = None
+_exportador_lock = threading.Lock()
+
+
+def _obter_exportador() -> ExportadorJsonl:
+    global _exportador
+    if _exportador is None:
+        with _exportador_lock:
+            if _exportador is None:
+                _exportador = ExportadorJsonl(TRACE_ARQUIVO)
+    return _exportador
+
+
+def span_atual() -> Optional[Span]:
+    return _span_atual.get()
+
+
+def _finalizar_trace(raiz: Span):
+    if raiz.duracao_ms >= TRACE_LENTO_MS or random.random() < TRACE_AMOSTRAGEM:
+        _obter_exportador().exportar(list(raiz._trace))
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Abre um span filho do span atual (ou um span raiz, se não houver trace em andamento).
+
+    Exemplo:
+        with span("cora.create_invoice", referencia=payload.referencia):
+            ...
+    """
+    if not TRACE_HABILITADO:
+        yield None
+        return
+
+    pai = _span_atual.get()
+    atual = Span(name, pai, attrs)
+    token = _span_atual.set(atual)
+    inicio = time.perf_counter()
+    try:
+        yield atual
+    except BaseException as e:
+        atual.erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        atual.duracao_ms = (time.perf_counter() - inicio) * 1000
+        atual._trace.append(atual)
+        _span_atual.reset(token)
+        if pai is None:
+            _finalizar_trace(atual)
+
+
+def rastrear(name: str):
+    """Decorator que executa a função dentro de um span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def middleware_tracing(request, call_next):
+    """Middleware HTTP que abre o span raiz da requisição e devolve o trace id em X-Trace-Id."""
+    with span(f"{request.method} {request.url.path}", method=request.method, path=request.url.path) as raiz:
+        response = await call_next(request)
+        if raiz is not None:
+            raiz.set(route=template_rota(request), status=response.status_code)
+            response.headers["X-Trace-Id"] = raiz.trace_id
+        return response
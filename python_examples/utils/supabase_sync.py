@@ -1,5 +1,7 @@
-import httpx
+import compartimentos
+import http_clientes
 from config import SUPABASE_URL, SUPABASE_KEY
+from instrumentacao import chamada_externa
 
 async def confirmar_pagamento_supabase(referencia_externa: str):
     try:
@@ -16,9 +18,15 @@ async def confirmar_pagamento_supabase(referencia_externa: str):
 
         url = f"{SUPABASE_URL}/rest/v1/pagamentos_supabase?referencia_externa=eq.{referencia_externa}"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(url, headers=headers, json=data)
+        # Compartimento próprio: um Supabase lento não ocupa a capacidade dos demais provedores
+        with chamada_externa("supabase", "confirm_payment"):
+            response = await compartimentos.supabase.aguardar(
+                http_clientes.cliente_async().patch(url, headers=headers, json=data)
+            )
 
         return response.status_code, response.json()
+    except (compartimentos.CompartimentoSaturado, compartimentos.TempoEsgotado):
+        # Tratadas pelos handlers da aplicação (503 com Retry-After / 504)
+        raise
     except Exception as e:
         return 500, {"error": str(e)}
\ No newline at end of file
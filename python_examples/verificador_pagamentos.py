@@ -0,0 +1,568 @@
+"""
+Verificador unificado de pagamentos (Cora e Mercado Pago) em um único processo asyncio.
+
+Cada provedor é um plug-in (ProvedorVerificacao) que sabe buscar os pendentes,
+consultar o status, mapear o status para o banco local e montar o payload do
+Supabase. O verificador roda os provedores em paralelo, cada um no seu
+intervalo, compartilhando o pool de conexões do banco, o cliente Supabase, a
+verificação de conectividade e a coordenação entre réplicas (coordenacao.py).
+Status que não mudaram desde a última gravação não são gravados de novo
+(estado_pagamentos.py).
+
+Uso:
+    python verificador_pagamentos.py                    # serviço contínuo, todos os provedores
+    python verificador_pagamentos.py --once             # um ciclo de cada provedor e sai
+    python verificador_pagamentos.py --test             # testa conectividade e sai
+    python verificador_pagamentos.py --provedores cora  # apenas a Cora
+"""
+
+import os
+import time
+import socket
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from coordenacao import CoordenadorReplicas
+from database import fechar_pool, iniciar_pool
+from estado_pagamentos import MaquinaEstados
+from politica_requisicoes import permitir_nova_tentativa
+from eventos_pagamentos import publicar_status
+from provider_status import StatusProvedor, obter_status
+from repositorio import PagamentosRepository, obter_repositorio
+
+load_dotenv()
+
+logger = logging.getLogger("VerificadorPagamentos")
+
+SUPABASE_URL = os.getenv("SUPABASE_URL", "https://obtuvufykxvbzrykpqvm.supabase.co")
+SUPABASE_API_KEY = os.getenv("SUPABASE_API_KEY") or os.getenv("SUPABASE_KEY")
+NETWORK_TIMEOUT = 30  # segundos
+MAX_RETRIES = 3
+CONECTIVIDADE_TTL = 30  # segundos em que o resultado da verificação de rede é reaproveitado
+
+# Significado dos status_detail do Mercado Pago
+STATUS_DETAIL_MEANINGS = {
+    # Aprovados
+    "accredited": "Pagamento aprovado e creditado",
+
+    # Pendentes
+    "pending_contingency": "Pagamento em análise",
+    "pending_review_manual": "Pagamento em revisão manual",
+    "pending_waiting_payment": "Aguardando pagamento",
+    "pending_waiting_transfer": "Aguardando transferência",
+
+    # Rejeitados - Cartão
+    "cc_rejected_bad_filled_card_number": "Número do cartão inválido",
+    "cc_rejected_bad_filled_date": "Data de vencimento inválida",
+    "cc_rejected_bad_filled_other": "Dados do cartão inválidos",
+    "cc_rejected_bad_filled_security_code": "Código de segurança inválido",
+    "cc_rejected_blacklist": "Cartão na lista negra",
+    "cc_rejected_call_for_authorize": "Necessário autorizar com o banco",
+    "cc_rejected_card_disabled": "Cartão desabilitado",
+    "cc_rejected_card_error": "Erro no cartão",
+    "cc_rejected_duplicated_payment": "Pagamento duplicado",
+    "cc_rejected_high_risk": "Pagamento de alto risco",
+    "cc_rejected_insufficient_amount": "Valor insuficiente",
+    "cc_rejected_invalid_installments": "Parcelas inválidas",
+    "cc_rejected_max_attempts": "Máximo de tentativas excedido",
+    "cc_rejected_other_reason": "Rejeitado por outros motivos",
+
+    # Outros
+    "expired": "Pagamento expirado",
+    "cancelled": "Pagamento cancelado"
+}
+
+
+def get_status_detail_meaning(status_detail):
+    """Retorna o significado do status_detail em português."""
+    return STATUS_DETAIL_MEANINGS.get(status_detail, f"Status desconhecido: {status_detail}")
+
+
+class ProvedorVerificacao(ABC):
+    """
+    Plug-in de um provedor de pagamentos.
+
+    Atributos:
+        nome: identificador do provedor em provider_status ("cora", "mercadopago")
+        servico: nome usado na coordenação entre réplicas
+        intervalo: segundos entre o início de dois ciclos
+        pausa: segundos entre consultas consecutivas (evita sobrecarregar a API)
+        tentativas: novas consultas em caso de erro, com backoff exponencial
+        backoff: base do backoff em segundos
+        aprovado: status do provedor que indica pagamento confirmado
+    """
+
+    nome: str
+    servico: str
+    intervalo: int = 60
+    pausa: float = 2.0
+    tentativas: int = 0
+    backoff: float = 1.0
+    aprovado: str = "approved"
+
+    @abstractmethod
+    def buscar_pendentes(self, repositorio: PagamentosRepository) -> List[Dict[str, str]]:
+        """Pagamentos a verificar: lista de {"id": referencia, "reference": referencia_externa}."""
+
+    @abstractmethod
+    def buscar_status(self, payment_id: str, usar_cache: bool = True) -> StatusProvedor:
+        """Consulta o status atual no provedor."""
+
+    @abstractmethod
+    def mapear_status(self, status: str) -> str:
+        """Converte o status do provedor para o status gravado em pagamentos."""
+
+    @abstractmethod
+    def payload_supabase(self, status: StatusProvedor) -> Dict[str, Any]:
+        """Dados enviados ao RobustSupabaseClient."""
+
+    def atualizar_supabase(self, supabase_client, payload: Dict[str, Any], registration_id: str) -> Dict[str, bool]:
+        return supabase_client.update_payment_and_registration(payment_data=payload, registration_id=registration_id)
+
+    def registrar_detalhes(self, status: StatusProvedor):
+        """Logs específicos do provedor após cada consulta (opcional)."""
+
+    def testar(self) -> bool:
+        """Testa a conectividade com o provedor."""
+        return True
+
+    def etapas_aquecimento(self) -> Dict[str, Any]:
+        """Etapas executadas antes do primeiro ciclo (aquecimento.py), por nome."""
+        return {}
+
+    def iniciar(self):
+        """Recursos de fundo do provedor no modo serviço (opcional)."""
+
+    def encerrar(self):
+        """Libera o que foi criado em iniciar()."""
+
+
+class ProvedorCora(ProvedorVerificacao):
+    nome = "cora"
+    servico = "cora_checker"
+    intervalo = 120
+    tentativas = MAX_RETRIES
+    backoff = 1.0
+    aprovado = "PAID"
+
+    STATUS = {
+        "OPEN": "pending",
+        "PENDING": "pending",
+        "PAID": "approved",
+        "EXPIRED": "expired",
+        "CANCELLED": "cancelled",
+        "PROCESSING": "in_process",
+        "FAILED": "rejected"
+    }
+
+    def buscar_pendentes(self, repositorio):
+        return repositorio.listar_pendentes_cora(dias=7)
+
+    def buscar_status(self, payment_id, usar_cache=True):
+        return obter_status("cora", payment_id, usar_cache=usar_cache)
+
+    def mapear_status(self, status):
+        return self.STATUS.get(status, status)
+
+    def payload_supabase(self, status):
+        return status.as_dict()
+
+    def testar(self):
+        from requisicaotokencora import obter_token_cora
+        return obter_token_cora() is not None
+
+    def etapas_aquecimento(self):
+        # Token e conexão com a API obtidos antes do primeiro ciclo
+        import http_clientes
+        from config import CORA_API_URL
+        from aquecimento import etapa_http, etapa_token_cora
+        return {"cora_token": etapa_token_cora, "cora": etapa_http(http_clientes.sessao(), CORA_API_URL)}
+
+    def iniciar(self):
+        # Token renovado antes de expirar: nenhum ciclo espera por /token
+        from requisicaotokencora import iniciar_renovacao_token
+        iniciar_renovacao_token()
+
+    def encerrar(self):
+        from requisicaotokencora import encerrar_renovacao_token
+        encerrar_renovacao_token()
+
+
+class ProvedorMercadoPago(ProvedorVerificacao):
+    nome = "mercadopago"
+    servico = "mercadopago_checker"
+    intervalo = 60
+
+    STATUS = {
+        "approved": "approved",
+        "pending": "pending",
+        "in_process": "in_process",
+        "rejected": "rejected",
+        "cancelled": "cancelled",
+        "refunded": "refunded",
+        "charged_back": "charged_back"
+    }
+
+    def __init__(self, access_token: Optional[str] = None):
+        self.access_token = access_token or os.getenv("MERCADO_PAGO_ACCESS_TOKEN")
+
+    def buscar_pendentes(self, repositorio):
+        return repositorio.listar_pendentes_mercadopago(horas=6)
+
+    def buscar_status(self, payment_id, usar_cache=True):
+        return obter_status("mercadopago", payment_id, usar_cache=usar_cache, access_token=self.access_token)
+
+    def mapear_status(self, status):
+        return self.STATUS.get(status, status)
+
+    def payload_supabase(self, status):
+        return {
+            "id": status.id,
+            "external_reference": status.external_reference,
+            "status": status.status,
+            "amount": status.amount,
+            "status_detail": status.status_detail,
+            "payment_method": "Credito"  # Específico para MercadoPago
+        }
+
+    def atualizar_supabase(self, supabase_client, payload, registration_id):
+        return supabase_client.update_payment_and_registration_mercadopago(payment_data=payload, registration_id=registration_id)
+
+    def registrar_detalhes(self, payment_data):
+        payment_id = payment_data.id
+        status = payment_data.status
+        status_detail = payment_data.status_detail
+        detalhes = payment_data.detalhes
+        status_meaning = get_status_detail_meaning(status_detail)
+
+        if status == "approved":
+            logger.info(f"✅ Pagamento {payment_id} APROVADO! 💰")
+            logger.info(f"   💳 Método: {detalhes.get('payment_method_id', 'N/A')}")
+            logger.info(f"   💵 Valor: R$ {payment_data.amount:.2f}")
+            logger.info(f"   📅 Aprovado em: {payment_data.date_approved or 'N/A'}")
+
+        elif status == "rejected":
+            logger.warning(f"❌ Pagamento {payment_id} REJEITADO!")
+            logger.warning(f"   🚫 Motivo: {status_meaning}")
+            logger.warning(f"   💳 Método: {detalhes.get('payment_method_id', 'N/A')}")
+            logger.warning(f"   🏦 Emissor: {detalhes.get('issuer_id', 'N/A')}")
+            logger.warning(f"   💵 Valor: R$ {payment_data.amount:.2f}")
+            if detalhes.get('card_first_six_digits'):
+                logger.warning(f"   💳 Cartão: {detalhes['card_first_six_digits']}****{detalhes.get('card_last_four_digits') or '****'}")
+
+            # Sugestões baseadas no tipo de rejeição
+            if "bad_filled" in status_detail:
+                logger.warning("   💡 Sugestão: Verificar dados do cartão (número, data, CVV)")
+            elif "insufficient" in status_detail:
+                logger.warning("   💡 Sugestão: Cartão sem limite suficiente")
+            elif "call_for_authorize" in status_detail:
+                logger.warning("   💡 Sugestão: Cliente deve entrar em contato com o banco")
+            elif "high_risk" in status_detail:
+                logger.warning("   💡 Sugestão: Transação considerada de alto risco")
+            elif "max_attempts" in status_detail:
+                logger.warning("   💡 Sugestão: Muitas tentativas, aguardar antes de tentar novamente")
+
+        elif status == "in_process":
+            logger.info("⏳ Pagamento %s em análise...", payment_id, extra={"amostra": "checker.pagamento"})
+            logger.info("   🔍 Detalhes: %s", status_meaning, extra={"amostra": "checker.pagamento"})
+            logger.info("   💳 Método: %s", detalhes.get('payment_method_id', 'N/A'), extra={"amostra": "checker.pagamento"})
+            logger.info("   ⏰ Criado em: %s", payment_data.date_created or 'N/A', extra={"amostra": "checker.pagamento"})
+
+        elif status == "pending":
+            logger.info("⏸️ Pagamento %s pendente", payment_id, extra={"amostra": "checker.pagamento"})
+            logger.info("   📋 Detalhes: %s", status_meaning, extra={"amostra": "checker.pagamento"})
+
+        else:
+            logger.info("ℹ️ Pagamento %s: %s", payment_id, status, extra={"amostra": "checker.pagamento"})
+            logger.info("   📋 Detalhes: %s", status_meaning, extra={"amostra": "checker.pagamento"})
+
+    def testar(self):
+        import http_clientes
+        from config import MP_API_URL
+
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            "Content-Type": "application/json"
+        }
+        response = http_clientes.sessao().get(f"{MP_API_URL}/v1/payment_methods", headers=headers, timeout=10)
+        if response.status_code != 200:
+            logger.error(f"❌ Falha na conectividade com API MercadoPago: {response.status_code}")
+        return response.status_code == 200
+
+    def etapas_aquecimento(self):
+        import http_clientes
+        from config import MP_API_URL
+        from aquecimento import etapa_http
+        return {"mercadopago": etapa_http(http_clientes.sessao(), MP_API_URL)}
+
+
+PROVEDORES = {
+    "cora": ProvedorCora,
+    "mercadopago": ProvedorMercadoPago,
+}
+
+
+def check_network_connectivity() -> bool:
+    """Verifica conectividade básica de rede."""
+    try:
+        # Testar conectividade com DNS público do Google
+        socket.create_connection(("8.8.8.8", 53), timeout=5).close()
+        logger.info("✅ Conectividade de rede básica OK", extra={"amostra": "checker.conectividade"})
+        return True
+    except OSError:
+        logger.error("❌ Falha na conectividade de rede básica")
+        return False
+
+
+class Verificador:
+    """Agenda e executa os ciclos de verificação de vários provedores no mesmo event loop."""
+
+    def __init__(self, provedores: List[ProvedorVerificacao], supabase_client=None,
+                 repositorio: Optional[PagamentosRepository] = None):
+        self.provedores = provedores
+        self._supabase_client = supabase_client
+        self._repositorio = repositorio
+        self._coordenadores: Dict[str, CoordenadorReplicas] = {}
+        self._conectividade: Optional[tuple] = None  # (verificado_em, ok)
+        self._conectividade_lock = asyncio.Lock()
+        self.estados = {p.nome: MaquinaEstados(p.nome) for p in provedores}
+
+    @property
+    def repositorio(self) -> PagamentosRepository:
+        return self._repositorio or obter_repositorio()
+
+    @property
+    def supabase_client(self):
+        if self._supabase_client is None:
+            from robust_supabase_client_v3 import RobustSupabaseClient
+            self._supabase_client = RobustSupabaseClient(
+                url=SUPABASE_URL,
+                api_key=SUPABASE_API_KEY,
+                max_retries=MAX_RETRIES,
+                timeout=NETWORK_TIMEOUT
+            )
+        return self._supabase_client
+
+    async def conectividade_ok(self) -> bool:
+        """Verificação de rede e Supabase compartilhada entre os provedores (reaproveitada por alguns segundos)."""
+        async with self._conectividade_lock:
+            agora = time.monotonic()
+            if self._conectividade and agora - self._conectividade[0] < CONECTIVIDADE_TTL:
+                return self._conectividade[1]
+            ok = await asyncio.to_thread(check_network_connectivity)
+            if ok and not await asyncio.to_thread(self.supabase_client.test_connection):
+                logger.warning("⚠️ Problemas de conectividade com Supabase detectados. Continuando com banco local apenas.")
+            self._conectividade = (agora, ok)
+            return ok
+
+    # === um pagamento ===
+
+    async def consultar(self, provedor: ProvedorVerificacao, payment_id: str) -> Optional[StatusProvedor]:
+        """
+        Consulta o status com as novas tentativas do provedor (tentativas seguintes
+        ignoram o cache), limitadas pelo orçamento de politica_requisicoes.py.
+        """
+        for tentativa in range(provedor.tentativas + 1):
+            try:
+                return await asyncio.to_thread(provedor.buscar_status, payment_id, tentativa == 0)
+            except Exception as e:
+                logger.warning(f"[{provedor.nome}] Tentativa {tentativa + 1} falhou para pagamento {payment_id}: {str(e)}")
+                if tentativa < provedor.tentativas:
+                    # Novas tentativas gastam do orçamento compartilhado com os hedges do provedor
+                    if not permitir_nova_tentativa(provedor.nome):
+                        logger.warning(f"[{provedor.nome}] Orçamento de novas tentativas esgotado para pagamento {payment_id}")
+                        return None
+                    await asyncio.sleep(provedor.backoff ** tentativa)
+        logger.error(f"[{provedor.nome}] Todas as {provedor.tentativas + 1} tentativas falharam para pagamento {payment_id}")
+        return None
+
+    async def atualizar(self, provedor: ProvedorVerificacao, status: StatusProvedor):
+        """
+        Grava o status no banco local e no Supabase (payments + registrations),
+        apenas nos destinos em que houve transição desde a última gravação (estado_pagamentos.py).
+        """
+        estado = self.estados[provedor.nome]
+        mapped_status = provedor.mapear_status(status.status)
+        if estado.decidir("local", mapped_status, status):
+            linhas = await asyncio.to_thread(self.repositorio.atualizar_status, status.id, mapped_status, status.status_detail)
+            if linhas > 0:
+                estado.aplicado("local", mapped_status, status)
+                await asyncio.to_thread(publicar_status, status.external_reference, mapped_status, status.status_detail, status.id)
+                logger.info("💾 [%s] Pagamento %s atualizado para status '%s' no banco local", provedor.nome, status.id, mapped_status, extra={"amostra": "checker.pagamento"})
+                if status.status == provedor.aprovado:
+                    logger.info(f"🎉 [{provedor.nome}] Pagamento {status.id} foi aprovado!")
+            else:
+                logger.warning(f"⚠️ [{provedor.nome}] Nenhum pagamento encontrado com referencia {status.id} no banco local")
+
+        if not estado.decidir("supabase", mapped_status, status):
+            return
+
+        if not SUPABASE_API_KEY:
+            logger.error("❌ Chave da API do Supabase não configurada")
+            return
+        registration_id = status.external_reference
+        if not registration_id:
+            logger.warning(f"⚠️ [{provedor.nome}] registration_id não encontrado para pagamento {status.id}")
+            return
+
+        logger.info("🔄 Iniciando atualização no Supabase para registration_id: %s", registration_id, extra={"amostra": "checker.pagamento"})
+        results = await asyncio.to_thread(
+            provedor.atualizar_supabase, self.supabase_client, provedor.payload_supabase(status), registration_id
+        )
+        if results['payments'] and results['registrations']:
+            estado.aplicado("supabase", mapped_status, status)
+            logger.info("✅ Supabase atualizado com sucesso - Payments: ✅ | Registrations: ✅", extra={"amostra": "checker.pagamento"})
+            if status.status == provedor.aprovado:
+                logger.info(f"💰 Inscrição {registration_id} confirmada com pagamento de R$ {status.amount}")
+        elif results['payments']:
+            logger.warning("⚠️ Supabase parcialmente atualizado - Payments: ✅ | Registrations: ❌")
+        elif results['registrations']:
+            logger.warning("⚠️ Supabase parcialmente atualizado - Payments: ❌ | Registrations: ✅")
+        else:
+            logger.error(f"❌ Falha completa na atualização do Supabase para registration_id: {registration_id}")
+
+    async def verificar(self, provedor: ProvedorVerificacao, pendente: Dict[str, str]) -> Optional[StatusProvedor]:
+        status = await self.consultar(provedor, pendente["id"])
+        if status is None:
+            return None
+        provedor.registrar_detalhes(status)
+        try:
+            await self.atualizar(provedor, status)
+        except Exception as e:
+            logger.error(f"❌ [{provedor.nome}] Erro ao atualizar status do pagamento {status.id}: {str(e)}")
+        logger.info("[%s] Pagamento %s (%s): %s", provedor.nome, pendente["id"], pendente["reference"], status.status, extra={"amostra": "checker.pagamento"})
+        return status
+
+    # === ciclos ===
+
+    async def ciclo(self, provedor: ProvedorVerificacao, coordenar: bool = True):
+        """Verifica todos os pendentes do provedor (apenas a parte desta réplica, se coordenado)."""
+        logger.info("🔍 [%s] Executando verificação de status de pagamentos...", provedor.nome)
+        estado = self.estados[provedor.nome]
+        estado.iniciar_ciclo()
+        if not await self.conectividade_ok():
+            logger.error("❌ Falha na conectividade de rede. Abortando verificação.")
+            return
+        try:
+            pendentes = await asyncio.to_thread(provedor.buscar_pendentes, self.repositorio)
+        except Exception as e:
+            logger.error(f"[{provedor.nome}] Erro ao obter pagamentos pendentes: {str(e)}")
+            return
+        logger.info(f"📋 [{provedor.nome}] {len(pendentes)} pagamentos pendentes encontrados")
+        coordenador = self._coordenadores.get(provedor.servico) if coordenar else None
+        if coordenador:
+            pendentes = await asyncio.to_thread(coordenador.filtrar, pendentes)
+
+        for pendente in pendentes:
+            try:
+                await self.verificar(provedor, pendente)
+            except Exception as e:
+                logger.error(f"❌ [{provedor.nome}] Erro ao verificar pagamento {pendente['id']}: {str(e)}")
+            await asyncio.sleep(provedor.pausa)
+        logger.info("✅ [%s] Verificação de status concluída (gravações: %s)", provedor.nome, estado.resumo())
+
+    async def _agendar(self, provedor: ProvedorVerificacao):
+        while True:
+            inicio = time.monotonic()
+            try:
+                await self.ciclo(provedor)
+            except Exception as e:
+                logger.error(f"❌ [{provedor.nome}] Erro ao executar verificação: {str(e)}")
+            await asyncio.sleep(max(0.0, provedor.intervalo - (time.monotonic() - inicio)))
+
+    async def aquecer(self):
+        """Banco, Supabase e provedores prontos antes do primeiro ciclo (aquecimento.py)."""
+        from config import AQUECIMENTO_HABILITADO
+        from aquecimento import aquecer, etapa_banco, etapa_http, registrar
+
+        if not AQUECIMENTO_HABILITADO:
+            return
+        etapas = {"banco": etapa_banco}
+        if SUPABASE_URL:
+            etapas["supabase"] = etapa_http(self.supabase_client.session, f"{SUPABASE_URL}/rest/v1/",
+                                            {"apikey": SUPABASE_API_KEY or ""})
+        for provedor in self.provedores:
+            etapas.update(provedor.etapas_aquecimento())
+        registrar(await asyncio.to_thread(aquecer, etapas))
+
+    async def executar(self):
+        """Serviço contínuo: um agendamento por provedor, todos no mesmo event loop."""
+        await self.aquecer()
+        for provedor in self.provedores:
+            provedor.iniciar()
+            coordenador = CoordenadorReplicas(provedor.servico, repositorio=self._repositorio)
+            await asyncio.to_thread(coordenador.iniciar)
+            self._coordenadores[provedor.servico] = coordenador
+            logger.info(f"🧩 [{provedor.nome}] Réplica {coordenador.replica_id} registrada (lease de {coordenador.ttl}s)")
+        try:
+            await asyncio.gather(*(self._agendar(p) for p in self.provedores))
+        finally:
+            for coordenador in self._coordenadores.values():
+                await asyncio.to_thread(coordenador.encerrar)
+            for provedor in self.provedores:
+                provedor.encerrar()
+
+    async def executar_uma_vez(self):
+        """Um ciclo de cada provedor, em paralelo, sem divisão entre réplicas."""
+        await self.aquecer()
+        await asyncio.gather(*(self.ciclo(p, coordenar=False) for p in self.provedores))
+
+    async def testar(self) -> bool:
+        """Testa rede, Supabase e cada provedor."""
+        logger.info("🧪 Executando teste completo de conectividade...")
+        rede_ok = await asyncio.to_thread(check_network_connectivity)
+        supabase_ok = await asyncio.to_thread(self.supabase_client.test_connection)
+        resultados = {}
+        for provedor in self.provedores:
+            try:
+                resultados[provedor.nome] = await asyncio.to_thread(provedor.testar)
+            except Exception as e:
+                logger.error(f"❌ Erro ao testar {provedor.nome}: {str(e)}")
+                resultados[provedor.nome] = False
+
+        logger.info("📊 Resumo dos testes de conectividade:")
+        logger.info(f"   Rede básica: {'✅' if rede_ok else '❌'}")
+        logger.info(f"   Supabase: {'✅' if supabase_ok else '❌'}")
+        for nome, ok in resultados.items():
+            logger.info(f"   {nome}: {'✅' if ok else '❌'}")
+        return rede_ok and supabase_ok and all(resultados.values())
+
+
+def executar(provedores: List[ProvedorVerificacao], modo: str = "servico") -> Any:
+    """
+    Executa o verificador de forma síncrona (ponto de entrada dos scripts).
+
+    Args:
+        provedores: plug-ins a executar
+        modo: "servico" (contínuo), "once" (um ciclo) ou "test" (conectividade)
+    """
+    iniciar_pool()
+    verificador = Verificador(provedores)
+    try:
+        if modo == "test":
+            return asyncio.run(verificador.testar())
+        if modo == "once":
+            return asyncio.run(verificador.executar_uma_vez())
+        logger.info("🚀 Iniciando verificador de pagamentos: %s", ", ".join(p.nome for p in provedores))
+        return asyncio.run(verificador.executar())
+    finally:
+        fechar_pool()
+
+
+if __name__ == "__main__":
+    import argparse
+    from logging_config import configurar_logging
+
+    parser = argparse.ArgumentParser(description='Verificador de status de pagamentos (Cora e Mercado Pago)')
+    parser.add_argument('--once', action='store_true', help='Executar uma única vez e sair')
+    parser.add_argument('--test', action='store_true', help='Testar conectividade e sair')
+    parser.add_argument('--provedores', default=",".join(PROVEDORES), help='Provedores separados por vírgula')
+    args = parser.parse_args()
+
+    configurar_logging("verificador_pagamentos.log")
+    provedores = [PROVEDORES[nome.strip()]() for nome in args.provedores.split(",") if nome.strip()]
+    executar(provedores, "test" if args.test else "once" if args.once else "servico")
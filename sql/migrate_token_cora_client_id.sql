@@ -0,0 +1,64 @@
+-- Migração da tabela token_cora (SQL Server / ITSERP) para uma linha por client_id
+-- com lease de renovação (python_examples/requisicaotokencora.py).
+--
+-- Layout antigo: token_cora (id, access_token, expires_at), uma linha nova a cada
+-- token obtido (id = MAX(id) + 1), lida sempre com WHERE id = 1.
+-- Layout novo:   token_cora (client_id PK, access_token, expires_at, atualizado_em,
+--                             renovando_por, renovando_ate)
+--
+-- Executar com sqlcmd ou SSMS (usa GO) antes de publicar a versão nova da API.
+-- Idempotente: pode ser executado de novo sem efeito. Informe em @client_id o
+-- mesmo valor de CORA_CLIENT_ID usado pela API.
+
+-- Novas colunas
+IF COL_LENGTH('token_cora', 'client_id') IS NULL
+    ALTER TABLE token_cora ADD client_id VARCHAR(100) NULL;
+IF COL_LENGTH('token_cora', 'atualizado_em') IS NULL
+    ALTER TABLE token_cora ADD atualizado_em DATETIME NULL;
+IF COL_LENGTH('token_cora', 'renovando_por') IS NULL
+    ALTER TABLE token_cora ADD renovando_por VARCHAR(200) NULL;
+IF COL_LENGTH('token_cora', 'renovando_ate') IS NULL
+    ALTER TABLE token_cora ADD renovando_ate DATETIME NULL;
+GO
+
+-- Backfill: o token mais recente do layout antigo passa a ser o do client_id;
+-- as demais linhas sem client_id são as mesmas que _compactar_tokens remove
+DECLARE @client_id VARCHAR(100) = 'INFORME_O_CORA_CLIENT_ID';
+
+IF COL_LENGTH('token_cora', 'id') IS NOT NULL
+   AND NOT EXISTS (SELECT 1 FROM token_cora WHERE client_id = @client_id)
+    EXEC sp_executesql N'
+        UPDATE token_cora
+        SET client_id = @client_id, atualizado_em = GETUTCDATE()
+        WHERE id = (SELECT MAX(id) FROM token_cora WHERE client_id IS NULL)',
+        N'@client_id VARCHAR(100)', @client_id = @client_id;
+
+DELETE FROM token_cora WHERE client_id IS NULL;
+GO
+
+-- Remove a chave primária antiga (se houver) e a coluna id, que as gravações novas não preenchem
+DECLARE @pk SYSNAME = (
+    SELECT name FROM sys.key_constraints
+    WHERE parent_object_id = OBJECT_ID('token_cora') AND type = 'PK' AND name <> 'PK_token_cora'
+);
+IF @pk IS NOT NULL
+    EXEC ('ALTER TABLE token_cora DROP CONSTRAINT ' + @pk);
+IF COL_LENGTH('token_cora', 'id') IS NOT NULL
+    ALTER TABLE token_cora DROP COLUMN id;
+GO
+
+-- Chave primária por client_id (MERGE de salvar_token_cora e o lease dependem dela)
+IF NOT EXISTS (
+    SELECT 1 FROM sys.key_constraints
+    WHERE parent_object_id = OBJECT_ID('token_cora') AND type = 'PK' AND name = 'PK_token_cora'
+)
+BEGIN
+    ALTER TABLE token_cora ALTER COLUMN client_id VARCHAR(100) NOT NULL;
+    ALTER TABLE token_cora ADD CONSTRAINT PK_token_cora PRIMARY KEY (client_id);
+END
+GO
+
+-- access_token e expires_at ficam nulos na linha criada pelo lease antes do primeiro token
+ALTER TABLE token_cora ALTER COLUMN access_token VARCHAR(MAX) NULL;
+ALTER TABLE token_cora ALTER COLUMN expires_at DATETIME NULL;
+GO